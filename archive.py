@@ -0,0 +1,148 @@
+import os
+import threading
+import time
+
+from info_cache import canonical_video_id
+
+DEFAULT_ARCHIVE = os.path.join(os.path.expanduser("~"), ".youtube_scraper", "archive.db")
+
+# Profile of entries imported from a plain yt-dlp archive: done in any profile
+ANY_PROFILE = '*'
+
+
+def archive_key(url=None, info=None):
+    """
+    (extractor, video_id) of a video, from its info dict or flat playlist
+    entry when given, else from the URL alone when the URL names the video
+    (YouTube URLs do). None when it cannot be known without extracting.
+    Keys match yt-dlp's own download archive ("youtube dQw4w9WgXcQ").
+    """
+    if info:
+        extractor = info.get('extractor_key') or info.get('ie_key') or info.get('extractor')
+        if extractor and info.get('id'):
+            return extractor.lower(), str(info['id'])
+    if url:
+        key = canonical_video_id(url)
+        if key.startswith('youtube:'):
+            return 'youtube', key.split(':', 1)[1]
+    return None
+
+
+class DownloadArchive:
+    """
+    Persistent set of completed (extractor, video_id, profile) downloads in
+    sqlite. A lookup is one primary-key read, so duplicates in a channel
+    sync are skipped before any extraction. WAL mode and a busy timeout let
+    several worker processes share one archive file.
+    """
+
+    def __init__(self, path=DEFAULT_ARCHIVE, timeout=30.0):
+        import sqlite3
+        self.path = path
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        self._db = sqlite3.connect(path, timeout=timeout, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        with self._lock:
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS downloads (extractor TEXT, video_id TEXT, profile TEXT, "
+                "path TEXT, completed REAL, PRIMARY KEY (extractor, video_id, profile)) WITHOUT ROWID")
+            self._db.commit()
+
+    def find(self, url=None, profile=ANY_PROFILE, info=None):
+        """
+        The archived entry {'extractor', 'video_id', 'profile', 'path',
+        'completed'} for the video in profile (or imported for any profile),
+        else None. See archive_key() for what url/info must provide.
+        """
+        key = archive_key(url, info)
+        if key is None:
+            return None
+        with self._lock:
+            row = self._db.execute(
+                "SELECT extractor, video_id, profile, path, completed FROM downloads "
+                "WHERE extractor = ? AND video_id = ? AND profile IN (?, ?) LIMIT 1",
+                (*key, profile, ANY_PROFILE)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+        return dict(zip(('extractor', 'video_id', 'profile', 'path', 'completed'), row))
+
+    def add(self, extractor, video_id, profile=ANY_PROFILE, path=None, completed=None):
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO downloads VALUES (?, ?, ?, ?, ?)",
+                (extractor.lower(), str(video_id), profile, path, completed or time.time()))
+            self._db.commit()
+
+    def record(self, info, profile, path=None):
+        """
+        Archives a finished download of info; False when info has no ID.
+        """
+        key = archive_key(info=info)
+        if key is None:
+            return False
+        self.add(*key, profile, path)
+        return True
+
+    def remove(self, extractor, video_id, profile=None):
+        with self._lock:
+            if profile is None:
+                self._db.execute("DELETE FROM downloads WHERE extractor = ? AND video_id = ?",
+                                 (extractor.lower(), video_id))
+            else:
+                self._db.execute("DELETE FROM downloads WHERE extractor = ? AND video_id = ? AND profile = ?",
+                                 (extractor.lower(), video_id, profile))
+            self._db.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM downloads").fetchone()[0]
+
+    def export(self, f, ytdlp=False):
+        """
+        Writes one "extractor video_id profile" line per entry to the text
+        file f; with ytdlp=True, "extractor video_id" lines that yt-dlp's
+        --download-archive reads. Returns the number of lines.
+        """
+        with self._lock:
+            if ytdlp:
+                rows = self._db.execute(
+                    "SELECT DISTINCT extractor, video_id FROM downloads ORDER BY extractor, video_id").fetchall()
+            else:
+                rows = self._db.execute(
+                    "SELECT extractor, video_id, profile FROM downloads ORDER BY completed").fetchall()
+        for row in rows:
+            f.write(' '.join(row) + '\n')
+        return len(rows)
+
+    def import_(self, f, profile=ANY_PROFILE):
+        """
+        Adds the entries of a file written by export() or by yt-dlp's
+        --download-archive (those count for profile, by default any).
+        Returns the number of entries read.
+        """
+        rows = []
+        now = time.time()
+        for line in f:
+            fields = line.split()
+            if len(fields) in (2, 3) and not line.startswith('#'):
+                rows.append((fields[0].lower(), fields[1], fields[2] if len(fields) == 3 else profile, None, now))
+        with self._lock:
+            # One transaction, so a large import takes the write lock once
+            self._db.executemany("INSERT OR IGNORE INTO downloads VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.commit()
+        return len(rows)
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses}
+
+    def close(self):
+        with self._lock:
+            if self._db is not None:
+                self._db.close()
+                self._db = None
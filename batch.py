@@ -0,0 +1,208 @@
+import argparse
+import json
+import os
+import queue
+import sys
+import threading
+
+from archive import DEFAULT_ARCHIVE
+from job_queue import JobQueue, FINISHED_STATES
+from profiles import PROFILES
+import bandwidth
+import tracing
+import transport
+
+
+def iter_sources(urls=(), files=(), stdin=None):
+    """
+    Yields source URLs from the command line, then from each file (one URL
+    per line, "#" comments allowed). "-" as a URL or file name reads stdin.
+    Lines are read lazily so huge lists never sit in memory.
+    """
+    def from_lines(lines):
+        for line in lines:
+            line = line.strip()
+            if line and not line.startswith('#'):
+                yield line
+
+    for url in urls:
+        if url == '-':
+            yield from from_lines(stdin or sys.stdin)
+        else:
+            yield url
+
+    for path in files:
+        if path == '-':
+            yield from from_lines(stdin or sys.stdin)
+            continue
+        with open(path, encoding='utf-8') as f:
+            yield from from_lines(f)
+
+
+def run_batch(downloader, sources, kind='video', workers=2, ahead=None, state_path=None, **options):
+    """
+    Downloads every video behind sources and yields each Job as it finishes.
+
+    Playlist entries are enumerated in a producer thread and submitted to a
+    JobQueue while earlier entries are already downloading. At most ahead
+    jobs are in flight, and finished jobs are discarded, so memory stays flat
+    no matter how long the playlist is.
+    """
+    ahead = ahead or workers * 2
+    slots = threading.Semaphore(ahead)
+    finished = queue.Queue()
+    # Jobs announced and not finished yet; a job leaves when it finishes, so
+    # the set never holds more than the jobs in flight
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+
+    def on_update(job):
+        with in_flight_lock:
+            if job.state not in FINISHED_STATES:
+                in_flight.add(job.job_id)
+                return
+            if job.job_id not in in_flight:
+                return  # already handed on
+            in_flight.discard(job.job_id)
+        jobs.discard(job.job_id)
+        slots.release()
+        finished.put(job)
+
+    jobs = JobQueue(downloader, workers=workers, state_path=state_path, listener=on_update)
+    submitted = [0]
+    producing = [True]
+
+    def produce():
+        try:
+            for source in sources:
+                try:
+                    for entry_url, info in downloader.iter_entries(source):
+                        slots.acquire()
+                        jobs.submit(kind, entry_url, info=info, **options)
+                        submitted[0] += 1
+                except Exception as e:
+                    print(f"Error reading {source}: {e}")
+        finally:
+            producing[0] = False
+            finished.put(None)  # wake the consumer
+
+    jobs.start()
+    producer = threading.Thread(target=produce, name="batch-producer", daemon=True)
+    producer.start()
+
+    done = 0
+    try:
+        while producing[0] or done < submitted[0]:
+            job = finished.get()
+            if job is None:
+                continue
+            done += 1
+            yield job
+    finally:
+        jobs.stop(wait=False)
+
+
+def add_arguments(parser):
+    parser.add_argument('urls', nargs='*', help="video/playlist/channel URLs ('-' reads stdin)")
+    parser.add_argument('-f', '--file', action='append', default=[], help="file with one URL per line ('-' for stdin)")
+    parser.add_argument('-o', '--output', help="download folder (default: ~/Downloads)")
+    parser.add_argument('--audio', action='store_true', help="download audio instead of video")
+    parser.add_argument('-j', '--workers', type=int, default=2, help="parallel downloads")
+    parser.add_argument('--ahead', type=int, help="max queued entries ahead of the workers")
+    parser.add_argument('-c', '--connections', type=int, help="parallel connections per download (default: tuned from throughput)")
+    parser.add_argument('--archive', nargs='?', const=DEFAULT_ARCHIVE, metavar='FILE',
+                        help=f"skip videos recorded in this download archive and record new ones (default: {DEFAULT_ARCHIVE})")
+    parser.add_argument('--dedup', action='store_true',
+                        help="keep identical files once, under OUTPUT/.store, and hardlink the copies")
+    parser.add_argument('--profile', choices=sorted(PROFILES),
+                        help="output profile: mp4 (video default), mp3 (audio default), original, remux")
+    parser.add_argument('--pass', dest='passes', action='append', default=[], metavar='NAME',
+                        help="extra post-processing pass: metadata, embed_thumbnail, loudnorm")
+    parser.add_argument('--metrics', metavar='FILE', help="write Prometheus metrics (seconds per phase, bytes, retries) here at the end")
+    parser.add_argument('--summary', metavar='FILE', help="append one JSON timing summary per finished job to this file")
+    add_format_arguments(parser)
+    transport.add_arguments(parser)
+    bandwidth.add_arguments(parser)
+    tracing.add_arguments(parser)
+
+
+def add_format_arguments(parser):
+    parser.add_argument('--max-height', type=int, metavar='PX', help="best video at most this tall, e.g. 1080")
+    parser.add_argument('--codec', help="preferred codec at equal quality, e.g. avc1, vp9, av01, opus")
+    parser.add_argument('--max-size', type=float, metavar='MB', help="skip formats known to be larger")
+    parser.add_argument('--min-abr', type=float, metavar='KBPS', help="audio: smallest source of at least this bitrate")
+
+
+def job_options(args):
+    """
+    Download options (passes, profile, format_query) from parsed arguments.
+    """
+    options = {'passes': args.passes} if args.passes else {}
+    if args.profile:
+        options['profile'] = args.profile
+    query = {}
+    if args.max_height:
+        query['max_height'] = args.max_height
+    if args.codec:
+        query['codec'] = args.codec
+    if args.max_size:
+        query['max_size'] = int(args.max_size * 1024 * 1024)
+    if args.min_abr:
+        query.update(min_abr=args.min_abr, smallest=True)
+    if query:
+        options['format_query'] = query
+    return options
+
+
+def run(args):
+    """
+    Runs a batch for parsed add_arguments() options; returns the exit code.
+    """
+    from archive import DownloadArchive
+    from content_store import STORE_DIR, ContentStore
+    from downloader_logic import YouTubeDownloader
+
+    transport.from_args(args)
+    archive = DownloadArchive(args.archive) if args.archive else None
+    downloader = YouTubeDownloader(args.output, connections=args.connections, archive=archive,
+                                   bandwidth=bandwidth.from_args(args), tracer=tracing.from_args(args))
+    if args.dedup:
+        downloader.content_store = ContentStore(os.path.join(downloader.base_path, STORE_DIR))
+    sources = iter_sources(args.urls, args.file)
+    kind = 'audio' if args.audio else 'video'
+
+    failed = 0
+    options = job_options(args)
+    summary = open(args.summary, 'a', encoding='utf-8') if args.summary else None
+    try:
+        for job in run_batch(downloader, sources, kind, workers=args.workers, ahead=args.ahead, **options):
+            print(f"[{job.state}] {job.url}: {job.result}")
+            failed += not (job.result and job.result.ok)
+            timings = getattr(job.result, 'timings', None)
+            if summary is not None and timings:
+                summary.write(json.dumps(timings, ensure_ascii=False) + '\n')
+                summary.flush()
+    finally:
+        if summary is not None:
+            summary.close()
+        if args.trace:
+            downloader.tracer.write(args.trace)
+    if args.metrics:
+        downloader.metrics.write(args.metrics)
+    print(downloader.codec_report.summary())
+    if downloader.content_store is not None:
+        print(downloader.content_store.summary())
+    return 1 if failed else 0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Download every video behind URLs, playlists or channels.")
+    add_arguments(parser)
+    args = parser.parse_args(argv)
+    if not args.urls and not args.file:
+        parser.error("no URLs given")
+    return run(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,97 @@
+# Quality menu and format picks on info dicts with hundreds of formats:
+# the frontends' original string building and re-parsing sort versus
+# format_index.FormatIndex, built once per info dict.
+# Run: python bench_format_index.py
+import random
+import time
+
+from format_index import FormatIndex, format_index
+from ydl_pool import YDLPool
+
+FORMATS = 600
+ROUNDS = 200
+HEIGHTS = (144, 240, 360, 480, 720, 1080, 1440, 2160)
+VCODECS = ('avc1.640028', 'vp09.00.41.08', 'av01.0.08M.08')
+EXTS = ('mp4', 'webm', 'mp4')
+
+
+def make_info(seed):
+    rnd = random.Random(seed)
+    formats = []
+    for n in range(FORMATS):
+        if n % 5 == 0:
+            formats.append({'format_id': f'a{n}', 'url': f'http://127.0.0.1/{n}', 'ext': rnd.choice(('m4a', 'webm')), 'vcodec': 'none',
+                            'acodec': rnd.choice(('mp4a.40.2', 'opus')), 'abr': rnd.choice((48, 70, 128, 160))})
+            continue
+        c = rnd.randrange(3)
+        formats.append({'format_id': f'v{n}', 'url': f'http://127.0.0.1/{n}', 'ext': EXTS[c], 'height': rnd.choice(HEIGHTS),
+                        'fps': rnd.choice((24, 30, 60)), 'vcodec': VCODECS[c], 'acodec': 'none',
+                        'tbr': rnd.randrange(100, 20000)})
+    return {'id': f'x{seed}', 'duration': 600, 'formats': formats}
+
+
+def legacy_menu(info):
+    # Body of the original update_ui_after_check
+    formats = info.get('formats', [])
+    resolutions = set()
+    format_map = {}
+    for f in formats:
+        if f.get('vcodec') != 'none' and f.get('height'):
+            res_str = f"{f['height']}p - {f['ext']}"
+            if res_str not in resolutions:
+                resolutions.add(res_str)
+                format_map[res_str] = f['format_id']
+    sorted_res = sorted(list(resolutions), key=lambda x: int(x.split('p')[0]), reverse=True)
+    return sorted_res, format_map
+
+
+def main():
+    infos = [make_info(seed) for seed in range(ROUNDS)]
+
+    start = time.perf_counter()
+    for info in infos:
+        legacy_menu(info)
+    legacy = (time.perf_counter() - start) / ROUNDS
+
+    start = time.perf_counter()
+    for info in infos:
+        FormatIndex(info)
+    build = (time.perf_counter() - start) / ROUNDS
+
+    # Analyze, menu and two download picks per info: one index build each
+    start = time.perf_counter()
+    for info in infos:
+        index = format_index(info)
+        index.choices()
+        format_index(info).select('video', {'max_height': 1080, 'codec': 'avc1', 'max_size': 500 * 1024 * 1024})
+        format_index(info).select('audio', {'min_abr': 128, 'smallest': True})
+    job = (time.perf_counter() - start) / ROUNDS
+
+    index = format_index(infos[0])
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        index.best_video(max_height=1080, codec='avc1', max_size=500 * 1024 * 1024)
+    query = (time.perf_counter() - start) / ROUNDS
+
+    # The pick the batch path used to leave to yt-dlp's selector
+    pool = YDLPool()
+    spec = 'bv*[height<=1080][vcodec^=avc1][filesize_approx<500M]/bv*[height<=1080]'
+    with pool.borrow({'quiet': True, 'no_warnings': True}):
+        pass
+    start = time.perf_counter()
+    for n, info in enumerate(infos[:20]):
+        with pool.borrow({'quiet': True, 'no_warnings': True, 'format': spec}) as ydl:
+            ydl.process_ie_result(dict(info, extractor='generic', webpage_url=f'http://127.0.0.1/{n}'),
+                                  download=False)
+    selector = (time.perf_counter() - start) / 20
+
+    print(f"{ROUNDS} info dicts with {FORMATS} formats each")
+    print(f"legacy menu (strings + re-parse sort): {legacy * 1e3:7.3f} ms/info  (first format per label)")
+    print(f"FormatIndex build:                     {build * 1e3:7.3f} ms/info")
+    print(f"menu + video pick + audio pick:        {job * 1e3:7.3f} ms/info  (one build)")
+    print(f"yt-dlp selector, one video pick:     {selector * 1e3:7.3f} ms/info  (warm pooled instance)")
+    print(f"ranked query on a built index:         {query * 1e3:7.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
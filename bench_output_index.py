@@ -0,0 +1,51 @@
+# Name allocation in an archive folder full of same-title re-uploads: the
+# original exists() loop versus the directory index in output_index.py.
+# Run: python bench_output_index.py
+import os
+import tempfile
+import time
+
+from output_index import OutputIndex
+
+EXISTING = 500   # "Clip.mp4", "Clip (1).mp4", ... already on disk
+JOBS = 200       # new downloads of the same title
+
+
+def legacy_unique(directory, title, ext):
+    # Body of the original _unique_title
+    final_title = title
+    counter = 1
+    while os.path.exists(os.path.join(directory, f"{final_title}.{ext}")):
+        final_title = f"{title} ({counter})"
+        counter += 1
+    return final_title
+
+
+def main():
+    with tempfile.TemporaryDirectory() as root:
+        for n in range(EXISTING):
+            open(os.path.join(root, f"Clip ({n}).mp4" if n else "Clip.mp4"), 'w').close()
+
+        start = time.perf_counter()
+        for _ in range(JOBS):
+            name = legacy_unique(root, 'Clip', 'mp4')
+            # The job then writes its file, so the next one probes further
+            open(os.path.join(root, f"{name}.mp4"), 'w').close()
+        legacy = time.perf_counter() - start
+        probes = sum(EXISTING + i + 1 for i in range(JOBS))
+
+        index = OutputIndex()
+        index.reserve(root, 'Warm-up')  # the one listing of the folder
+        start = time.perf_counter()
+        for _ in range(JOBS):
+            name = index.reserve(root, 'Clip')
+            open(os.path.join(root, f"{name}.webm"), 'w').close()
+        indexed = time.perf_counter() - start
+
+    print(f"{JOBS} jobs, {EXISTING} same-title files already present")
+    print(f"exists() loop:   {legacy / JOBS * 1e6:9.1f} us/job   ({probes} stat calls)")
+    print(f"directory index: {indexed / JOBS * 1e6:9.1f} us/job   ({index.scans} directory listing)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,56 @@
+# Wall time of one video download against a throttled loopback server at
+# 1/4/8/16 parallel range connections.
+# Run: python bench_parallel.py [--size MiB] [--rate MiB/s per connection]
+import argparse
+import contextlib
+import io
+import os
+import tempfile
+import time
+
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+
+MiB = 1024 * 1024
+
+
+def download_once(payload, connections, rate, chunk_size):
+    with LocalMediaServer({'/clip.mp4': payload}, per_connection_rate=rate) as server, \
+            tempfile.TemporaryDirectory() as root:
+        url = server.url('/clip.mp4')
+        info = {
+            'id': 'clip', 'title': 'Bench Clip', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': url,
+            'formats': [{'format_id': '18', 'url': url, 'ext': 'mp4', 'filesize': len(payload),
+                         'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360}],
+        }
+        dl = YouTubeDownloader(root, connections=connections, chunk_size=chunk_size,
+                               range_param_hosts=('127.0.0.1',))
+        start = time.perf_counter()
+        # yt-dlp prints its own progress lines; keep the table readable
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            result = dl.download_video(url, info=info)
+        elapsed = time.perf_counter() - start
+        assert result.ok, result
+        return elapsed, server.peak_active
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--size', type=int, default=32, help="file size in MiB")
+    parser.add_argument('--rate', type=float, default=4, help="per-connection limit in MiB/s")
+    args = parser.parse_args()
+
+    payload = os.urandom(args.size * MiB)
+    chunk_size = max(MiB, len(payload) // 16)
+    print(f"{args.size} MiB file, {args.rate:g} MiB/s per connection, {chunk_size // MiB} MiB chunks")
+    print(f"{'connections':>11} {'seconds':>8} {'MiB/s':>7} {'speedup':>8} {'peak':>5}")
+    baseline = None
+    for n in (1, 4, 8, 16):
+        elapsed, peak = download_once(payload, n, args.rate * MiB, chunk_size)
+        baseline = baseline or elapsed
+        print(f"{n:>11} {elapsed:8.2f} {args.size / elapsed:7.1f} {baseline / elapsed:7.1f}x {peak:>5}")
+
+
+if __name__ == "__main__":
+    main()
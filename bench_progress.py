@@ -0,0 +1,77 @@
+# Per-call overhead of the yt-dlp progress hook: the original string-parsing
+# hook versus the numeric, rate-limited one in progress.py.
+# Run: python bench_progress.py
+import re
+import time
+
+from progress import RateLimiter
+from records import ProgressSnapshot
+
+CALLS = 200_000
+
+SAMPLE = {
+    'status': 'downloading',
+    'downloaded_bytes': 1_345_000_000,
+    'total_bytes': 2_748_779_069,
+    'speed': 334_571.5,
+    'eta': 3927,
+    '_percent_str': '\x1b[0;94m 52.1%\x1b[0m',
+    '_eta_str': '\x1b[0;33m01:05:27\x1b[0m',
+    '_total_bytes_str': '\x1b[0;94m   2.56GiB\x1b[0m',
+    '_speed_str': '\x1b[0;32m 326.73KiB/s\x1b[0m',
+}
+
+
+def legacy_hook(progress_callback):
+    # Body of the original download_video hook
+    def progress_hook(d):
+        if d['status'] == 'downloading':
+            p_str = d.get('_percent_str', '0%').strip()
+            p_match = re.search(r"(\d+\.?\d*)", p_str)
+            p = float(p_match.group(1)) / 100.0 if p_match else 0.0
+            eta = d.get('_eta_str', '').strip()
+            if not re.match(r"^\d+:\d+", eta):
+                eta = "Unknown"
+            ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
+            total_bytes_str = ansi_escape.sub('', d.get('_total_bytes_str') or d.get('_total_bytes_estimate_str') or "Unknown size")
+            speed_str = ansi_escape.sub('', d.get('_speed_str') or "Unknown speed")
+            eta_str = ansi_escape.sub('', d.get('_eta_str') or eta)
+            percent_str_clean = ansi_escape.sub('', p_str)
+            progress_callback(p, f"[download] {percent_str_clean} of {total_bytes_str} at {speed_str} ETA {eta_str}")
+    return progress_hook
+
+
+def numeric_hook(progress_callback, hz):
+    throttle = RateLimiter(hz)
+
+    def progress_hook(d):
+        if d['status'] == 'downloading':
+            if throttle.ready():
+                progress_callback(ProgressSnapshot.from_hook(d))
+    return progress_hook
+
+
+def run(name, hook, delivered):
+    start = time.perf_counter()
+    for _ in range(CALLS):
+        hook(SAMPLE)
+    elapsed = time.perf_counter() - start
+    print(f"{name:<28} {elapsed / CALLS * 1e9:8.0f} ns/call   callbacks: {delivered[0]:>7}")
+
+
+def main():
+    for name, make in [
+        ("legacy (regex per call)", lambda cb: legacy_hook(cb)),
+        ("numeric, unthrottled", lambda cb: numeric_hook(cb, None)),
+        ("numeric, 4 Hz", lambda cb: numeric_hook(cb, 4)),
+    ]:
+        delivered = [0]
+
+        def callback(*args):
+            delivered[0] += 1
+
+        run(name, make(callback), delivered)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,50 @@
+# Startup budget for the headless entry point.
+# Run: python bench_startup.py  (exits non-zero if the budget is exceeded)
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+RUNS = 10
+BUDGET_MS = 150  # extra time over a bare interpreter start
+FORBIDDEN = ('yt_dlp', 'customtkinter', 'PIL', 'flet', 'tkinter')
+
+
+def time_command(args):
+    samples = []
+    for _ in range(RUNS):
+        start = time.perf_counter()
+        subprocess.run([sys.executable] + args, cwd=HERE, check=True,
+                       stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def loaded_modules():
+    code = ("import sys, downloader, downloader_logic, job_queue; "
+            "downloader.build_parser(); print(' '.join(sys.modules))")
+    out = subprocess.run([sys.executable, '-c', code], cwd=HERE, check=True,
+                         capture_output=True, text=True).stdout.split()
+    return [m for m in out if m.split('.')[0] in FORBIDDEN]
+
+
+def main():
+    baseline = time_command(['-c', 'pass'])
+    help_ms = time_command(['-m', 'downloader', '--help'])
+    submit_help_ms = time_command(['-m', 'downloader', 'submit', '--help'])
+    heavy = loaded_modules()
+
+    print(f"python -c pass            {baseline:7.1f} ms")
+    print(f"downloader --help         {help_ms:7.1f} ms  (+{help_ms - baseline:.1f})")
+    print(f"downloader submit --help  {submit_help_ms:7.1f} ms  (+{submit_help_ms - baseline:.1f})")
+    print(f"heavy modules imported:   {heavy or 'none'}")
+
+    ok = not heavy and max(help_ms, submit_help_ms) - baseline <= BUDGET_MS
+    print("Within budget." if ok else f"Over budget ({BUDGET_MS} ms)!")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
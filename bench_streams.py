@@ -0,0 +1,72 @@
+# End-to-end time of a video+audio download over loopback, fetching the two
+# streams one after the other (yt-dlp's default) versus side by side.
+# With ffmpeg installed the merge is included; otherwise only the fetch is timed.
+# Run: python bench_streams.py [--video MiB] [--audio MiB] [--rate MiB/s per connection]
+import argparse
+import contextlib
+import io
+import os
+import shutil
+import tempfile
+import time
+
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+
+MiB = 1024 * 1024
+
+
+def fixture(root, args):
+    if shutil.which('ffmpeg'):
+        from test_parallel_streams import ffmpeg_fixture
+        return ffmpeg_fixture(root)
+    return os.urandom(int(args.video * MiB)), os.urandom(int(args.audio * MiB))
+
+
+def run(video, audio, concurrent, rate):
+    with LocalMediaServer({'/v.mp4': video, '/a.m4a': audio}, per_connection_rate=rate) as server, \
+            tempfile.TemporaryDirectory() as root:
+        info = {
+            'id': 'clip', 'title': 'Bench Clip', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': server.url('/v.mp4'),
+            'formats': [
+                {'format_id': '137', 'url': server.url('/v.mp4'), 'ext': 'mp4', 'filesize': len(video),
+                 'vcodec': 'avc1', 'acodec': 'none', 'height': 1080},
+                {'format_id': '140', 'url': server.url('/a.m4a'), 'ext': 'm4a', 'filesize': len(audio),
+                 'vcodec': 'none', 'acodec': 'mp4a'},
+            ],
+        }
+        dl = YouTubeDownloader(root, connections=1, parallel_streams=concurrent)
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()), contextlib.redirect_stderr(io.StringIO()):
+            if shutil.which('ffmpeg'):
+                result = dl.download_video(info['webpage_url'], info=info)
+                assert result.ok, result
+            else:
+                formats = dl.component_formats(info, 'bestvideo+bestaudio/best')
+                dl.download_streams(info['webpage_url'], info, formats,
+                                    os.path.join(dl.video_path, 'Bench Clip.%(ext)s'), concurrent=concurrent)
+        return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument('--video', type=float, default=16, help="video stream size in MiB (without ffmpeg)")
+    parser.add_argument('--audio', type=float, default=4, help="audio stream size in MiB (without ffmpeg)")
+    parser.add_argument('--rate', type=float, default=2, help="per-connection limit in MiB/s")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as root:
+        video, audio = fixture(root, args)
+    rate = args.rate * MiB
+    what = "fetch + merge" if shutil.which('ffmpeg') else "fetch only (no ffmpeg)"
+    print(f"video {len(video) / MiB:.1f} MiB + audio {len(audio) / MiB:.1f} MiB at {args.rate:g} MiB/s "
+          f"per connection, {what}")
+    sequential = run(video, audio, False, rate)
+    concurrent = run(video, audio, True, rate)
+    print(f"sequential {sequential:6.2f} s")
+    print(f"concurrent {concurrent:6.2f} s   ({sequential / concurrent:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
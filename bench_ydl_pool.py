@@ -0,0 +1,64 @@
+# Per-job YoutubeDL setup: a fresh instance per call (the original code)
+# versus instances borrowed from ydl_pool.YDLPool, on a loop of cached
+# extractions resolved locally (format selection, no network).
+# Run: python bench_ydl_pool.py
+import tempfile
+import time
+
+import yt_dlp
+
+from downloader_logic import YouTubeDownloader
+from ydl_pool import YDLPool
+
+JOBS = 200
+FORMATS = [{'format_id': str(100 + n), 'url': f'http://127.0.0.1/{n}.mp4', 'ext': 'mp4',
+            'height': 144 * (1 + n % 8), 'tbr': 100 + n, 'vcodec': 'avc1', 'acodec': 'mp4a.40.2'}
+           for n in range(40)]
+
+
+def info_for(n):
+    return {'id': f'v{n}', 'title': f'Clip {n}', 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': f'http://127.0.0.1/watch/{n}', 'formats': FORMATS}
+
+
+def options(n):
+    return {'quiet': True, 'no_warnings': True, 'format': 'best[height<=720]',
+            'outtmpl': f'/tmp/bench/Clip {n}.%(ext)s', 'progress_hooks': [lambda d: None]}
+
+
+def run(make):
+    setup = total = 0.0
+    for n in range(JOBS):
+        start = time.perf_counter()
+        with make(options(n)) as ydl:
+            ready = time.perf_counter()
+            ydl.process_ie_result(ydl.sanitize_info(info_for(n), True), download=False)
+        setup += ready - start
+        total += time.perf_counter() - start
+    return setup / JOBS, total / JOBS
+
+
+def main():
+    # Warm imports and the lazy extractor list once for both
+    yt_dlp.YoutubeDL({'quiet': True}).close()
+    fresh = run(yt_dlp.YoutubeDL)
+    pool = YDLPool()
+    pooled = run(pool.borrow)
+
+    # The same through the downloader: a cached info dict, format resolution only
+    with tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root)
+        start = time.perf_counter()
+        for n in range(JOBS):
+            dl.component_formats(info_for(n), 'bv*+ba/b')
+        through = (time.perf_counter() - start) / JOBS
+
+    print(f"{JOBS} cached extractions, {len(FORMATS)} formats each")
+    print(f"new YoutubeDL per job: setup {fresh[0] * 1e3:7.2f} ms/job, total {fresh[1] * 1e3:7.2f} ms/job")
+    print(f"pooled instances:      setup {pooled[0] * 1e3:7.2f} ms/job, total {pooled[1] * 1e3:7.2f} ms/job"
+          f"   ({pool.created} created, {pool.reused} reused)")
+    print(f"downloader.component_formats with the pool: {through * 1e3:7.2f} ms/job")
+
+
+if __name__ == "__main__":
+    main()
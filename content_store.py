@@ -0,0 +1,218 @@
+import hashlib
+import os
+import sys
+import threading
+
+from progress import format_size
+
+# Store folder inside the download folder, so links stay on one filesystem
+STORE_DIR = '.store'
+ALGORITHM = 'sha256'
+READ_BLOCK = 1024 * 1024
+
+# Linux ioctl that makes dst share src's extents (btrfs, xfs, ...)
+_FICLONE = 0x40049409
+
+
+def reflink(src, dst):
+    """
+    Copy-on-write clone of src at dst; OSError where unsupported.
+    """
+    if not sys.platform.startswith('linux'):
+        raise OSError("reflinks need Linux")
+    import fcntl
+    with open(src, 'rb') as s, open(dst, 'wb') as d:
+        try:
+            fcntl.ioctl(d.fileno(), _FICLONE, s.fileno())
+        except OSError:
+            d.close()
+            os.remove(dst)
+            raise
+
+
+class StreamHasher:
+    """
+    yt-dlp progress hook that hashes every file while it is being written:
+    each time another min_read bytes have landed it reads just those (still
+    in the page cache) from the .part file, and the rest once the file is
+    finished. Finished digests wait in pop() under the final file name.
+    Files yt-dlp only reports as already present are never read; a
+    download that errors, or is cancelled (discard()), is dropped.
+    """
+
+    def __init__(self, algorithm=ALGORITHM, min_read=READ_BLOCK):
+        self.algorithm = algorithm
+        self.min_read = min_read
+        self.bytes_read = 0
+        self._open = {}      # final path -> [hash, bytes hashed]
+        self._done = {}      # final path -> (hex digest, size)
+        self._lock = threading.Lock()
+
+    def __call__(self, d):
+        status = d.get('status')
+        if status not in ('downloading', 'finished', 'error') or not d.get('filename'):
+            return
+        key = os.path.abspath(d['filename'])
+        if status == 'error':
+            with self._lock:
+                self._open.pop(key, None)
+            return
+        with self._lock:
+            state = self._open.get(key)
+            if state is None:
+                if status == 'finished':
+                    return
+                state = self._open[key] = [hashlib.new(self.algorithm), 0]
+        if status == 'downloading':
+            if (d.get('downloaded_bytes') or 0) - state[1] >= self.min_read:
+                self._catch_up(state, d.get('tmpfilename') or d['filename'])
+            return
+        # yt-dlp renamed the .part file before reporting "finished"
+        self._catch_up(state, d['filename'])
+        with self._lock:
+            self._open.pop(key, None)
+            self._done[key] = (state[0].hexdigest(), state[1])
+
+    def _catch_up(self, state, path):
+        try:
+            with open(path, 'rb') as f:
+                if os.fstat(f.fileno()).st_size < state[1]:
+                    # The download restarted from scratch (no resume support)
+                    state[0], state[1] = hashlib.new(self.algorithm), 0
+                f.seek(state[1])
+                while True:
+                    block = f.read(READ_BLOCK)
+                    if not block:
+                        break
+                    state[0].update(block)
+                    state[1] += len(block)
+                    self.bytes_read += len(block)
+        except OSError:
+            pass
+
+    def pop(self, path):
+        """
+        (hex digest, size) of the finished file at path, or None if it was
+        not streamed through this hook.
+        """
+        with self._lock:
+            return self._done.pop(os.path.abspath(path), None)
+
+    def discard(self, stem):
+        """
+        Drops every file of the download whose output path without
+        extension is stem ("<stem>.<ext>", "<stem>.f<id>.<ext>").
+        """
+        prefix = os.path.abspath(stem) + '.'
+        with self._lock:
+            for files in (self._open, self._done):
+                for key in [k for k in files if k.startswith(prefix) and os.sep not in k[len(prefix):]]:
+                    del files[key]
+
+
+class ContentStore:
+    """
+    Content-addressed store under root: every distinct file is kept once as
+    objects/<ab>/<digest>, and the user-facing files are hardlinks to it
+    (or copy-on-write reflinks with reflinks=True, where the filesystem has
+    them; editing one copy then leaves the others alone). The store must be
+    on the same filesystem as the output folders.
+
+    report() walks the store once and then keeps running totals, so files
+    deleted by hand are only noticed on the next start.
+    """
+
+    def __init__(self, root, reflinks=False):
+        self.root = root
+        self.reflinks = reflinks
+        self.ingested = 0
+        self.deduplicated = 0
+        self.reflinked_bytes = 0
+        self.unlinkable = 0
+        self._totals = None  # [objects, stored bytes, bytes saved by hardlinks]
+        self._lock = threading.Lock()
+
+    def object_path(self, digest):
+        return os.path.join(self.root, 'objects', digest[:2], digest)
+
+    def ingest(self, path, digest):
+        """
+        Files path under digest. If the store already has that content, path
+        becomes another link to it and True is returned.
+        """
+        obj = self.object_path(digest)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        with self._lock:
+            totals = self._count()
+            self.ingested += 1
+            if not os.path.exists(obj):
+                try:
+                    self._link(path, obj)
+                except OSError:
+                    self.unlinkable += 1
+                    return False
+                totals[0] += 1
+                totals[1] += os.path.getsize(obj)
+                return False
+            if os.path.samefile(obj, path):
+                return False
+            tmp = f"{path}.dedup"
+            try:
+                reflinked = self._link(obj, tmp)
+            except OSError:
+                self.unlinkable += 1
+                return False
+            os.replace(tmp, path)
+            self.deduplicated += 1
+            if reflinked:
+                self.reflinked_bytes += os.path.getsize(obj)
+            else:
+                totals[2] += os.path.getsize(obj)
+            return True
+
+    def _link(self, src, dst):
+        """
+        Links dst to src; True if it is a reflink rather than a hardlink.
+        """
+        if self.reflinks:
+            try:
+                reflink(src, dst)
+                return True
+            except OSError:
+                pass
+        os.link(src, dst)
+        return False
+
+    def _count(self):
+        # Walks the store on first use; ingest() keeps the totals after that
+        if self._totals is None:
+            totals = [0, 0, 0]
+            for folder, _, files in os.walk(os.path.join(self.root, 'objects')):
+                for name in files:
+                    st = os.stat(os.path.join(folder, name))
+                    totals[0] += 1
+                    totals[1] += st.st_size
+                    totals[2] += max(st.st_nlink - 2, 0) * st.st_size
+            self._totals = totals
+        return self._totals
+
+    def report(self):
+        """
+        Objects stored, their size, and bytes saved: every hardlink beyond
+        the first user-facing copy, plus reflinks made in this process.
+        """
+        with self._lock:
+            objects, stored, saved = self._count()
+            return {
+                'objects': objects,
+                'stored_bytes': stored,
+                'bytes_saved': saved + self.reflinked_bytes,
+                'ingested': self.ingested,
+                'deduplicated': self.deduplicated,
+                'unlinkable': self.unlinkable,
+            }
+
+    def summary(self):
+        report = self.report()
+        return (f"dedup: {report['ingested']} files, {report['deduplicated']} linked to existing copies, "
+                f"{format_size(report['bytes_saved']) if report['bytes_saved'] else '0B'} saved")
@@ -0,0 +1,221 @@
+# Headless entry point: python -m downloader {download,submit,jobs,serve,archive} ...
+# Never imports customtkinter, PIL or flet, and only imports yt_dlp once a
+# command actually downloads, so --help and submit return immediately.
+import argparse
+import json
+import os
+import signal
+import sys
+import threading
+import time
+import uuid
+
+import bandwidth
+import batch
+import tracing
+import transport
+from archive import ANY_PROFILE, DEFAULT_ARCHIVE
+from profiles import PROFILES
+
+DEFAULT_STATE_DIR = os.path.join(os.path.expanduser("~"), ".youtube_scraper")
+
+
+def _inbox(state_dir):
+    return os.path.join(state_dir, 'inbox')
+
+
+def cmd_download(args):
+    if not args.urls and not args.file:
+        print("download: no URLs given", file=sys.stderr)
+        return 2
+    return batch.run(args)
+
+
+def cmd_submit(args):
+    """
+    Drops one job file per URL into the daemon's inbox (write-then-rename,
+    so the daemon never sees a half-written file).
+    """
+    inbox = _inbox(args.state_dir)
+    os.makedirs(inbox, exist_ok=True)
+    kind = 'audio' if args.audio else 'video'
+    for url in batch.iter_sources(args.urls, args.file):
+        name = f"{time.time():.6f}-{uuid.uuid4().hex[:8]}.json"
+        tmp = os.path.join(inbox, f".{name}.tmp")
+        with open(tmp, 'w', encoding='utf-8') as f:
+            data = {'kind': kind, 'url': url, 'priority': args.priority}
+            options = batch.job_options(args)
+            if options:
+                data['options'] = options
+            json.dump(data, f)
+        os.replace(tmp, os.path.join(inbox, name))
+        print(f"queued {kind}: {url}")
+    return 0
+
+
+def cmd_jobs(args):
+    path = os.path.join(args.state_dir, 'jobs.json')
+    if not os.path.exists(path):
+        print("no jobs")
+        return 0
+    with open(path, encoding='utf-8') as f:
+        for job in json.load(f):
+            print(f"{job['job_id']}  {job['state']:<9} {job['progress'] * 100:5.1f}%  {job['kind']:<9} {job['url']}")
+    return 0
+
+
+def _drain_inbox(inbox, jobs):
+    for name in sorted(os.listdir(inbox)):
+        if not name.endswith('.json') or name.startswith('.'):
+            continue
+        path = os.path.join(inbox, name)
+        try:
+            with open(path, encoding='utf-8') as f:
+                data = json.load(f)
+            jobs.submit(data['kind'], data['url'], data.get('priority', 0), **data.get('options', {}))
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Bad job file {name}: {e}")
+        os.remove(path)
+
+
+def cmd_archive(args):
+    """
+    Moves download archive entries in and out as text, e.g. to seed it from
+    an existing yt-dlp --download-archive file.
+    """
+    from archive import DownloadArchive
+
+    archive = DownloadArchive(args.archive)
+    try:
+        if args.action == 'count':
+            print(len(archive))
+        elif args.action == 'export':
+            if args.file == '-':
+                archive.export(sys.stdout, ytdlp=args.ytdlp)
+            else:
+                with open(args.file, 'w', encoding='utf-8') as f:
+                    print(f"exported {archive.export(f, ytdlp=args.ytdlp)} entries", file=sys.stderr)
+        else:
+            if args.file == '-':
+                count = archive.import_(sys.stdin, args.profile)
+            else:
+                with open(args.file, encoding='utf-8') as f:
+                    count = archive.import_(f, args.profile)
+            print(f"imported {count} entries", file=sys.stderr)
+    finally:
+        archive.close()
+    return 0
+
+
+def cmd_serve(args):
+    """
+    Long-lived daemon: runs the persistent job queue and picks up jobs
+    dropped into the inbox by "submit". With --http it also serves the job
+    API and progress feed. Stops cleanly on SIGINT/SIGTERM; unfinished jobs
+    resume on the next start.
+    """
+    from archive import DownloadArchive
+    from content_store import STORE_DIR, ContentStore
+    from downloader_logic import YouTubeDownloader
+    from job_queue import JobQueue
+
+    os.makedirs(_inbox(args.state_dir), exist_ok=True)
+    last_state = {}
+
+    def log(job):
+        if last_state.get(job.job_id) != job.state:
+            last_state[job.job_id] = job.state
+            suffix = f": {job.result}" if job.result else ""
+            print(f"[{job.state}] {job.kind} {job.url}{suffix}", flush=True)
+
+    transport.from_args(args)
+    archive = DownloadArchive(args.archive) if args.archive else None
+    # With --http the rate can be changed at runtime, so keep a governor
+    governor = bandwidth.from_args(args, always=bool(args.http))
+    downloader = YouTubeDownloader(args.output, connections=args.connections, archive=archive,
+                                   bandwidth=governor, tracer=tracing.from_args(args))
+    if args.dedup:
+        downloader.content_store = ContentStore(os.path.join(downloader.base_path, STORE_DIR))
+    jobs = JobQueue(downloader, workers=args.workers,
+                    state_path=os.path.join(args.state_dir, 'jobs.json'), listener=log)
+
+    stop = threading.Event()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(sig, lambda *_: stop.set())
+
+    server = None
+    if args.http:
+        from http_api import JobServer
+        host, _, port = args.http.rpartition(':')
+        server = JobServer(jobs, host or '127.0.0.1', int(port))
+        server.start()
+        print(f"Job API listening on {server.address}", flush=True)
+
+    jobs.start()
+    print(f"Serving jobs from {args.state_dir} with {args.workers} workers", flush=True)
+    while not stop.is_set():
+        _drain_inbox(_inbox(args.state_dir), jobs)
+        stop.wait(args.poll)
+    if server:
+        server.stop()
+    jobs.stop(wait=False)
+    if args.trace:
+        downloader.tracer.write(args.trace)
+    return 0
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="downloader", description="Headless YouTube downloader.")
+    parser.add_argument('--state-dir', default=DEFAULT_STATE_DIR, help=f"queue state folder (default: {DEFAULT_STATE_DIR})")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p = sub.add_parser('download', help="download URLs/playlists now and exit")
+    batch.add_arguments(p)
+    p.set_defaults(func=cmd_download)
+
+    p = sub.add_parser('submit', help="queue URLs for a running daemon")
+    p.add_argument('urls', nargs='*', help="URLs ('-' reads stdin)")
+    p.add_argument('-f', '--file', action='append', default=[], help="file with one URL per line")
+    p.add_argument('--audio', action='store_true', help="download audio instead of video")
+    p.add_argument('--priority', type=int, default=0, help="higher runs first")
+    p.add_argument('--profile', choices=sorted(PROFILES), help="output profile (see download --help)")
+    p.add_argument('--pass', dest='passes', action='append', default=[], metavar='NAME',
+                   help="extra post-processing pass: metadata, embed_thumbnail, loudnorm")
+    batch.add_format_arguments(p)
+    p.set_defaults(func=cmd_submit)
+
+    p = sub.add_parser('jobs', help="list queued jobs")
+    p.set_defaults(func=cmd_jobs)
+
+    p = sub.add_parser('serve', help="run as a daemon")
+    p.add_argument('-o', '--output', help="download folder (default: ~/Downloads)")
+    p.add_argument('-j', '--workers', type=int, default=2, help="parallel jobs")
+    p.add_argument('-c', '--connections', type=int, help="parallel connections per download (default: tuned from throughput)")
+    p.add_argument('--poll', type=float, default=0.5, help="inbox poll interval in seconds")
+    p.add_argument('--http', metavar='[HOST:]PORT', help="serve the job API, e.g. 127.0.0.1:8765")
+    p.add_argument('--archive', nargs='?', const=DEFAULT_ARCHIVE, metavar='FILE',
+                   help=f"skip videos recorded in this download archive (default: {DEFAULT_ARCHIVE})")
+    p.add_argument('--dedup', action='store_true',
+                   help="keep identical files once, under OUTPUT/.store, and hardlink the copies")
+    transport.add_arguments(p)
+    bandwidth.add_arguments(p)
+    tracing.add_arguments(p)
+    p.set_defaults(func=cmd_serve)
+
+    p = sub.add_parser('archive', help="import/export the download archive")
+    p.add_argument('action', choices=('import', 'export', 'count'))
+    p.add_argument('file', nargs='?', default='-', help="text file, one \"extractor id [profile]\" per line ('-' for stdin/stdout)")
+    p.add_argument('--archive', default=DEFAULT_ARCHIVE, metavar='FILE', help=f"archive database (default: {DEFAULT_ARCHIVE})")
+    p.add_argument('--profile', default=ANY_PROFILE, help="profile for imported yt-dlp archive lines (default: any)")
+    p.add_argument('--ytdlp', action='store_true', help="export in yt-dlp --download-archive format")
+    p.set_defaults(func=cmd_archive)
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    return args.func(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
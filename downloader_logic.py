@@ -1,9 +1,50 @@
-import yt_dlp
+import importlib
 import os
-import re
+import threading
+import time
+from contextlib import nullcontext
+from content_store import StreamHasher
+from congestion import CongestionController
+from format_index import format_index
+from info_cache import InfoCache, canonical_video_id
+from metrics import JobTimings, Metrics
+from output_index import OutputIndex, partial_files
+from parallel import DEFAULT_CHUNK_SIZE, RANGE_PARAM_HOSTS, ConnectionTuner, chunk_formats
+from postprocess import PostProcessor, download_options, then
+from profiles import CodecReport, get_profile
+from progress import DEFAULT_HZ, RateLimiter
+from records import DownloadResult, Phase, ProgressSnapshot
+from thumbnails import ThumbnailCache, thumbnail_ext
+from tools import probe
+from tracing import NULL_TRACER
+from transport import HTTPError, default_client
+from ydl_pool import YDLPool
+
+
+class _LazyModule:
+    """
+    Imports the named module on first attribute access. yt_dlp takes a large
+    share of startup time, and headless commands like --help never need it.
+    """
+
+    def __init__(self, name):
+        self._name = name
+        self._module = None
+
+    def __getattr__(self, attr):
+        if self._module is None:
+            self._module = importlib.import_module(self._name)
+        return getattr(self._module, attr)
+
+
+yt_dlp = _LazyModule('yt_dlp')
 
 class YouTubeDownloader:
-    def __init__(self, download_path=None):
+    def __init__(self, download_path=None, on_extract=None, info_cache=None, progress_hz=DEFAULT_HZ,
+                 connections=None, chunk_size=DEFAULT_CHUNK_SIZE, range_param_hosts=RANGE_PARAM_HOSTS,
+                 parallel_streams=True, postprocessor=None, ffmpeg=None, output_index=None, archive=None,
+                 content_store=None, thumbnails=None, http_client=None, ydl_pool=None,
+                 bandwidth=None, congestion=None, metrics=None, tracer=None):
         if download_path:
              self.base_path = download_path
         else:
@@ -20,264 +61,824 @@ class YouTubeDownloader:
                 except Exception as e:
                     print(f"Error creating dir {p}: {e}")
 
-    def get_video_info(self, url):
+        # Extraction accounting: every network extraction goes through
+        # extract_info(), so this counter tells how many ran per job.
+        self.extraction_count = 0
+        self.on_extract = on_extract
+        self._extract_lock = threading.Lock()
+
+        # Any object with get(url)/put(url, info)/invalidate(url) can be plugged in
+        self.info_cache = info_cache if info_cache is not None else InfoCache()
+
+        # Max progress callbacks per second per download
+        self.progress_hz = progress_hz
+
+        # Parallel connections per download: a fixed count, or None to let the
+        # tuner pick one from measured throughput. Large progressive formats
+        # are split into chunk_size range fragments fetched concurrently.
+        self.connections = connections
+        self.tuner = ConnectionTuner()
+        # AIMD control per host on top of that: 429/403s halve connections and
+        # concurrent downloads, healthy responses win them back, and a
+        # throttling storm trips a breaker that holds new downloads
+        self.congestion = congestion or CongestionController()
+        self.chunk_size = chunk_size
+        self.range_param_hosts = range_param_hosts
+
+        # Fetch the video and audio streams of a merged format at the same
+        # time and merge as soon as both are complete
+        self.parallel_streams = parallel_streams
+
+        # Warm YoutubeDL instances per option profile, borrowed for each
+        # extraction, download and post-processing run instead of building a
+        # new one every call
+        self.ydl_pool = ydl_pool or YDLPool()
+
+        # Post-processing stage (mp3 transcode, metadata, thumbnails, loudness):
+        # finished downloads are handed to its bounded ffmpeg pool so the
+        # network slot is free again right away
+        self.postprocessor = postprocessor or PostProcessor(ydl_pool=self.ydl_pool)
+        # Finished downloads per output profile: stream copy vs transcode
+        self.codec_report = CodecReport()
+
+        # FFmpegCapabilities to use; None takes tools.probe(), which runs
+        # ffmpeg once per process and caches what it found
+        self.ffmpeg = ffmpeg
+
+        # Output directory index: lists each folder once and hands out
+        # unique names atomically across worker threads
+        self.output_index = output_index or OutputIndex()
+
+        # Optional DownloadArchive: videos already done in the requested
+        # profile are skipped before any extraction
+        self.archive = archive
+
+        # Optional ContentStore: files saved as downloaded (no merge, transcode
+        # or pass) are hashed while they stream in, and identical ones end up
+        # as links to one stored copy
+        self.content_store = content_store
+        self.stream_hasher = StreamHasher()
+
+        # Shared HTTP transport (timeouts, retries, proxy, rate limit); yt-dlp
+        # gets the same settings through its options
+        self.http = http_client or default_client()
+
+        # Thumbnails by video ID: fetched once for preview and save alike
+        self.thumbnails = thumbnails or ThumbnailCache(client=self.http)
+
+        # Optional BandwidthGovernor: one token bucket for every download,
+        # shared between running jobs by priority weight
+        self.bandwidth = bandwidth
+
+        # Per-phase timings, bytes and retries of every job, exported in the
+        # Prometheus format; each DownloadResult carries its job's summary
+        self.metrics = metrics or Metrics()
+
+        # Optional Tracer: a Chrome trace-event timeline of every job's
+        # stages across all threads; the default records nothing
+        self.tracer = tracer or NULL_TRACER
+
+        # Per-stage concurrency caps (extract / download / postprocess), set by JobQueue
+        self.stage_limits = None
+
+        # Paused direct calls (without a job's resume dict): resume key ->
+        # resolved info, pinned format and output template, so resuming
+        # continues the .part file without re-extracting
+        self.paused_downloads = {}
+
+    def _count_extraction(self, url):
+        with self._extract_lock:
+            self.extraction_count += 1
+        if self.on_extract:
+            self.on_extract(url)
+
+    def extract_info(self, url):
         """
-        Fetches video information and available formats.
+        Runs exactly one metadata extraction for url and returns the info dict.
+        Increments extraction_count and calls on_extract(url) if set.
         """
+        self._count_extraction(url)
+
         ydl_opts = {
+            **self.http.ydl_options(),
             'quiet': True,
             'no_warnings': True,
         }
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+        with self._stage('extract'), self.ydl_pool.borrow(ydl_opts) as ydl, \
+                self.tracer.span('extract_info', 'extract', url=url):
+            started = time.perf_counter()
+            try:
+                return ydl.extract_info(url, download=False)
+            finally:
+                self.metrics.observe('extract', time.perf_counter() - started)
+
+    def iter_entries(self, url):
+        """
+        Yields (video_url, info) for every video behind url without resolving
+        the whole playlist first. Playlists and channels are enumerated flat,
+        page by page as the generator is consumed; nested playlists/tabs are
+        walked recursively. info is the extracted dict when url is a single
+        video and None for playlist entries.
+        """
+        self._count_extraction(url)
+        ydl_opts = {
+            **self.http.ydl_options(),
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+        }
+        with self.ydl_pool.borrow(ydl_opts) as ydl:
+            with self._stage('extract'):
+                result = ydl.extract_info(url, download=False, process=False)
+            yield from self._walk_entries(result, url)
+
+    def _walk_entries(self, result, url):
+        result_type = result.get('_type', 'video')
+        if result_type == 'video':
+            yield url, result
+            return
+        if result_type in ('url', 'url_transparent'):
+            yield from self.iter_entries(result['url'])
+            return
+
+        entries = result.get('entries') or []
+        if isinstance(entries, yt_dlp.utils.PagedList):
+            # Fetch one page window at a time instead of the whole list
+            start, window = 0, 50
+            while True:
+                page = entries.getslice(start, start + window)
+                yield from self._walk_flat(page)
+                if len(page) < window:
+                    return
+                start += window
+        else:
+            yield from self._walk_flat(entries)
+
+    def _walk_flat(self, entries):
+        for entry in entries:
+            if not entry:
+                continue
+            if entry.get('_type') == 'playlist':
+                yield from self._walk_entries(entry, entry.get('webpage_url'))
+            elif entry.get('_type') in ('url', 'url_transparent') and (entry.get('ie_key') or '').endswith(('Tab', 'Playlist')):
+                yield from self.iter_entries(entry['url'])
+            elif entry.get('_type') in ('url', 'url_transparent'):
+                yield entry['url'], None
+            else:
+                yield entry.get('webpage_url') or entry.get('url'), entry
+
+    @staticmethod
+    def _resume_key(kind, url, format_id=None):
+        return (kind, canonical_video_id(url), format_id)
+
+    @staticmethod
+    def _selected_format(info_dict):
+        """
+        Format spec that pins what yt-dlp resolved, e.g. "137+140".
+        """
+        requested = info_dict.get('requested_formats')
+        if requested:
+            return '+'.join(f['format_id'] for f in requested)
+        return info_dict.get('format_id')
+
+    @staticmethod
+    def _pausable(d):
+        """
+        False once every byte has arrived: pausing then would leave a complete
+        .part file that the server can only answer with 416 on resume.
+        """
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        return d['status'] == 'downloading' and not (total and d.get('downloaded_bytes', 0) >= total)
+
+    @staticmethod
+    def _remember_paused(resume, info, ydl_opts, selected):
+        # The info stays in memory only; Job.to_dict() leaves it out
+        if info is not None:
+            resume.update(info=info, format=selected.get('format') or ydl_opts['format'], outtmpl=ydl_opts['outtmpl'])
+
+    def _resume(self, resume, ydl_opts, share=None):
+        """
+        Pins ydl_opts to the format and output name resume recorded for a
+        download that was paused, or interrupted by a crash or restart, so
+        yt-dlp continues its .part file instead of starting over under a new
+        name; the bytes already on disk are not drawn from share again.
+        False for a fresh download.
+        """
+        if not resume or not resume.get('outtmpl'):
+            return False
+        ydl_opts['format'] = resume['format']
+        ydl_opts['outtmpl'] = resume['outtmpl']
+        directory, stem = self._output_stem(resume['outtmpl'])
+        self.output_index.claim(directory, stem)
+        if share is not None:
+            share.skip_existing(partial_files(directory, stem))
+        return True
+
+    @staticmethod
+    def _output_stem(outtmpl):
+        directory, name = os.path.split(outtmpl)
+        return directory, name.rsplit('.%(ext)s', 1)[0]
+
+    @staticmethod
+    def _record_output(resume, ydl_opts):
+        resume.update(format=ydl_opts['format'], outtmpl=ydl_opts['outtmpl'])
+
+    def discard_partial(self, resume):
+        """
+        Deletes the .part, .ytdl and fragment files of a download that will
+        not be resumed (e.g. a cancelled job) and clears resume.
+        """
+        outtmpl = resume.get('outtmpl')
+        resume.clear()
+        if not outtmpl:
+            return
+        for path in partial_files(*self._output_stem(outtmpl)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _stage(self, name):
+        return self.stage_limits.slot(name) if self.stage_limits else nullcontext()
+
+    def _postprocess_hook(self, timings=None):
+        """
+        postprocessor_hooks entry that holds a 'postprocess' slot while ffmpeg
+        runs, times yt-dlp's merge into timings and traces every postprocessor
+        run.
+        """
+        held = []
+        running = {}  # postprocessor -> start time
+
+        def hook(d):
+            name = d.get('postprocessor')
+            if name and d['status'] == 'started':
+                running[name] = time.perf_counter()
+            elif name in running and d['status'] == 'finished':
+                started = running.pop(name)
+                self.tracer.complete(name, 'postprocess', started)
+                if name == 'Merger' and timings is not None:
+                    seconds = time.perf_counter() - started
+                    hook.merge_seconds += seconds
+                    timings.add('merge', seconds)
+            if not self.stage_limits:
+                return
+            if d['status'] == 'started' and not held:
+                self.stage_limits.acquire('postprocess')
+                held.append(True)
+            elif d['status'] == 'finished' and held:
+                held.pop()
+                self.stage_limits.release('postprocess')
+
+        hook.held = held
+        hook.merge_seconds = 0.0
+        return hook
+
+    def _info_for(self, url, refresh=False):
+        """
+        Returns info for url from the cache, extracting (and caching) on a miss.
+        """
+        if not refresh:
+            info = self.info_cache.get(url)
+            if info is not None:
                 return info
+        info = yt_dlp.YoutubeDL.sanitize_info(self.extract_info(url), True)
+        self.info_cache.put(url, info)
+        return info
+
+    def get_video_info(self, url):
+        """
+        Fetches video information and available formats.
+        Served from info_cache when the video was seen recently.
+        """
+        try:
+            return self._info_for(url)
         except Exception as e:
             print(f"Error fetching info: {e}")
             return None
 
-    def download_video(self, url, format_id=None, progress_callback=None, cancel_check=None):
+    def _unique_title(self, directory, title):
+        """
+        Sanitizes title and reserves it, or "title (n)", in directory: no
+        file there uses the name with any extension, and no other job gets it.
+        """
+        # 简单净化文件名
+        safe_title = "".join([c for c in title if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip()
+        return self.output_index.reserve(directory, safe_title)
+
+    @staticmethod
+    def _output_path(info):
+        """
+        Final file path yt-dlp reports for a processed info dict, if any.
+        """
+        downloads = info.get('requested_downloads') or [{}]
+        return downloads[0].get('filepath') or info.get('filepath')
+
+    @staticmethod
+    def _media_url(info):
+        formats = info.get('requested_formats') or info.get('formats') or [info]
+        return formats[-1].get('url') or info.get('url')
+
+    def _connections_for(self, info):
+        """
+        Parallel connections for this download: fixed, or tuned per host,
+        within the congestion controller's cap for the host.
+        """
+        url = self._media_url(info)
+        return self.congestion.connections(url, self.connections or self.tuner.connections(url))
+
+    def _chunked(self, info):
+        return chunk_formats(info, self.chunk_size, self.range_param_hosts)
+
+    def _throughput_hook(self, connections):
+        """
+        progress_hooks entry that feeds each finished format's throughput to the
+        tuner and the congestion controller.
+        """
+        def hook(d):
+            if d['status'] == 'finished' and d.get('elapsed'):
+                url = (d.get('info_dict') or {}).get('url')
+                nbytes = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                self.tuner.record(url, connections, nbytes, d['elapsed'])
+                self.congestion.record_throughput(url, nbytes, d['elapsed'])
+        return hook
+
+    def _bandwidth_share(self, priority):
+        """
+        The job's Share of the bandwidth governor (a progress hook), or None.
+        """
+        return self.bandwidth.share(priority) if self.bandwidth is not None else None
+
+    def _download_with_info(self, url, info, ydl_opts, measure=True, timings=None, phase=None, hashed=False):
+        """
+        Downloads from an already-extracted info dict via process_ie_result,
+        so no second extraction runs. If the dict is stale (expired stream
+        URLs), extracts once more and retries. Large progressive formats are
+        fetched as parallel range fragments; measure=False keeps a resumed
+        download's skewed timing out of the connection tuner. timings (a
+        metrics.JobTimings) gets the time, bytes and retries as phase, the
+        wait for a download slot and the merge; phase None means the streams
+        are already on disk and only the merge is left. hashed=True streams
+        the file through the content store's hasher (only worth it when no
+        ffmpeg step will rewrite it).
+        """
+        timings = timings or JobTimings(None, None, url)
+        label = phase or 'merge'
+        pp_hook = self._postprocess_hook(timings)
+        connections = self._connections_for(info)
+        ydl_opts = {**self.congestion.ydl_options(), **self.http.ydl_options(), **ydl_opts,
+                    'postprocessor_hooks': [pp_hook], 'concurrent_fragment_downloads': connections}
+        if self.bandwidth is not None:
+            ydl_opts.update(self.bandwidth.ydl_options())
+        if measure:
+            ydl_opts['progress_hooks'] = ydl_opts['progress_hooks'] + [self._throughput_hook(connections)]
+        if hashed and self.content_store is not None:
+            ydl_opts['progress_hooks'] = ydl_opts['progress_hooks'] + [self.stream_hasher]
+        if phase:
+            ydl_opts['progress_hooks'] = ydl_opts['progress_hooks'] + [timings.bytes_hook(phase)]
+        queued = time.perf_counter()
+        started = None
+        try:
+            with self.congestion.slot(self._media_url(info)), self._stage('download'), \
+                    self.ydl_pool.borrow(ydl_opts) as ydl, \
+                    self.congestion.observing(ydl, timings.response_listener(label)), \
+                    self.tracer.observing(ydl), self.tracer.span('download', 'download', phase=label):
+                started = time.perf_counter()
+                timings.add('download_wait', started - queued)
+                try:
+                    return ydl.process_ie_result(self._chunked(ydl.sanitize_info(info, True)), download=True)
+                except yt_dlp.utils.DownloadError as e:
+                    if "Download Cancelled" in str(e) or "HTTP Error 403" not in str(e):
+                        raise
+                timings.retry(label)
+                fresh = self._info_for(url, refresh=True)
+                return ydl.process_ie_result(self._chunked(fresh), download=True)
+        except BaseException:
+            timings.failed_phase = timings.failed_phase or label
+            raise
+        finally:
+            if phase and started is not None:
+                # A merge in the same yt-dlp run is already its own phase
+                timings.add(phase, time.perf_counter() - started - pp_hook.merge_seconds)
+            if pp_hook.held:
+                self.stage_limits.release('postprocess')
+
+    def component_formats(self, info, format_spec, format_sort=None):
+        """
+        Formats yt-dlp would merge for format_spec (e.g. video + audio),
+        or None when the selection is a single file.
+        """
+        opts = {'quiet': True, 'no_warnings': True, 'format': format_spec}
+        if format_sort:
+            opts['format_sort'] = format_sort
+        with self.ydl_pool.borrow(opts) as ydl:
+            resolved = ydl.process_ie_result(ydl.sanitize_info(info, True), download=False)
+        requested = resolved.get('requested_formats')
+        return requested if requested and len(requested) > 1 else None
+
+    @staticmethod
+    def _stream_names(formats):
+        names = {}
+        for f in formats:
+            name = 'audio' if f.get('vcodec') == 'none' else 'video'
+            names[f['format_id']] = name if name not in names.values() else f['format_id']
+        return names
+
+    def download_streams(self, url, info, formats, outtmpl, progress_callback=None, cancel_check=None,
+                         concurrent=True, measure=True, share=None, timings=None):
+        """
+        Downloads the component streams of a merged selection, each on its
+        own thread, to the "<name>.f<format_id>.<ext>" files yt-dlp's merger
+        looks for, so a following download of the merged format goes straight
+        to ffmpeg. progress_callback gets the combined progress with each
+        stream's own snapshot in snapshot.streams. concurrent=False fetches
+        one stream after the other, like yt-dlp does.
+        """
+        base = outtmpl.rsplit('.%(ext)s', 1)[0]
+        names = self._stream_names(formats)
+        streams = {names[f['format_id']]: ProgressSnapshot(0, f.get('filesize') or f.get('filesize_approx'))
+                   for f in formats}
+        lock = threading.Lock()
+        throttle = RateLimiter(self.progress_hz)
+        errors = []
+
+        def hook_for(name):
+            def hook(d):
+                if cancel_check and self._pausable(d) and cancel_check():
+                    raise Exception("Download Cancelled")
+                if d['status'] not in ('downloading', 'finished'):
+                    return
+                snapshot = ProgressSnapshot.from_hook(d)
+                if d['status'] == 'finished':
+                    snapshot.downloaded = snapshot.total = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                with lock:
+                    streams[name] = snapshot
+                    combined = ProgressSnapshot.combine(streams)
+                    ready = d['status'] == 'finished' or throttle.ready()
+                if progress_callback and ready:
+                    progress_callback(combined)
+            return hook
+
+        def fetch(f):
+            opts = {
+                'format': f['format_id'],
+                'outtmpl': f"{base}.f%(format_id)s.%(ext)s",
+                'progress_hooks': [hook_for(names[f['format_id']])] + ([share] if share else []),
+            }
+            phase = 'audio' if f.get('vcodec') == 'none' else 'video'
+            try:
+                self._download_with_info(url, info, opts, measure, timings, phase)
+            except Exception as e:
+                errors.append(e)
+
+        if concurrent:
+            threads = [threading.Thread(target=fetch, args=(f,), daemon=True) for f in formats]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        else:
+            for f in formats:
+                fetch(f)
+        if errors:
+            # A pause stops every stream; report it rather than a follow-up error
+            cancelled = [e for e in errors if "Download Cancelled" in str(e)]
+            raise (cancelled or errors)[0]
+
+    def _ffmpeg(self):
+        """
+        Capabilities of the ffmpeg on this machine; probed once and cached.
+        """
+        return self.ffmpeg or probe()
+
+    def _done(self, kind, profile, info, passes, path, ext, converted=False):
+        """
+        DownloadResult for a finished download, noting in codec_report
+        whether the profile's file came from a stream copy or a transcode.
+        """
+        transcoded = profile.transcodes(info, passes)
+        self.codec_report.record(profile.name, transcoded)
+        if self.archive is not None:
+            self.archive.record(info, profile.name, path)
+        if self.content_store is not None:
+            self._store(info, passes, path)
+        return DownloadResult.done(kind, path, ext, converted, profile.name, transcoded)
+
+    def _content_digest(self, info, passes, path):
+        """
+        Store digest of the finished file at path, taken while it streamed
+        in. None for a file ffmpeg made or rewrote (merge, passes, fixups)
+        or one that was already on disk: only stream copies are
+        deduplicated, so no file is ever read a second time.
+        """
+        download = (info.get('requested_downloads') or [info])[0]
+        components = download.get('requested_formats') or ()
+        sources = [f.get('filepath') for f in components] if len(components) > 1 else [download.get('filepath')]
+        digests = [self.stream_hasher.pop(source) if source else None for source in sources]
+        if passes or len(digests) != 1 or digests[0] is None:
+            return None
+        if os.path.abspath(sources[0]) != os.path.abspath(path):
+            return None
+        digest, size = digests[0]
+        # Same size as streamed, so no fixup rewrote it in between
+        return digest if os.path.getsize(path) == size else None
+
+    def _store(self, info, passes, path):
+        try:
+            digest = self._content_digest(info, passes, path)
+            if digest is not None:
+                self.content_store.ingest(path, digest)
+        except OSError as e:
+            print(f"Content store skipped {path}: {e}")
+
+    def _archived(self, url, profile, info=None):
+        """
+        Archive entry of the video in profile, or None when it was never
+        downloaded that way (or there is no archive).
+        """
+        if self.archive is None:
+            return None
+        return self.archive.find(url, profile.name, info)
+
+    def _hand_off(self, kind, info, passes, ydl_opts, wait, make_result, timings):
+        """
+        Sends the downloaded file through passes on the post-processing stage
+        (the download slot is already released). Returns the DownloadResult,
+        or a Future of it when wait is False.
+        """
+        options = {'ffmpeg_location': ydl_opts['ffmpeg_location']} if ydl_opts.get('ffmpeg_location') else {}
+
+        def timer(name, seconds):
+            timings.add('postprocess_wait' if name == 'wait' else 'transcode', seconds)
+            if name != 'wait':
+                # Called on the post-processing worker right after the pass
+                self.tracer.complete(name, 'postprocess', time.perf_counter() - seconds)
+
+        future = then(self.postprocessor.submit(self._output_path(info), info, passes, options, timer),
+                      make_result, lambda e: DownloadResult.failed(kind, e))
+        return future.result() if wait else future
+
+    def download_video(self, url, format_id=None, progress_callback=None, cancel_check=None, info=None,
+                       passes=None, wait=True, profile=None, format_query=None, priority=0, resume=None):
         """
         Downloads video with specific format.
-        If format_id is None, downloads best quality.
+        If format_id is None, downloads best quality, or the best match of
+        format_query (FormatIndex.videos() arguments, e.g. {'max_height': 1080,
+        'codec': 'avc1', 'max_size': 500e6}) when given.
+        Pass info (from get_video_info) to skip extraction entirely;
+        otherwise exactly one extraction runs. A paused download resumes
+        from its .part file with the same formats and output name. resume is
+        a dict kept per job (JobQueue persists it): the output name is
+        recorded there once chosen, so a rerun after a crash continues the
+        same .part file.
+        progress_callback receives ProgressSnapshot records; returns a
+        DownloadResult. profile names an output profile (see profiles.py).
+        priority weighs the download's share of the bandwidth governor.
         """
+        profile = get_profile(profile, 'video')
+        progress_callback = self.tracer.wrap(progress_callback, 'progress')
+        resume_key = self._resume_key('video', url, format_id)
+        own_resume = resume is None
+        if own_resume:
+            resume = self.paused_downloads.pop(resume_key, None) or {}
+        selected = {}
         
+        throttle = RateLimiter(self.progress_hz)
+
         def progress_hook(d):
-            if cancel_check and cancel_check():
+            if 'format' not in selected:
+                selected['format'] = self._selected_format(d.get('info_dict') or {})
+            if cancel_check and self._pausable(d) and cancel_check():
                 raise Exception("Download Cancelled")
 
             if d['status'] == 'downloading':
-                if progress_callback:
-                    # Clean percent string
-                    p_str = d.get('_percent_str', '0%').strip()
-                    try:
-                        p_match = re.search(r"(\d+\.?\d*)", p_str)
-                        if p_match:
-                            val = float(p_match.group(1))
-                            p = val / 100.0
-                        else:
-                            p = 0.0
-                        
-                        # Clean ETA string
-                        raw_eta = d.get('_eta_str', '')
-                        eta = raw_eta.strip()
-                        
-                        # Check if it looks like a time (e.g. 01:05, 10:20:30)
-                        if not re.match(r"^\d+:\d+", eta):
-                             eta = "Unknown"
-                        
-                        # Construct detailed status string
-                        # Format: [download]  52.1% of    2.56GiB at  326.73KiB/s ETA 01:05:27
-                        # Strip ANSI codes using regex
-                        ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-                        
-                        total_bytes_str = ansi_escape.sub('', d.get('_total_bytes_str') or d.get('_total_bytes_estimate_str') or "Unknown size")
-                        speed_str = ansi_escape.sub('', d.get('_speed_str') or "Unknown speed")
-                        eta_str = ansi_escape.sub('', d.get('_eta_str') or eta)
-                        percent_str_clean = ansi_escape.sub('', p_str)
-                        
-                        status_msg = f"[download] {percent_str_clean} of {total_bytes_str} at {speed_str} ETA {eta_str}"
-                        
-                        progress_callback(p, status_msg)
-                    except Exception as e:
-                       print(f"Progress error: {e}")
+                # Numeric fields only, at most progress_hz callbacks per second
+                if progress_callback and throttle.ready():
+                    progress_callback(ProgressSnapshot.from_hook(d))
             elif d['status'] == 'finished':
                 if progress_callback:
-                    progress_callback(1.0, "处理中...")
+                    progress_callback(ProgressSnapshot(phase=Phase.MERGING))
 
-        # Check for local ffmpeg first, then system path
-        import shutil
-        ffmpeg_local = os.path.join(os.getcwd(), 'ffmpeg.exe')
-        has_ffmpeg = os.path.exists(ffmpeg_local) or shutil.which('ffmpeg') is not None
-        ffmpeg_location = ffmpeg_local if os.path.exists(ffmpeg_local) else None
+        ffmpeg = self._ffmpeg()
+        has_ffmpeg = ffmpeg.available
 
         ydl_opts = {
             'outtmpl': os.path.join(self.video_path, '%(title)s.%(ext)s'),
             'progress_hooks': [progress_hook],
-            'merge_output_format': 'mp4',
+            **profile.ydl_options(),
         }
         
-        if ffmpeg_location:
-            ydl_opts['ffmpeg_location'] = ffmpeg_location
+        if ffmpeg.available:
+            ydl_opts['ffmpeg_location'] = ffmpeg.location
 
-        if format_id:
-            ydl_opts['format'] = f"{format_id}+bestaudio/best"
-        else:
-            ydl_opts['format'] = 'bestvideo+bestaudio/best'
+        passes = list(passes or [])
+        ydl_opts.update(download_options(passes))
+
+        ydl_opts['format'] = profile.video_selector(format_id)
+
+        timings = self.metrics.start('video', url)
+        share = self._bandwidth_share(priority)
+        if share is not None:
+            ydl_opts['progress_hooks'].append(share)
 
         try:
-            # 1. 先获取标题，计算唯一文件名，防止跳过
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl_temp:
-                info = ydl_temp.extract_info(url, download=False)
-                base_title = info.get('title', 'video')
-                
-                # 简单净化文件名
-                safe_title = "".join([c for c in base_title if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip()
-                
-                # 检测文件名冲突
-                final_title = safe_title
-                counter = 1
-                while True:
-                    # 假设最终是 mp4
-                    check_path = os.path.join(self.video_path, f"{final_title}.mp4")
-                    if os.path.exists(check_path):
-                        final_title = f"{safe_title} ({counter})"
-                        counter += 1
-                    else:
-                        break
-            
-            # 更新输出模板为唯一文件名
-            ydl_opts['outtmpl'] = os.path.join(self.video_path, f"{final_title}.%(ext)s")
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-            return "视频下载完成"
+            resumed = self._resume(resume, ydl_opts, share)
+            if resumed:
+                # 继续已暂停的任务：沿用原来的 info、格式和文件名，从 .part 断点续传
+                info = resume.get('info') or info
+                if info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+            else:
+                # Archived already: one lookup, no extraction or download
+                entry = self._archived(url, profile, info)
+                if entry is None and info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+                    entry = self._archived(url, profile, info)
+                if entry is not None:
+                    return self.metrics.finish(timings, DownloadResult.skipped('video', entry['path'], profile.name))
+                if format_query and not format_id:
+                    # No match keeps the profile's default selection
+                    ydl_opts['format'] = profile.video_selector(format_index(info).select('video', format_query))
+                # 1. 计算唯一文件名，防止跳过
+                with timings.phase('filename'):
+                    final_title = self._unique_title(self.video_path, info.get('title', 'video'))
+
+                # 更新输出模板为唯一文件名
+                ydl_opts['outtmpl'] = os.path.join(self.video_path, f"{final_title}.%(ext)s")
+                self._record_output(resume, ydl_opts)
+
+            # When ffmpeg can merge, fetch video and audio side by side first;
+            # the download below then finds both files and only merges
+            formats = (self.component_formats(info, ydl_opts['format'], ydl_opts.get('format_sort'))
+                       if has_ffmpeg and (self.parallel_streams or self.content_store is not None) else None)
+            streamed = bool(formats) and self.parallel_streams
+            if streamed:
+                selected['format'] = ydl_opts['format'] = '+'.join(f['format_id'] for f in formats)
+                self.download_streams(url, info, formats, ydl_opts['outtmpl'], progress_callback, cancel_check,
+                                      measure=not resumed, share=share, timings=timings)
+
+            # With the streams on disk only the merge is left to time. Only a
+            # single file no pass rewrites is hashed for the content store
+            info = self._download_with_info(url, info, ydl_opts, not resumed, timings,
+                                            None if streamed else 'video', hashed=not formats and not passes)
+            if passes:
+                result = self._hand_off('video', info, passes, ydl_opts, wait,
+                                        lambda path: self._done('video', profile, info, passes, path, info.get('ext')),
+                                        timings)
+            else:
+                result = self._done('video', profile, info, passes, self._output_path(info), info.get('ext'))
+            return self.metrics.finish(timings, result)
         except Exception as e:
+            self.stream_hasher.discard(os.path.join(*self._output_stem(ydl_opts['outtmpl'])))
             if "Download Cancelled" in str(e):
-                return "已暂停"
-            return f"错误: {e}"
+                self._remember_paused(resume, info, ydl_opts, selected)
+                if own_resume:
+                    self.paused_downloads[resume_key] = resume
+                return self.metrics.finish(timings, DownloadResult.paused('video'))
+            return self.metrics.finish(timings, DownloadResult.failed('video', e))
+        finally:
+            if share is not None:
+                share.close()
 
-    def download_audio(self, url, progress_callback=None, cancel_check=None):
+    def download_audio(self, url, progress_callback=None, cancel_check=None, info=None,
+                       passes=None, wait=True, profile=None, format_query=None, priority=0, resume=None):
         """
-        Downloads audio only. Tries to convert to mp3 if ffmpeg is available,
-        otherwise downloads best available audio format.
+        Downloads audio only. With the default "mp3" profile it converts to
+        mp3 if ffmpeg is available, otherwise keeps the best audio format;
+        other profiles keep the source codec. format_query (FormatIndex.audios()
+        arguments, e.g. {'min_abr': 128, 'smallest': True}) picks the source.
+        Pass info (from get_video_info) to skip extraction entirely.
+        A paused download resumes from its .part file; resume works as for
+        download_video().
         """
-        import shutil
-        
-        # Check for local ffmpeg first, then system path
-        ffmpeg_local = os.path.join(os.getcwd(), 'ffmpeg.exe')
-        has_ffmpeg = os.path.exists(ffmpeg_local) or shutil.which('ffmpeg') is not None
-        
-        ffmpeg_location = ffmpeg_local if os.path.exists(ffmpeg_local) else None
+        profile = get_profile(profile, 'audio')
+        progress_callback = self.tracer.wrap(progress_callback, 'progress')
+        ffmpeg = self._ffmpeg()
+
+        resume_key = self._resume_key('audio', url)
+        own_resume = resume is None
+        if own_resume:
+            resume = self.paused_downloads.pop(resume_key, None) or {}
+        selected = {}
+
+        throttle = RateLimiter(self.progress_hz)
 
         def progress_hook(d):
-            if cancel_check and cancel_check():
+            if 'format' not in selected:
+                selected['format'] = self._selected_format(d.get('info_dict') or {})
+            if cancel_check and self._pausable(d) and cancel_check():
                 raise Exception("Download Cancelled")
 
             if d['status'] == 'downloading':
-                if progress_callback:
-                    p = 0.0
-                    # 1. Try numeric calculation first
-                    total = d.get('total_bytes') or d.get('total_bytes_estimate')
-                    downloaded = d.get('downloaded_bytes')
-                    
-                    if total and downloaded:
-                        p = float(downloaded) / float(total)
-                    
-                    # 2. ETA handling
-                    eta_seconds = d.get('eta')
-                    if eta_seconds is not None:
-                        # Format seconds to HH:MM:SS
-                        m, s = divmod(eta_seconds, 60)
-                        h, m = divmod(m, 60)
-                        if h > 0:
-                            eta_str = f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
-                        else:
-                            eta_str = f"{int(m):02d}:{int(s):02d}"
-                    else:
-                        # Fallback to string (cleaned)
-                        raw_eta = d.get('_eta_str', '')
-                        eta_str = raw_eta.strip()
-
-                        if not re.search(r"\d+:\d+", eta_str):
-                            eta_str = "Unknown"
-                    
-                    # Construct detailed status string
-                    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-                    
-                    percent_str = d.get('_percent_str', f"{p*100:.1f}%")
-                    percent_str_clean = ansi_escape.sub('', percent_str)
-                    
-                    total_bytes_str = ansi_escape.sub('', d.get('_total_bytes_str') or d.get('_total_bytes_estimate_str') or "Unknown size")
-                    speed_str = ansi_escape.sub('', d.get('_speed_str') or "Unknown speed")
-                    eta_str_clean = ansi_escape.sub('', eta_str)
-                    
-                    status_msg = f"[download] {percent_str_clean} of {total_bytes_str} at {speed_str} ETA {eta_str_clean}"
-                    
-                    progress_callback(p, status_msg)
-
+                # Numeric fields only, at most progress_hz callbacks per second
+                if progress_callback and throttle.ready():
+                    progress_callback(ProgressSnapshot.from_hook(d))
             elif d['status'] == 'finished':
                 if progress_callback:
-                    step = "转换中..." if has_ffmpeg else "完成中..."
-                    progress_callback(1.0, step)
+                    phase = Phase.CONVERTING if passes else Phase.FINISHING
+                    progress_callback(ProgressSnapshot(phase=phase))
 
         ydl_opts = {
-            'format': 'bestaudio/best',
+            'format': profile.audio_format,
             'outtmpl': os.path.join(self.audio_path, '%(title)s.%(ext)s'),
             'progress_hooks': [progress_hook],
-            'concurrent_fragment_downloads': 8, # Multi-threaded download
         }
         
-        if ffmpeg_location:
-            ydl_opts['ffmpeg_location'] = ffmpeg_location
+        if ffmpeg.available:
+            ydl_opts['ffmpeg_location'] = ffmpeg.location
+
+        # The profile's audio transcode (mp3 192k by default) and any extra
+        # passes run on the post-processing stage
+        audio_passes = profile.audio_passes(ffmpeg)
+        passes = audio_passes + list(passes or [])
+        ydl_opts.update(download_options(passes))
 
-        if has_ffmpeg:
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
+        timings = self.metrics.start('audio', url)
+        share = self._bandwidth_share(priority)
+        if share is not None:
+            ydl_opts['progress_hooks'].append(share)
 
         try:
-            # 1. 计算唯一文件名
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl_temp:
-                info = ydl_temp.extract_info(url, download=False)
-                base_title = info.get('title', 'audio')
-                safe_title = "".join([c for c in base_title if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip()
-                
-                final_title = safe_title
-                counter = 1
-                while True:
-                    # 音频可能是 mp3
-                    check_path = os.path.join(self.audio_path, f"{final_title}.mp3")
-                    if os.path.exists(check_path):
-                        final_title = f"{safe_title} ({counter})"
-                        counter += 1
-                    else:
-                        break
-
-            ydl_opts['outtmpl'] = os.path.join(self.audio_path, f"{final_title}.%(ext)s")
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True) 
-                ext = info.get('ext', 'audio')
-                if has_ffmpeg:
-                     return "Audio Download Complete (MP3)"
-                else:
-                     return f"Audio Download Complete (Saved as .{ext} - Install FFmpeg for MP3)"
+            resumed = self._resume(resume, ydl_opts, share)
+            if resumed:
+                # 继续已暂停的任务，从 .part 断点续传
+                info = resume.get('info') or info
+                if info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+            else:
+                # Archived already: one lookup, no extraction or download
+                entry = self._archived(url, profile, info)
+                if entry is None and info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+                    entry = self._archived(url, profile, info)
+                if entry is not None:
+                    return self.metrics.finish(timings, DownloadResult.skipped('audio', entry['path'], profile.name))
+                if format_query:
+                    ydl_opts['format'] = format_index(info).select('audio', format_query) or ydl_opts['format']
+                # 1. 计算唯一文件名（检查所有扩展名）
+                with timings.phase('filename'):
+                    final_title = self._unique_title(self.audio_path, info.get('title', 'audio'))
+
+                ydl_opts['outtmpl'] = os.path.join(self.audio_path, f"{final_title}.%(ext)s")
+                self._record_output(resume, ydl_opts)
+
+            info = self._download_with_info(url, info, ydl_opts, not resumed, timings, 'audio',
+                                            hashed=not passes)
+            if passes:
+                result = self._hand_off('audio', info, passes, ydl_opts, wait, lambda path: self._done(
+                    'audio', profile, info, passes, path, os.path.splitext(path)[1][1:], bool(audio_passes)), timings)
+            else:
+                result = self._done('audio', profile, info, passes, self._output_path(info), info.get('ext', 'audio'))
+            return self.metrics.finish(timings, result)
         except Exception as e:
+            self.stream_hasher.discard(os.path.join(*self._output_stem(ydl_opts['outtmpl'])))
             if "Download Cancelled" in str(e):
-                return "已暂停"
-            return f"Error: {e}"
+                self._remember_paused(resume, info, ydl_opts, selected)
+                if own_resume:
+                    self.paused_downloads[resume_key] = resume
+                return self.metrics.finish(timings, DownloadResult.paused('audio'))
+            return self.metrics.finish(timings, DownloadResult.failed('audio', e))
+        finally:
+            if share is not None:
+                share.close()
 
-    def download_thumbnail(self, url):
+    def download_thumbnail(self, url, info=None):
         """
         Downloads the thumbnail for the video.
+        Pass info (from get_video_info) to skip extraction entirely;
+        otherwise the cached info is used. The bytes come from the
+        thumbnail cache, so a thumbnail already shown for preview is not
+        fetched again.
         """
-        import requests
-        
-        info = self.get_video_info(url)
+        timings = self.metrics.start('thumbnail', url)
+        if info is None:
+            with timings.phase('extract', observe=False):
+                info = self.get_video_info(url)
         if not info:
-             return "无法获取信息"
+             return self.metrics.finish(timings, DownloadResult.failed('thumbnail', "无法获取信息"))
         
         thumbnail_url = info.get('thumbnail')
         title = info.get('title', 'thumbnail')
         
         if not thumbnail_url:
-            return "未找到封面"
+            return self.metrics.finish(timings, DownloadResult.failed('thumbnail', "未找到封面"))
 
         try:
-            response = requests.get(thumbnail_url)
-            if response.status_code == 200:
-                # Sanitize filename
-                safe_title = "".join([c for c in title if c.isalpha() or c.isdigit() or c==' ' or c=='_']).rstrip()
-                filename = f"{safe_title}_thumbnail.jpg"
-                path = os.path.join(self.video_path, filename)
-                
-                with open(path, 'wb') as f:
-                    f.write(response.content)
-                return f"封面已下载: {filename}"
-            else:
-                return "下载封面失败"
+            # Sanitize filename
+            safe_title = "".join([c for c in title if c.isalpha() or c.isdigit() or c==' ' or c=='_']).rstrip()
+            ext = thumbnail_ext(thumbnail_url)
+            path = os.path.join(self.video_path, f"{safe_title}_thumbnail.{ext}")
+            with timings.phase('thumbnail'), self.tracer.span('thumbnail', 'download', url=url):
+                self.thumbnails.save(info, path)
+            timings.add_bytes('thumbnail', os.path.getsize(path))
+            result = DownloadResult.done('thumbnail', path, ext)
+        except HTTPError:
+            result = DownloadResult.failed('thumbnail', "下载封面失败")
         except Exception as e:
-            return f"错误: {e}"
+            result = DownloadResult.failed('thumbnail', e)
+        return self.metrics.finish(timings, result)
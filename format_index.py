@@ -0,0 +1,175 @@
+import threading
+from collections import OrderedDict
+from functools import lru_cache
+
+from profiles import codec_family
+
+# Tie-break between video codecs of one height and fps: the most widely
+# playable first ('h264' plays everywhere, 'av1' is smallest)
+VIDEO_CODEC_ORDER = ('h264', 'vp9', 'av1', 'hevc', 'vp8')
+AUDIO_CODEC_ORDER = ('aac', 'opus', 'mp3', 'vorbis', 'flac', 'alac')
+
+
+# A few hundred formats share a handful of codec strings
+_family = lru_cache(maxsize=512)(codec_family)
+
+
+def _rank(order, family):
+    return len(order) - order.index(family) if family in order else 0
+
+
+class FormatEntry:
+    """
+    One format of an info dict with the fields queries look at, parsed once.
+    size is filesize, filesize_approx or bitrate x duration (None if unknown).
+    """
+    __slots__ = ('format_id', 'ext', 'height', 'width', 'fps', 'vcodec', 'acodec',
+                 'tbr', 'abr', 'size', 'has_video', 'has_audio')
+
+    def __init__(self, f, duration=None):
+        self.format_id = f['format_id']
+        self.ext = f.get('ext')
+        self.height = f.get('height') or 0
+        self.width = f.get('width') or 0
+        self.fps = f.get('fps') or 0
+        vcodec, acodec = f.get('vcodec'), f.get('acodec')
+        self.has_video = vcodec != 'none' and (self.height > 0 or vcodec is not None)
+        self.has_audio = acodec != 'none' and (acodec is not None or not self.has_video)
+        self.vcodec = _family(vcodec) if self.has_video else None
+        self.acodec = _family(acodec) if self.has_audio else None
+        self.tbr = f.get('tbr') or 0
+        self.abr = f.get('abr') or (self.tbr if not self.has_video else 0)
+        size = f.get('filesize') or f.get('filesize_approx')
+        if not size and self.tbr and duration:
+            size = int(self.tbr * 1000 / 8 * duration)
+        self.size = size or None
+
+    @property
+    def label(self):
+        fps = self.fps if self.fps > 30 else ''
+        return f"{self.height}p{fps} - {self.ext}"
+
+    def __repr__(self):
+        return f"<FormatEntry {self.format_id} {self.label} {self.vcodec}/{self.acodec} {self.tbr}k>"
+
+
+class FormatIndex:
+    """
+    The formats of one info dict, parsed once and grouped for ranked
+    queries: video formats by height, audio-only formats by bitrate.
+    best_video(max_height=1080, codec='avc1', max_size=500e6) picks the
+    best fitting video; best_audio(min_abr=128, smallest=True) the smallest
+    audio of at least 128k. Formats of unknown size pass size limits.
+    """
+
+    def __init__(self, info):
+        duration = info.get('duration')
+        entries = [FormatEntry(f, duration) for f in info.get('formats') or () if f.get('format_id')]
+        self.video = sorted((e for e in entries if e.has_video and e.height), key=self._video_key, reverse=True)
+        self.audio = sorted((e for e in entries if e.has_audio and not e.has_video), key=self._audio_key,
+                            reverse=True)
+        self.by_height = {}
+        for e in self.video:
+            self.by_height.setdefault(e.height, []).append(e)
+        self.by_id = {e.format_id: e for e in entries}
+
+    @staticmethod
+    def _video_key(e, codec=None):
+        return (e.height, codec is not None and e.vcodec == codec, e.fps,
+                _rank(VIDEO_CODEC_ORDER, e.vcodec), e.tbr)
+
+    @staticmethod
+    def _audio_key(e, codec=None):
+        return (codec is not None and e.acodec == codec, e.abr, _rank(AUDIO_CODEC_ORDER, e.acodec))
+
+    @property
+    def heights(self):
+        return sorted(self.by_height, reverse=True)
+
+    def videos(self, max_height=None, min_height=None, codec=None, ext=None, max_fps=None, max_size=None):
+        """
+        Video formats that fit, best first: highest resolution, then codec
+        when given, then fps, the more playable codec and bitrate.
+        """
+        codec = codec_family(codec) if codec else None
+        heights = [h for h in self.heights
+                   if (max_height is None or h <= max_height) and (min_height is None or h >= min_height)]
+        found = []
+        for h in heights:
+            found.extend(e for e in self.by_height[h]
+                         if (ext is None or e.ext == ext)
+                         and (max_fps is None or e.fps <= max_fps)
+                         and (max_size is None or e.size is None or e.size <= max_size))
+        if codec:
+            found.sort(key=lambda e: self._video_key(e, codec), reverse=True)
+        return found
+
+    def best_video(self, **query):
+        found = self.videos(**query)
+        return found[0] if found else None
+
+    def audios(self, min_abr=None, max_abr=None, codec=None, ext=None, max_size=None, smallest=False):
+        """
+        Audio-only formats that fit: codec first when given, then highest
+        bitrate; smallest first with smallest=True.
+        """
+        codec = codec_family(codec) if codec else None
+        found = [e for e in self.audio
+                 if (min_abr is None or e.abr >= min_abr) and (max_abr is None or e.abr <= max_abr)
+                 and (ext is None or e.ext == ext)
+                 and (max_size is None or e.size is None or e.size <= max_size)]
+        if codec:
+            found.sort(key=lambda e: self._audio_key(e, codec), reverse=True)
+        if smallest:
+            found.sort(key=lambda e: (e.size or float('inf'), e.abr))
+        return found
+
+    def best_audio(self, **query):
+        found = self.audios(**query)
+        return found[0] if found else None
+
+    def choices(self, codec=None):
+        """
+        [(label, format_id)] for a quality menu: one entry per height, fps
+        and container ("1080p60 - mp4"), holding the best format of that
+        kind, highest first.
+        """
+        codec = codec_family(codec) if codec else None
+        best = {}
+        for e in self.video:
+            current = best.get(e.label)
+            if current is None or self._video_key(e, codec) > self._video_key(current, codec):
+                best[e.label] = e
+        ordered = sorted(best.values(), key=lambda e: (e.height, e.fps, e.ext == 'mp4'), reverse=True)
+        return [(e.label, e.format_id) for e in ordered]
+
+    def select(self, kind, query):
+        """
+        format_id the query dict picks for kind ('video' or 'audio'), or None.
+        """
+        entry = self.best_audio(**query) if kind == 'audio' else self.best_video(**query)
+        return entry.format_id if entry else None
+
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+_CACHE_SIZE = 16
+
+
+def format_index(info):
+    """
+    The FormatIndex of info, built once per info dict object.
+    """
+    key = id(info)
+    with _cache_lock:
+        hit = _cache.get(key)
+        if hit is not None and hit[0] is info:
+            _cache.move_to_end(key)
+            return hit[1]
+    index = FormatIndex(info)
+    with _cache_lock:
+        # Holding info keeps its id from being reused while cached
+        _cache[key] = (info, index)
+        while len(_cache) > _CACHE_SIZE:
+            _cache.popitem(last=False)
+    return index
@@ -0,0 +1,314 @@
+import json
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlparse
+
+from bandwidth import parse_rate, parse_schedule
+from job_queue import FINISHED_STATES
+
+_JOB_ACTION = re.compile(r'^/jobs/([0-9a-f]+)(?:/(cancel|pause|resume))?$')
+
+KINDS = ('video', 'audio', 'thumbnail')
+
+# JobQueue.submit() arguments that "options" must not shadow
+_SUBMIT_ARGS = ('kind', 'url', 'priority', 'info')
+
+
+def job_payload(job):
+    """
+    JSON view of a job: the structured fields plus a ready-made status line.
+    """
+    payload = job.to_dict()
+    payload['message'] = job.describe()
+    return payload
+
+
+def parse_job_request(data):
+    """
+    (kind, url, priority, options) from a POST /jobs body; ValueError with
+    the reason if it is malformed.
+    """
+    if not isinstance(data, dict) or 'kind' not in data or 'url' not in data:
+        raise ValueError('expected JSON with "kind" and "url"')
+    kind, url = data['kind'], data['url']
+    if kind not in KINDS:
+        raise ValueError(f'unknown kind: {kind}')
+    if not isinstance(url, str) or not url:
+        raise ValueError('"url" must be a non-empty string')
+    priority = data.get('priority', 0)
+    if isinstance(priority, bool) or not isinstance(priority, int):
+        raise ValueError(f'"priority" must be an integer, not {priority!r}')
+    options = data.get('options', {})
+    if not isinstance(options, dict):
+        raise ValueError('"options" must be a JSON object')
+    clashes = sorted(set(options) & set(_SUBMIT_ARGS))
+    if clashes:
+        raise ValueError(f'"options" may not set {", ".join(clashes)}')
+    return kind, url, priority, options
+
+
+class ProgressFeed:
+    """
+    Keeps only the latest snapshot of every job. Queue listeners overwrite
+    the slot and return immediately, so a slow event-stream client can never
+    back-pressure a download thread; the client just skips to the newest
+    state when it catches up. A finished job's snapshot is dropped once
+    every subscribed client has been sent it.
+    """
+
+    def __init__(self):
+        self._latest = {}  # job_id -> (version, snapshot)
+        self._finished = set()  # job_ids whose latest snapshot is final
+        self._cursors = {}  # subscriber token -> last version sent
+        self._version = 0
+        self._cond = threading.Condition()
+
+    def publish(self, job):
+        snapshot = job_payload(job)
+        with self._cond:
+            self._version += 1
+            self._latest[job.job_id] = (self._version, snapshot)
+            if snapshot['state'] in FINISHED_STATES:
+                self._finished.add(job.job_id)
+            else:
+                self._finished.discard(job.job_id)
+            self._prune()
+            self._cond.notify_all()
+
+    def subscribe(self):
+        """
+        A token for changes_since(); unsubscribe() it when the client leaves.
+        """
+        token = object()
+        with self._cond:
+            self._cursors[token] = 0
+        return token
+
+    def unsubscribe(self, token):
+        with self._cond:
+            self._cursors.pop(token, None)
+            self._prune()
+
+    def changes_since(self, version, timeout, token=None):
+        """
+        Waits up to timeout for snapshots newer than version.
+        Returns (new_version, [snapshot, ...]).
+        """
+        with self._cond:
+            if self._version <= version:
+                self._cond.wait(timeout)
+            changed = [snap for v, snap in self._latest.values() if v > version]
+            if token in self._cursors:
+                self._cursors[token] = self._version
+                self._prune()
+            return self._version, changed
+
+    def _prune(self):
+        sent = min(self._cursors.values(), default=self._version)
+        for job_id in [j for j in self._finished if self._latest[j][0] <= sent]:
+            del self._latest[job_id]
+            self._finished.discard(job_id)
+
+
+class _Handler(BaseHTTPRequestHandler):
+    server_version = "YouTubeDownloader"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    # --- helpers ---
+
+    def _send_json(self, status, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _send_text(self, status, text, content_type='text/plain; charset=utf-8'):
+        body = text.encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        # Read in full on every POST: left in rfile on a keep-alive
+        # connection, a body would be parsed as the next request
+        try:
+            length = int(self.headers.get('Content-Length') or 0)
+        except ValueError:
+            self.close_connection = True
+            return b''
+        return self.rfile.read(length) if length > 0 else b''
+
+    @staticmethod
+    def _parse_json(body):
+        return json.loads(body) if body else {}
+
+    # --- routes ---
+
+    def do_GET(self):
+        api = self.server.api
+        parsed = urlparse(self.path)
+
+        if parsed.path == '/jobs':
+            self._send_json(200, [job_payload(job) for job in api.jobs.jobs()])
+        elif parsed.path == '/events':
+            job_filter = parse_qs(parsed.query).get('job', [None])[0]
+            self._stream_events(job_filter)
+        elif parsed.path == '/stats':
+            self._send_json(200, api.jobs.stats())
+        elif parsed.path == '/bandwidth':
+            governor = getattr(api.jobs.downloader, 'bandwidth', None)
+            if governor is None:
+                self._send_json(404, {'error': 'no bandwidth governor'})
+            else:
+                self._send_json(200, governor.stats())
+        elif parsed.path in ('/metrics', '/metrics/jobs'):
+            metrics = getattr(api.jobs.downloader, 'metrics', None)
+            if metrics is None:
+                self._send_json(404, {'error': 'no metrics'})
+            elif parsed.path == '/metrics':
+                self._send_text(200, metrics.render(), 'text/plain; version=0.0.4; charset=utf-8')
+            else:
+                self._send_json(200, metrics.summaries())
+        else:
+            m = _JOB_ACTION.match(parsed.path)
+            job = api.jobs.get(m.group(1)) if m and not m.group(2) else None
+            if job is None:
+                self._send_json(404, {'error': 'not found'})
+            else:
+                self._send_json(200, job_payload(job))
+
+    def do_POST(self):
+        api = self.server.api
+        path = urlparse(self.path).path
+        body = self._read_body()
+
+        if path == '/jobs':
+            try:
+                data = self._parse_json(body)
+            except ValueError:
+                data = None
+            try:
+                kind, url, priority, options = parse_job_request(data)
+            except ValueError as e:
+                self._send_json(400, {'error': str(e)})
+                return
+            job_id = api.jobs.submit(kind, url, priority, **options)
+            self._send_json(201, {'job_id': job_id})
+            return
+
+        if path == '/bandwidth':
+            self._set_bandwidth(api, body)
+            return
+
+        m = _JOB_ACTION.match(path)
+        if not m or not m.group(2):
+            self._send_json(404, {'error': 'not found'})
+            return
+        job_id, action = m.groups()
+        if api.jobs.get(job_id) is None:
+            self._send_json(404, {'error': 'not found'})
+            return
+        ok = getattr(api.jobs, action)(job_id)
+        self._send_json(200 if ok else 409, {'job_id': job_id, 'ok': ok})
+
+    def _set_bandwidth(self, api, body):
+        governor = getattr(api.jobs.downloader, 'bandwidth', None)
+        if governor is None:
+            self._send_json(404, {'error': 'no bandwidth governor'})
+            return
+        try:
+            data = self._parse_json(body)
+            rate = parse_rate(data['rate'] or 0)
+            schedule = parse_schedule(data['schedule']) if 'schedule' in data else None
+        except (ValueError, KeyError, TypeError, AttributeError):
+            self._send_json(400, {'error': 'expected JSON with "rate", e.g. {"rate": "2M"}'})
+            return
+        governor.set_rate(rate, schedule)
+        self._send_json(200, governor.stats())
+
+    def _stream_events(self, job_filter):
+        """
+        Server-Sent Events: one "job" event per changed job, at most
+        max_rate times a second per client, with keep-alive comments.
+        """
+        api = self.server.api
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/event-stream')
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Connection', 'close')
+        self.end_headers()
+        self.close_connection = True
+
+        version = 0
+        interval = 1.0 / api.max_rate
+        token = api.feed.subscribe()
+        try:
+            while not api.stopping:
+                started = time.monotonic()
+                version, changed = api.feed.changes_since(version, api.keepalive, token)
+                if job_filter:
+                    changed = [snap for snap in changed if snap['job_id'] == job_filter]
+                if changed:
+                    chunk = ''.join(f"event: job\ndata: {json.dumps(snap, ensure_ascii=False)}\n\n" for snap in changed)
+                else:
+                    chunk = ": keep-alive\n\n"
+                self.wfile.write(chunk.encode('utf-8'))
+                self.wfile.flush()
+                # Coalesce: anything that changes while we sleep is sent once
+                time.sleep(max(0.0, interval - (time.monotonic() - started)))
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            api.feed.unsubscribe(token)
+
+
+class JobServer:
+    """
+    Local HTTP API over a JobQueue:
+
+        POST /jobs                      {"kind": "video", "url": ..., "priority": 0}
+        GET  /jobs, GET /jobs/<id>
+        GET  /stats                     stage slots, post-processing queue depth and pass timings
+        GET  /bandwidth, POST /bandwidth {"rate": "2M", "schedule": ["09:00-18:00=1M"]}
+        GET  /metrics                   Prometheus text: seconds per phase, bytes, retries
+        GET  /metrics/jobs              JSON timing summaries of recent jobs
+        POST /jobs/<id>/cancel|pause|resume
+        GET  /events[?job=<id>]         Server-Sent Events progress feed
+    """
+
+    def __init__(self, jobs, host='127.0.0.1', port=8765, max_rate=4.0, keepalive=15.0):
+        self.jobs = jobs
+        self.max_rate = max_rate
+        self.keepalive = keepalive
+        self.stopping = False
+
+        self.feed = ProgressFeed()
+        jobs.add_listener(self.feed.publish)
+
+        self.httpd = ThreadingHTTPServer((host, port), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.api = self
+        self._thread = None
+
+    @property
+    def address(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, name="job-http", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        self.stopping = True
+        self.httpd.shutdown()
+        self.httpd.server_close()
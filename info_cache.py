@@ -0,0 +1,168 @@
+import json
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from urllib.parse import parse_qs, urlparse
+
+# youtu.be/ID, watch?v=ID, shorts/ID, embed/ID, live/ID, v/ID -> 11-char video ID
+_YT_HOSTS = re.compile(r'(^|\.)(youtube\.com|youtube-nocookie\.com|youtu\.be)$')
+_YT_PATH_ID = re.compile(r'^/(?:shorts|embed|live|v|e)/([0-9A-Za-z_-]{11})')
+_YT_ID = re.compile(r'^[0-9A-Za-z_-]{11}$')
+_EXPIRE_PARAM = re.compile(r'[?&/]expire[=/](\d+)')
+
+
+def canonical_video_id(url):
+    """
+    Returns a cache key that is the same for every URL form of one video,
+    e.g. "youtube:jNQXAC9IVRw". Unknown sites fall back to the URL without
+    its fragment.
+    """
+    url = url.strip()
+    parsed = urlparse(url if '://' in url else f"https://{url}")
+    host = (parsed.hostname or '').lower()
+
+    if _YT_HOSTS.search(host):
+        if host.endswith('youtu.be'):
+            candidate = parsed.path.lstrip('/')[:11]
+        else:
+            m = _YT_PATH_ID.match(parsed.path)
+            candidate = m.group(1) if m else (parse_qs(parsed.query).get('v') or [''])[0]
+        if _YT_ID.match(candidate):
+            return f"youtube:{candidate}"
+
+    return parsed._replace(fragment='').geturl()
+
+
+def stream_expiry(info):
+    """
+    Earliest "expire=" timestamp found in the format URLs of info, or None.
+    """
+    earliest = None
+    for f in info.get('formats') or [info]:
+        m = _EXPIRE_PARAM.search(f.get('url') or '')
+        if m:
+            ts = int(m.group(1))
+            earliest = ts if earliest is None else min(earliest, ts)
+    return earliest
+
+
+class InfoCache:
+    """
+    Two-tier cache for extracted info dicts keyed by canonical video ID:
+    an in-memory LRU capped at max_entries and, if db_path is given, an
+    sqlite tier that survives restarts. Every entry has its own expiry so
+    stale stream URLs are never served.
+    """
+
+    # Keep a safety margin before the signed stream URLs actually expire
+    EXPIRY_MARGIN = 300
+
+    def __init__(self, max_entries=128, ttl=1800, db_path=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.db_path = db_path
+
+        self._entries = OrderedDict()  # key -> (expires_at, info)
+        self._lock = threading.Lock()
+        self._db = None
+
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+        if db_path:
+            import sqlite3
+            os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS info (key TEXT PRIMARY KEY, expires REAL, data TEXT)")
+            self._db.commit()
+
+    def key_for(self, url):
+        return canonical_video_id(url)
+
+    def get(self, url):
+        """
+        Returns the cached info dict for url, or None on a miss.
+        """
+        key = self.key_for(url)
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[1]
+                del self._entries[key]
+                self.expirations += 1
+
+            if self._db is not None:
+                row = self._db.execute("SELECT expires, data FROM info WHERE key = ?", (key,)).fetchone()
+                if row and row[0] > now:
+                    info = json.loads(row[1])
+                    self._remember(key, row[0], info)
+                    self.disk_hits += 1
+                    return info
+                if row:
+                    self._db.execute("DELETE FROM info WHERE key = ?", (key,))
+                    self._db.commit()
+                    self.expirations += 1
+
+            self.misses += 1
+            return None
+
+    def put(self, url, info, ttl=None):
+        """
+        Stores info under the canonical key of url. The entry lives for ttl
+        seconds (default self.ttl) or until its stream URLs expire.
+        """
+        key = self.key_for(url)
+        expires_at = time.time() + (self.ttl if ttl is None else ttl)
+        stream_expires = stream_expiry(info)
+        if stream_expires:
+            expires_at = min(expires_at, stream_expires - self.EXPIRY_MARGIN)
+
+        with self._lock:
+            self._remember(key, expires_at, info)
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO info (key, expires, data) VALUES (?, ?, ?)",
+                    (key, expires_at, json.dumps(info, default=str)))
+                self._db.commit()
+
+    def invalidate(self, url):
+        key = self.key_for(url)
+        with self._lock:
+            self._entries.pop(key, None)
+            if self._db is not None:
+                self._db.execute("DELETE FROM info WHERE key = ?", (key,))
+                self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'entries': len(self._entries),
+                'hits': self.hits,
+                'disk_hits': self.disk_hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+    def close(self):
+        if self._db is not None:
+            self._db.close()
+            self._db = None
+
+    def _remember(self, key, expires_at, info):
+        # Caller holds the lock
+        self._entries[key] = (expires_at, info)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
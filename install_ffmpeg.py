@@ -1,49 +1,103 @@
 import os
+import sys
+import tarfile
 import zipfile
-import urllib.request
 import shutil
 
-FFMPEG_URL = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest/ffmpeg-master-latest-win64-gpl.zip"
-ZIP_NAME = "ffmpeg.zip"
-EXTRACT_DIR = "ffmpeg_temp"
+import tools
+from transport import default_client
 
-def install_ffmpeg():
-    print(f"Downloading FFmpeg from {FFMPEG_URL}...")
+RELEASES = "https://github.com/BtbN/FFmpeg-Builds/releases/download/latest"
+BUILDS = {
+    'win32': "ffmpeg-master-latest-win64-gpl.zip",
+    'linux': "ffmpeg-master-latest-linux64-gpl.tar.xz",
+}
+INSTALL_DIR = os.path.join(tools.TOOLS_DIR, 'ffmpeg')
+
+
+def _build_name():
+    for prefix, name in BUILDS.items():
+        if sys.platform.startswith(prefix):
+            return name
+    return None
+
+
+def _extract(archive, target):
+    if archive.endswith('.zip'):
+        with zipfile.ZipFile(archive, 'r') as zip_ref:
+            zip_ref.extractall(target)
+    else:
+        with tarfile.open(archive) as tar_ref:
+            tar_ref.extractall(target, filter='data')
+
+
+def _report(done, total):
+    if total:
+        print(f"\r  {done * 100 // total}% of {total // (1024 * 1024)} MB", end='', flush=True)
+
+
+def install_ffmpeg(install_dir=INSTALL_DIR, client=None):
+    """
+    Downloads a static FFmpeg build into install_dir and registers ffmpeg and
+    ffprobe with tools, so the downloader finds them from any folder.
+    client is the HTTPClient to use (default: the shared one).
+    """
+    build = _build_name()
+    if build is None:
+        print(f"No prebuilt FFmpeg for {sys.platform}; install it with your package manager.")
+        return False
+
+    url = f"{RELEASES}/{build}"
+    os.makedirs(install_dir, exist_ok=True)
+    archive = os.path.join(install_dir, build)
+    extract_dir = os.path.join(install_dir, 'extract')
+
+    print(f"Downloading FFmpeg from {url}...")
     try:
-        urllib.request.urlretrieve(FFMPEG_URL, ZIP_NAME)
-        print("Download complete.")
+        (client or default_client()).download(url, archive, _report)
+        print("\nDownload complete.")
     except Exception as e:
         print(f"Download failed: {e}")
-        return
+        return False
 
     print("Extracting...")
     try:
-        with zipfile.ZipFile(ZIP_NAME, 'r') as zip_ref:
-            zip_ref.extractall(EXTRACT_DIR)
-        
-        # Move binaries to root
+        _extract(archive, extract_dir)
+
         print("Locating binaries...")
         bin_dir = None
-        for root, dirs, files in os.walk(EXTRACT_DIR):
+        for root, dirs, files in os.walk(extract_dir):
             if 'bin' in dirs:
                 bin_dir = os.path.join(root, 'bin')
                 break
-        
+
+        installed = 0
         if bin_dir:
-            for file in ['ffmpeg.exe', 'ffprobe.exe']:
-                src = os.path.join(bin_dir, file)
-                if os.path.exists(src):
-                    shutil.move(src, file)
-                    print(f"Moved {file} to project root.")
-        
-        # Cleanup
-        print("Cleaning up...")
-        os.remove(ZIP_NAME)
-        shutil.rmtree(EXTRACT_DIR)
-        print("FFmpeg installation successful!")
+            target_dir = os.path.join(install_dir, 'bin')
+            os.makedirs(target_dir, exist_ok=True)
+            for name in ['ffmpeg', 'ffprobe']:
+                src = shutil.which(name, path=bin_dir)
+                if src:
+                    dst = os.path.join(target_dir, os.path.basename(src))
+                    os.replace(src, dst)
+                    tools.register(name, dst)
+                    installed += 1
+                    print(f"Installed {name} to {dst}")
 
+        print("Cleaning up...")
+        os.remove(archive)
+        shutil.rmtree(extract_dir)
     except Exception as e:
         print(f"Extraction failed: {e}")
+        return False
+
+    if not installed:
+        print("FFmpeg binaries not found in the archive.")
+        return False
+    caps = tools.probe(refresh=True)
+    print(f"FFmpeg {caps.version or ''} installation successful!")
+    return True
+
 
 if __name__ == "__main__":
-    install_ffmpeg()
+    sys.exit(0 if install_ffmpeg() else 1)
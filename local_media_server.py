@@ -0,0 +1,219 @@
+import random
+import re
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+_RANGE = re.compile(r'bytes=(\d+)-(\d*)')
+_RANGE_PARAM = re.compile(r'(?:^|&)range=(\d+)-(\d+)')
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    def setup(self):
+        super().setup()
+        self.server.media.connected()
+
+    def do_HEAD(self):
+        self._serve(head=True)
+
+    def do_GET(self):
+        self._serve(head=False)
+
+    def _serve(self, head):
+        server = self.server.media
+        path, _, query = self.path.partition('?')
+        payload = server.files.get(path)
+        range_header = self.headers.get('Range')
+        server.record(self.command, path, range_header, query)
+
+        if payload is None:
+            self.send_error(404)
+            return
+        status = server.injected_status()
+        if status:
+            self.send_response(status)
+            self.send_header('Content-Length', '0')
+            self.send_header('Retry-After', '1')
+            self.end_headers()
+            return
+
+        start, end = 0, len(payload) - 1
+        m = _RANGE.match(range_header or '')
+        param = _RANGE_PARAM.search(query)
+        if param:
+            # googlevideo-style "?range=START-END": a plain 200 with just that slice
+            start, end = int(param.group(1)), min(int(param.group(2)), end)
+            self.send_response(200)
+        elif m:
+            start = int(m.group(1))
+            if m.group(2):
+                end = min(int(m.group(2)), end)
+            if start > end:
+                self.send_response(416)
+                self.send_header('Content-Range', f"bytes */{len(payload)}")
+                self.send_header('Content-Length', '0')
+                self.end_headers()
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f"bytes {start}-{end}/{len(payload)}")
+        else:
+            self.send_response(200)
+        self.send_header('Content-Type', server.content_type)
+        self.send_header('Accept-Ranges', 'bytes')
+        self.send_header('Content-Length', str(end - start + 1))
+        self.end_headers()
+        if head:
+            return
+
+        chunk = server.chunk_size
+        pos = start
+        server.streaming(1)
+        try:
+            while pos <= end:
+                data = payload[pos:min(pos + chunk, end + 1)]
+                server.throttle(len(data))
+                self.wfile.write(data)
+                server.count(len(data))
+                pos += len(data)
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            server.streaming(-1)
+
+
+class LocalMediaServer:
+    """
+    Loopback HTTP server for tests and benchmarks. Serves in-memory files
+    with Range support (header or googlevideo-style "range=" parameter),
+    optional per-connection throttling and injected error statuses, and
+    records every request, byte sent and the peak number of connections.
+    """
+
+    def __init__(self, files=None, per_connection_rate=None, chunk_size=16 * 1024,
+                 content_type='video/mp4', error_rate=0.0, error_status=429, seed=0):
+        self.files = dict(files or {})
+        self.per_connection_rate = per_connection_rate  # bytes/s per connection, None = unlimited
+        self.chunk_size = chunk_size
+        self.content_type = content_type
+        self.error_rate = error_rate
+        self.error_status = error_status
+
+        self.requests = []  # (method, path, range header)
+        self.queries = []   # query string of every request
+        self.bytes_sent = 0
+        self.active = 0       # connections currently sending a body
+        self.peak_active = 0
+        self.connections = 0  # TCP connections accepted
+        self.errors_sent = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+        self.httpd = ThreadingHTTPServer(('127.0.0.1', 0), _Handler)
+        self.httpd.daemon_threads = True
+        self.httpd.media = self
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def url(self, path):
+        return f"http://127.0.0.1:{self.httpd.server_port}{path}"
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc):
+        self.stop()
+
+    # --- called from handler threads ---
+
+    def record(self, method, path, range_header, query=''):
+        with self._lock:
+            self.requests.append((method, path, range_header))
+            self.queries.append(query)
+
+    def connected(self):
+        with self._lock:
+            self.connections += 1
+
+    def streaming(self, delta):
+        with self._lock:
+            self.active += delta
+            self.peak_active = max(self.peak_active, self.active)
+
+    def count(self, n):
+        with self._lock:
+            self.bytes_sent += n
+
+    def injected_status(self):
+        with self._lock:
+            if self.error_rate and self._random.random() < self.error_rate:
+                self.errors_sent += 1
+                return self.error_status
+        return None
+
+    def throttle(self, n):
+        if self.per_connection_rate:
+            time.sleep(n / self.per_connection_rate)
+
+
+def local_info(media_url, video_id='clip', size=None, title=None):
+    """
+    What get_video_info would hand back for one progressive mp4 served at
+    media_url, titled title (default "Clip <video_id>").
+    """
+    fmt = {'format_id': '18', 'url': media_url, 'ext': 'mp4', 'vcodec': 'avc1', 'acodec': 'mp4a', 'height': 360}
+    if size is not None:
+        fmt['filesize'] = size
+    return {'id': video_id, 'title': title or f"Clip {video_id}", 'extractor': 'generic',
+            'extractor_key': 'Generic', 'webpage_url': media_url, 'formats': [fmt]}
+
+
+def audio_info(server, video_id, size):
+    """
+    Info dict of the m4a server serves at /<video_id>.m4a, titled
+    "Track <video_id>".
+    """
+    url = server.url(f'/{video_id}.m4a')
+    return {'id': video_id, 'title': f"Track {video_id}", 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': url,
+            'formats': [{'format_id': '140', 'url': url, 'ext': 'm4a', 'filesize': size,
+                         'vcodec': 'none', 'acodec': 'mp4a'}]}
+
+
+class NoopPass:
+    """
+    Post-processing pass that leaves the file as it is.
+    """
+
+    def __init__(self, ydl, **options):
+        pass
+
+    def run(self, info):
+        return [], info
+
+
+@contextmanager
+def registered_pass(name, factory=NoopPass, download_options=None):
+    """
+    Registers a post-processing pass for the block only, so the global
+    registry is left as other tests expect it.
+    """
+    from postprocess import DOWNLOAD_OPTIONS, PASSES, register_pass
+    register_pass(name, factory, download_options)
+    try:
+        yield
+    finally:
+        PASSES.pop(name, None)
+        DOWNLOAD_OPTIONS.pop(name, None)
@@ -1,10 +1,13 @@
 import customtkinter as ctk
+import os
 import threading
 from downloader_logic import YouTubeDownloader
+from job_queue import JobQueue, RUNNING, PAUSED
+from records import Phase
+from progress import DEFAULT_HZ, ProgressAggregator
 from tkinter import messagebox
-from PIL import Image
-import requests
-from io import BytesIO
+from thumbnails import PREVIEW_WIDTH
+from format_index import format_index
 
 ctk.set_appearance_mode("Dark")
 ctk.set_default_color_theme("blue")
@@ -19,10 +22,19 @@ class App(ctk.CTk):
 
         self.downloader = YouTubeDownloader()
         self.video_info = None
+        self.video_url = None # URL that video_info was extracted from
         
         # Download State Management
-        self.download_tasks = {} # currently active tasks: {'video': thread_obj, 'audio': thread_obj}
-        self.cancel_flags = {}   # cancellation flags: {'video': False, 'audio': False}
+        # Jobs run on the shared queue; pending work is saved and picked up on restart
+        self.jobs = JobQueue(self.downloader, workers=3,
+                             state_path=os.path.join(self.downloader.base_path, '.youtube_jobs.json'),
+                             listener=self.on_job_update)
+        self.job_ids = {}        # job started per task: {'video': job_id, 'audio': job_id}
+        # Jobs left from the last session finish in the background without
+        # touching this session's progress bar
+        self.restored_jobs = {job.job_id for job in self.jobs.jobs()}
+        # Worker threads publish here; the Tk loop applies one batch per tick
+        self.progress_feed = ProgressAggregator()
         self.progress_map = {}   # progress per task: {'video': 0.0, 'audio': 0.0}
         self.is_paused = False     # simple global pause for now, or per task? Let's do global for simplicity first or per task? User asked for "start/pause button". Let's assume global control for the active downloads initiated. 
         # Actually, user wants "Start/Pause" button displayed BELOW.
@@ -93,6 +105,9 @@ class App(ctk.CTk):
         self.label_status = ctk.CTkLabel(self, text="就绪")
         self.label_status.grid(row=8, column=0, padx=20, pady=5)
 
+        self.jobs.start()
+        self.after(int(1000 / DEFAULT_HZ), self._poll_progress)
+
     def start_check_thread(self):
         url = self.entry_url.get()
         if not url:
@@ -107,43 +122,28 @@ class App(ctk.CTk):
         info = self.downloader.get_video_info(url)
         if info:
             self.video_info = info
-            self.load_thumbnail(info.get('thumbnail'))
+            self.video_url = url
+            self.load_thumbnail(info)
             self.update_ui_after_check(info)
         else:
             self.update_status("获取信息失败", error=True)
 
-    def load_thumbnail(self, url):
-        if not url: return
+    def load_thumbnail(self, info):
         try:
-            response = requests.get(url)
-            img_data = BytesIO(response.content)
-            img = Image.open(img_data)
-            
-            # Resize keeping aspect ratio
-            base_width = 320
-            w_percent = (base_width / float(img.size[0]))
-            h_size = int((float(img.size[1]) * float(w_percent)))
-            img = img.resize((base_width, h_size), Image.Resampling.LANCZOS)
-            
-            self.photo_image = ctk.CTkImage(light_image=img, dark_image=img, size=(base_width, h_size))
+            # Fetched once into the thumbnail cache; "download thumbnail" reuses it
+            img = self.downloader.thumbnails.preview(info, PREVIEW_WIDTH)
+            if img is None:
+                return
+            self.photo_image = ctk.CTkImage(light_image=img, dark_image=img, size=img.size)
             self.after(0, lambda: self.label_thumbnail.configure(image=self.photo_image, text=""))
         except Exception as e:
             print(f"Thumbnail error: {e}")
 
     def update_ui_after_check(self, info):
-        # Filter formats
-        formats = info.get('formats', [])
-        resolutions = set()
-        self.format_map = {} 
-
-        for f in formats:
-            if f.get('vcodec') != 'none' and f.get('height'):
-                res_str = f"{f['height']}p - {f['ext']}"
-                if res_str not in resolutions:
-                    resolutions.add(res_str)
-                    self.format_map[res_str] = f['format_id']
-        
-        sorted_res = sorted(list(resolutions), key=lambda x: int(x.split('p')[0]), reverse=True)
+        # One entry per height/fps/container, each the best format of its kind
+        choices = format_index(info).choices()
+        self.format_map = dict(choices)
+        sorted_res = [label for label, _ in choices]
         
         self.after(0, lambda: self._apply_ui_update(info.get('title', 'Unknown Title'), sorted_res))
 
@@ -170,19 +170,12 @@ class App(ctk.CTk):
         format_id = self.format_map.get(selected_res)
 
         self._prepare_download_ui('video', is_resume)
-        # Reset cancel flag
-        self.cancel_flags['video'] = False
-        t = threading.Thread(target=self.download, args=(url, format_id, False, 'video'))
-        self.download_tasks['video'] = t
-        t.start()
+        self.job_ids['video'] = self.jobs.submit('video', url, info=self._cached_info(url), format_id=format_id)
 
     def start_download_audio_thread(self, is_resume=False):
         url = self.entry_url.get()
         self._prepare_download_ui('audio', is_resume)
-        self.cancel_flags['audio'] = False
-        t = threading.Thread(target=self.download, args=(url, None, True, 'audio'))
-        self.download_tasks['audio'] = t
-        t.start()
+        self.job_ids['audio'] = self.jobs.submit('audio', url, info=self._cached_info(url))
 
     def _prepare_download_ui(self, task_type, is_resume=False):
         if task_type == 'video':
@@ -212,53 +205,57 @@ class App(ctk.CTk):
             # Resume
             self.is_paused = False
             self.btn_control.configure(text="暂停下载") # Keep default or specific consistent color if needed, but removing dynamic color change
-            # Restart tasks that were downloading
-            if 'video' in self.progress_map and self.progress_map['video'] < 1.0:
-                self.start_download_video_thread(is_resume=True) 
-            if 'audio' in self.progress_map and self.progress_map['audio'] < 1.0:
-                self.start_download_audio_thread(is_resume=True)
+            # Re-queue tasks that were paused
+            for job_id in self.job_ids.values():
+                self.jobs.resume(job_id)
                  
         else:
             # Pause
             self.is_paused = True
             self.btn_control.configure(text="继续下载")
-            # Set cancel flags for all active
-            for k in self.cancel_flags:
-                self.cancel_flags[k] = True
-
-    def download(self, url, format_id, audio_only, task_type):
-        def check_cancel():
-            return self.cancel_flags.get(task_type, False)
-
-        def progress(percent, eta):
-            # Update specific task progress
-            self.progress_map[task_type] = percent
-            
-            # Calculate average progress
-            total = sum(self.progress_map.values())
-            count = len(self.progress_map)
-            avg_percent = total / count if count > 0 else 0
-            
-            self.after(0, lambda: self.progressbar.set(avg_percent))
-            
-            # Combine ETAs or status? Just show current one for now or generic
-            # Updated to show detailed string if provided
-            if "[download]" in eta:
-                 self.after(0, lambda: self.label_status.configure(text=f"[{task_type}] {eta}"))
-            elif "..." in eta or not any(c.isdigit() for c in eta):
-                 self.after(0, lambda: self.label_status.configure(text=f"状态 ({task_type}): {eta}"))
-            else:
-                 self.after(0, lambda: self.label_status.configure(text=f"下载中... {int(avg_percent*100)}% (剩余时间: {eta})"))
-
-        if audio_only:
-            result = self.downloader.download_audio(url, progress, check_cancel)
-        else:
-            result = self.downloader.download_video(url, format_id, progress, check_cancel)
+            # Pause all active jobs
+            for job_id in self.job_ids.values():
+                self.jobs.pause(job_id)
+
+    def _cached_info(self, url):
+        # Reuse the analyzed info dict so the download does not extract again
+        return self.video_info if url == self.video_url else None
+
+    def on_job_update(self, job):
+        # Called from queue worker threads: only overwrite the latest state,
+        # _poll_progress applies it on the Tk thread
+        if job.job_id in self.restored_jobs:
+            return
+        self.progress_feed.publish(job.kind, (job.state, job.snapshot, job.result))
+
+    def _poll_progress(self):
+        for task_type, (state, snapshot, result) in self.progress_feed.drain().items():
+            if state is RUNNING:
+                if snapshot:
+                    self.progress(task_type, snapshot)
+            elif result is not None:
+                self.finish_download(result, task_type)
+        self.after(int(1000 / DEFAULT_HZ), self._poll_progress)
+
+    def progress(self, task_type, snapshot):
+        # Update specific task progress (runs on the Tk thread)
+        self.progress_map[task_type] = snapshot.fraction
+        
+        # Calculate average progress
+        total = sum(self.progress_map.values())
+        count = len(self.progress_map)
+        avg_percent = total / count if count > 0 else 0
         
-        self.after(0, lambda: self.finish_download(result, task_type))
+        self.progressbar.set(avg_percent)
+        
+        # Show the current task's details; formatting happens here, at the edge
+        if snapshot.phase is Phase.DOWNLOADING:
+             self.label_status.configure(text=f"[{task_type}] {snapshot.describe()}")
+        else:
+             self.label_status.configure(text=f"状态 ({task_type}): {snapshot.describe()}")
 
     def finish_download(self, result, task_type):
-        if result == "已暂停":
+        if result.status is PAUSED:
             self.label_status.configure(text="下载已暂停")
             return # Don't cleanup yet
 
@@ -276,24 +273,19 @@ class App(ctk.CTk):
              self.btn_check.configure(state="normal")
              self.btn_control.grid_remove() # Hide pause button
              self.progress_map.clear() # Reset
-             self.cancel_flags.clear()
+             self.job_ids.clear()
              messagebox.showinfo("下载完成", "所有任务已完成")
         
-        self.label_status.configure(text=f"{task_type}: {result}")
+        self.label_status.configure(text=f"{task_type}: {result.describe()}")
 
     def start_thumb_download_thread(self):
         url = self.entry_url.get()
         self._prepare_download_ui('thumbnail')
-        threading.Thread(target=self.download_thumb, args=(url,)).start()
-
-    def download_thumb(self, url):
-        self.after(0, lambda: self.label_status.configure(text="正在下载封面..."))
+        self.label_status.configure(text="正在下载封面...")
         # Mock progress for UI consistency
         self.progress_map['thumbnail'] = 0.1
         self._update_progress_bar_safe()
-        
-        result = self.downloader.download_thumbnail(url)
-        self.after(0, lambda: self.finish_download(result, 'thumbnail'))
+        self.job_ids['thumbnail'] = self.jobs.submit('thumbnail', url, priority=1, info=self._cached_info(url))
 
     # Removed finish_thumb as it is now integrated into finish_download structure
     
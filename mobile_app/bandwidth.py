@@ -0,0 +1,222 @@
+import os
+import threading
+import time
+
+# yt-dlp grows its read buffer to several MB; small fixed blocks keep
+# the governor's grants fine-grained
+BLOCK_SIZE = 64 * 1024
+
+
+def weight_for(priority):
+    """
+    Share weight of a job priority: each step up doubles the share.
+    """
+    return 2.0 ** max(-8, min(int(priority or 0), 8))
+
+
+def parse_rate(text):
+    """
+    "2M" -> 2097152, "500K" -> 512000, "0"/"off" -> None (bytes per second).
+    """
+    text = str(text).strip().upper().removesuffix('/S').removesuffix('B')
+    if text in ('', '0', 'OFF', 'NONE'):
+        return None
+    units = {'K': 1024, 'M': 1024 ** 2, 'G': 1024 ** 3}
+    if text[-1] in units:
+        return int(float(text[:-1]) * units[text[-1]])
+    return int(float(text))
+
+
+def parse_schedule(entries):
+    """
+    ["09:00-18:00=1M", "23:00-07:00=off"] -> [(540, 1080, 1048576), ...]
+    (minutes since midnight, rate); a window may wrap past midnight.
+    """
+    schedule = []
+    for entry in entries or ():
+        window, rate = entry.split('=', 1)
+        start, end = window.split('-', 1)
+        h1, m1 = map(int, start.split(':'))
+        h2, m2 = map(int, end.split(':'))
+        schedule.append((h1 * 60 + m1, h2 * 60 + m2, parse_rate(rate)))
+    return schedule
+
+
+class Share:
+    """
+    One job's claim on the governor, usable as a yt-dlp progress hook: every
+    progress report draws the bytes downloaded beyond the most reported so
+    far, and the download thread waits there until its share of the rate
+    allows them. Concurrent fragments report out of order, so a lower
+    report draws nothing.
+    """
+
+    def __init__(self, governor, weight):
+        self.governor = governor
+        self.weight = weight
+        self.tag = 0.0      # virtual finish time: bytes granted / weight
+        self.bytes = 0
+        self._seen = {}     # file path -> bytes already drawn
+        self._lock = threading.Lock()
+
+    def __call__(self, d):
+        if d.get('status') != 'downloading':
+            return
+        key = os.path.abspath(d.get('tmpfilename') or d.get('filename'))
+        done = d.get('downloaded_bytes') or 0
+        with self._lock:
+            seen = self._seen.get(key, 0)
+            if done > seen:
+                self._seen[key] = done
+        if done > seen:
+            self.governor.consume(self, done - seen)
+
+    def skip_existing(self, paths):
+        """
+        Counts the bytes already in these partial files as drawn, so a
+        resumed download is charged only for what it fetches now.
+        """
+        with self._lock:
+            for path in paths:
+                try:
+                    self._seen[os.path.abspath(path)] = os.path.getsize(path)
+                except OSError:
+                    pass
+
+    def close(self):
+        self.governor.release(self)
+
+
+class BandwidthGovernor:
+    """
+    Process-wide token bucket that every download draws from. rate is in
+    bytes per second (None = unlimited) and can be changed at any time with
+    set_rate(); running downloads follow at once. schedule (see
+    parse_schedule()) overrides the rate during windows of the day. When
+    several jobs wait, the bucket serves them by weighted fair queuing:
+    each job gets rate x weight / total weight of the jobs downloading.
+    """
+
+    def __init__(self, rate=None, burst=None, schedule=None, clock=time.monotonic, local_time=time.localtime):
+        self.base_rate = rate
+        self.burst = burst
+        self.schedule = list(schedule or ())
+        self._clock = clock
+        self._local_time = local_time
+        self._tokens = 0.0
+        self._refilled = clock()
+        self._vclock = 0.0
+        self._waiting = set()
+        self._shares = set()
+        self.granted = 0
+        self.waited = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def rate(self):
+        """
+        The rate in force now: the schedule's window, else the base rate.
+        """
+        if self.schedule:
+            t = self._local_time()
+            minute = t.tm_hour * 60 + t.tm_min
+            for start, end, rate in self.schedule:
+                inside = start <= minute < end if start <= end else (minute >= start or minute < end)
+                if inside:
+                    return rate
+        return self.base_rate
+
+    def set_rate(self, rate, schedule=None):
+        """
+        Changes the base rate (and the schedule, if given) of running and
+        future downloads.
+        """
+        with self._cond:
+            self.base_rate = rate
+            if schedule is not None:
+                self.schedule = list(schedule)
+            self._cond.notify_all()
+
+    def share(self, priority=0):
+        """
+        A new Share for a job of this priority; close() it when done.
+        """
+        share = Share(self, weight_for(priority))
+        with self._cond:
+            # Start at the current virtual time, so a new job neither owes
+            # for bytes it never took nor jumps ahead of older ones
+            share.tag = self._vclock
+            self._shares.add(share)
+        return share
+
+    def release(self, share):
+        with self._cond:
+            self._shares.discard(share)
+            self._waiting.discard(share)
+            self._cond.notify_all()
+
+    def ydl_options(self):
+        """
+        yt-dlp options that make downloads report in small blocks.
+        """
+        return {'buffersize': BLOCK_SIZE, 'noresizebuffer': True}
+
+    def _refill(self, rate):
+        now = self._clock()
+        burst = self.burst or rate
+        self._tokens = min(burst, self._tokens + (now - self._refilled) * rate)
+        self._refilled = now
+
+    def consume(self, share, nbytes):
+        """
+        Blocks until share may move nbytes more.
+        """
+        started = self._clock()
+        with self._cond:
+            # A job back from a pause starts at the current virtual time
+            # instead of cashing in the time it was idle
+            share.tag = max(share.tag, self._vclock) + nbytes / share.weight
+            self._waiting.add(share)
+            try:
+                while True:
+                    rate = self.rate
+                    if not rate:
+                        break
+                    self._refill(rate)
+                    first = min(self._waiting, key=lambda s: s.tag)
+                    if first is share and self._tokens >= 0:
+                        # May go into debt for a large block; the next
+                        # caller waits it off
+                        self._tokens -= nbytes
+                        break
+                    wait = -self._tokens / rate if self._tokens < 0 else 0.05
+                    self._cond.wait(min(max(wait, 0.001), 0.25))
+            finally:
+                self._waiting.discard(share)
+            self._vclock = max(self._vclock, share.tag - nbytes / share.weight)
+            share.bytes += nbytes
+            self.granted += nbytes
+            self.waited += self._clock() - started
+            self._cond.notify_all()
+
+    def stats(self):
+        with self._cond:
+            return {'rate': self.rate, 'base_rate': self.base_rate, 'jobs': len(self._shares),
+                    'waiting': len(self._waiting), 'granted_bytes': self.granted,
+                    'wait_seconds': round(self.waited, 3)}
+
+
+def add_arguments(parser):
+    parser.add_argument('--limit-rate', metavar='RATE', help="total download bandwidth for all jobs, e.g. 2M or 500K per second")
+    parser.add_argument('--limit-schedule', action='append', default=[], metavar='HH:MM-HH:MM=RATE',
+                        help="bandwidth during a time of day, e.g. 09:00-18:00=1M or 23:00-07:00=off (repeatable)")
+
+
+def from_args(args, always=False):
+    """
+    BandwidthGovernor for add_arguments() options; None when neither limit
+    is given, unless always (so the rate can be set later at runtime).
+    """
+    if not (args.limit_rate or args.limit_schedule or always):
+        return None
+    return BandwidthGovernor(parse_rate(args.limit_rate or 0), schedule=parse_schedule(args.limit_schedule))
@@ -0,0 +1,289 @@
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from parallel import MAX_CONNECTIONS, host_key
+
+THROTTLE_STATUSES = (403, 429)
+MAX_RETRY_SLEEP = 10.0
+# yt-dlp's command line default; the API default is no retries at all
+DEFAULT_RETRIES = 10
+
+
+class HostState:
+    """
+    Controller state of one host: the fragment connection cap, the cap on
+    concurrent downloads (None = uncapped), breaker and response counters.
+    """
+    __slots__ = ('limit', 'in_use', 'job_limit', 'active', 'good', 'responses', 'throttled', 'errors',
+                 'outcomes', 'storm', 'last_decrease', 'open_until', 'cooldown', 'rate', 'last_rate',
+                 'decisions', 'last_decision')
+
+    def __init__(self, limit, cooldown):
+        self.limit = limit
+        self.in_use = limit
+        self.job_limit = None
+        self.active = 0
+        self.good = 0               # healthy responses since the last change
+        self.responses = self.throttled = self.errors = 0
+        self.outcomes = deque(maxlen=50)  # True per error among the last responses
+        self.storm = deque()        # times of recent throttled responses
+        self.last_decrease = None
+        self.open_until = None
+        self.cooldown = cooldown
+        self.rate = None            # smoothed bytes/s of finished downloads
+        self.last_rate = None
+        self.decisions = {'increase': 0, 'decrease': 0, 'open': 0, 'close': 0}
+        self.last_decision = None
+
+
+class CongestionController:
+    """
+    AIMD control of how hard each host is pushed. Every response yt-dlp gets
+    during a download is observed (see observing()): a 429/403, or an error
+    rate above error_threshold, halves the host's fragment connections and
+    concurrent downloads, at most once per hold seconds so one burst of
+    parallel failures counts once. Each window of healthy responses (while
+    throughput has not collapsed) adds one back. storm_threshold throttled
+    responses within storm_window seconds open the host's circuit breaker:
+    new downloads to it wait cooldown seconds (or Retry-After), then a
+    single probe download runs; a healthy response closes the breaker, a
+    throttled one reopens it for twice as long. stats() has the decisions.
+    """
+
+    def __init__(self, maximum=MAX_CONNECTIONS, minimum=1, window=8, hold=1.0, error_threshold=0.5,
+                 storm_threshold=8, storm_window=10.0, cooldown=15.0, max_cooldown=300.0, job_ceiling=8,
+                 retries=DEFAULT_RETRIES, retry_backoff=0.25, clock=time.monotonic):
+        self.maximum = maximum
+        self.minimum = minimum
+        self.window = window
+        self.hold = hold
+        self.error_threshold = error_threshold
+        self.storm_threshold = storm_threshold
+        self.storm_window = storm_window
+        self.base_cooldown = cooldown
+        self.max_cooldown = max_cooldown
+        self.job_ceiling = job_ceiling
+        self.retries = retries
+        self.retry_backoff = retry_backoff
+        self._clock = clock
+        self._hosts = {}
+        self._cond = threading.Condition()
+        # One function object, so the options keep one YoutubeDL pool profile
+        sleep = self.retry_sleep
+        self._sleep_functions = {'http': sleep, 'fragment': sleep}
+
+    def _host(self, url):
+        # Caller holds the lock
+        host = host_key(url)
+        state = self._hosts.get(host)
+        if state is None:
+            state = self._hosts[host] = HostState(self.maximum, self.base_cooldown)
+        return host, state
+
+    def _decide(self, state, action, detail):
+        state.decisions[action] += 1
+        state.last_decision = f"{action}: {detail}"
+
+    # --- limits ---
+
+    def connections(self, url, wanted):
+        """
+        Fragment connections for a new download to url: wanted, capped by the
+        host's current limit.
+        """
+        with self._cond:
+            _, state = self._host(url)
+            state.in_use = max(self.minimum, min(wanted, state.limit))
+            return state.in_use
+
+    def breaker(self, url):
+        """
+        'closed', 'open' (new downloads wait) or 'half-open' (one probe runs).
+        """
+        with self._cond:
+            return self._breaker(self._host(url)[1])
+
+    def _breaker(self, state):
+        if state.open_until is None:
+            return 'closed'
+        return 'open' if self._clock() < state.open_until else 'half-open'
+
+    def _admits(self, state):
+        breaker = self._breaker(state)
+        if breaker == 'open':
+            return False
+        if breaker == 'half-open':
+            return state.active == 0
+        return state.job_limit is None or state.active < state.job_limit
+
+    @contextmanager
+    def slot(self, url):
+        """
+        Holds one of the host's concurrent download slots; waits while the
+        breaker is open or the host is at its download cap.
+        """
+        with self._cond:
+            _, state = self._host(url)
+            while not self._admits(state):
+                wait = state.open_until - self._clock() if self._breaker(state) == 'open' else 1.0
+                self._cond.wait(min(max(wait, 0.01), 1.0))
+            state.active += 1
+        try:
+            yield
+        finally:
+            with self._cond:
+                state.active -= 1
+                self._cond.notify_all()
+
+    # --- feedback ---
+
+    def record(self, url, status, retry_after=None):
+        """
+        One response to a request for url: its HTTP status, or None when the
+        request failed without one (timeout, reset connection).
+        """
+        with self._cond:
+            _, state = self._host(url)
+            now = self._clock()
+            state.responses += 1
+            throttled = status in THROTTLE_STATUSES
+            failed = status is None or status >= 500
+            state.outcomes.append(failed)
+            if throttled:
+                state.throttled += 1
+                self._throttled(state, now, status, retry_after)
+            elif failed:
+                state.errors += 1
+                errors = sum(state.outcomes)
+                if len(state.outcomes) >= 10 and errors > self.error_threshold * len(state.outcomes):
+                    self._decrease(state, now, f"{errors} errors in {len(state.outcomes)} responses")
+            elif status < 400:
+                self._healthy(state, now)
+            self._cond.notify_all()
+
+    def record_throughput(self, url, nbytes, seconds):
+        """
+        Throughput of a finished download, from its progress hook.
+        """
+        if seconds <= 0 or not nbytes:
+            return
+        rate = nbytes / seconds
+        with self._cond:
+            _, state = self._host(url)
+            state.last_rate = rate
+            state.rate = rate if state.rate is None else 0.7 * state.rate + 0.3 * rate
+
+    def _throttled(self, state, now, status, retry_after):
+        if self._breaker(state) == 'half-open':
+            state.cooldown = min(state.cooldown * 2, self.max_cooldown)
+            self._open(state, now, retry_after, f"probe got {status}")
+            return
+        state.storm.append(now)
+        while state.storm and state.storm[0] < now - self.storm_window:
+            state.storm.popleft()
+        self._decrease(state, now, f"HTTP {status}")
+        if len(state.storm) >= self.storm_threshold and self._breaker(state) == 'closed':
+            self._open(state, now, retry_after, f"{len(state.storm)} throttled in {self.storm_window:g}s")
+
+    def _open(self, state, now, retry_after, reason):
+        cooldown = min(max(state.cooldown, retry_after or 0), self.max_cooldown)
+        state.open_until = now + cooldown
+        state.storm.clear()
+        self._decide(state, 'open', f"{reason}, pausing new downloads {cooldown:g}s")
+
+    def _decrease(self, state, now, reason):
+        state.good = 0
+        if state.last_decrease is not None and now - state.last_decrease < self.hold:
+            return
+        state.last_decrease = now
+        old_limit, old_jobs = state.in_use, state.job_limit or max(state.active, 1)
+        state.limit = max(self.minimum, old_limit // 2)
+        state.job_limit = max(1, old_jobs // 2)
+        self._decide(state, 'decrease', f"{reason}: connections {old_limit}->{state.limit}, "
+                                        f"downloads {old_jobs}->{state.job_limit}")
+
+    def _healthy(self, state, now):
+        if self._breaker(state) == 'half-open':
+            state.open_until = None
+            state.cooldown = self.base_cooldown
+            self._decide(state, 'close', "probe succeeded")
+        state.good += 1
+        if state.good < max(self.window, state.limit):
+            return
+        state.good = 0
+        if state.last_decrease is not None and now - state.last_decrease < self.hold:
+            return
+        if state.rate and state.last_rate is not None and state.last_rate < state.rate / 2:
+            return  # throughput collapsed: hold where we are
+        if state.limit >= self.maximum and state.job_limit is None:
+            return
+        old_limit, old_jobs = state.limit, state.job_limit
+        state.limit = min(self.maximum, state.limit + 1)
+        if state.job_limit is not None:
+            state.job_limit = state.job_limit + 1 if state.job_limit + 1 < self.job_ceiling else None
+        self._decide(state, 'increase', f"connections {old_limit}->{state.limit}, "
+                                        f"downloads {old_jobs}->{state.job_limit or 'uncapped'}")
+
+    # --- yt-dlp glue ---
+
+    def retry_sleep(self, n):
+        """
+        Seconds yt-dlp sleeps before retry n (0-based) of a request or fragment.
+        """
+        return min(self.retry_backoff * 2 ** n, MAX_RETRY_SLEEP)
+
+    def ydl_options(self):
+        """
+        yt-dlp options that retry throttled fragments, backing off
+        exponentially, instead of skipping them.
+        """
+        return {'fragment_retries': self.retries, 'retry_sleep_functions': self._sleep_functions}
+
+    @contextmanager
+    def observing(self, ydl, listener=None):
+        """
+        Feeds every response ydl gets inside the block to record(), and its
+        status (None for no response) to listener if given.
+        """
+        urlopen = ydl.urlopen
+
+        def observed(req):
+            url = req if isinstance(req, str) else getattr(req, 'url', '')
+            try:
+                response = urlopen(req)
+            except Exception as e:
+                status = getattr(e, 'status', None)
+                response = getattr(e, 'response', None)
+                headers = getattr(response, 'headers', None) or {}
+                retry_after = headers.get('Retry-After') if hasattr(headers, 'get') else None
+                self.record(url, status,
+                            float(retry_after) if retry_after and retry_after.strip().isdigit() else None)
+                if listener:
+                    listener(status)
+                raise
+            status = getattr(response, 'status', 200)
+            self.record(url, status)
+            if listener:
+                listener(status)
+            return response
+
+        ydl.urlopen = observed
+        try:
+            yield ydl
+        finally:
+            del ydl.urlopen
+
+    def stats(self):
+        """
+        Per host: current caps, breaker state, response counters, smoothed
+        throughput and how often each decision was taken.
+        """
+        with self._cond:
+            return {host: {'connections': state.limit, 'downloads': state.job_limit, 'active': state.active,
+                           'breaker': self._breaker(state), 'responses': state.responses,
+                           'throttled': state.throttled, 'errors': state.errors,
+                           'rate': round(state.rate) if state.rate else None,
+                           'decisions': dict(state.decisions), 'last_decision': state.last_decision}
+                    for host, state in self._hosts.items()}
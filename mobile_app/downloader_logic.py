@@ -1,20 +1,30 @@
 import yt_dlp
 import os
-import re
-
-def format_size(bytes_val):
-    if not bytes_val:
-        return "N/A"
-    power = 1024
-    n = 0
-    power_labels = {0 : 'B', 1: 'KiB', 2: 'MiB', 3: 'GiB', 4: 'TiB'}
-    while bytes_val > power:
-        bytes_val /= power
-        n += 1
-    return f"{bytes_val:.2f}{power_labels.get(n, '')}"
+import threading
+import time
+from contextlib import nullcontext
+from congestion import CongestionController
+from format_index import format_index
+from info_cache import InfoCache, canonical_video_id
+from metrics import JobTimings, Metrics
+from output_index import OutputIndex, partial_files
+from parallel import DEFAULT_CHUNK_SIZE, RANGE_PARAM_HOSTS, ConnectionTuner, chunk_formats
+from postprocess import PostProcessor, download_options, then
+from profiles import CodecReport, get_profile
+from progress import DEFAULT_HZ, RateLimiter
+from records import DownloadResult, Phase, ProgressSnapshot
+from thumbnails import ThumbnailCache, thumbnail_ext
+from tools import probe
+from tracing import NULL_TRACER
+from transport import HTTPError, default_client
+from ydl_pool import YDLPool
 
 class YouTubeDownloader:
-    def __init__(self, download_path=None):
+    def __init__(self, download_path=None, on_extract=None, info_cache=None, progress_hz=DEFAULT_HZ,
+                 connections=None, chunk_size=DEFAULT_CHUNK_SIZE, range_param_hosts=RANGE_PARAM_HOSTS,
+                 parallel_streams=True, postprocessor=None, ffmpeg=None, output_index=None, archive=None, thumbnails=None,
+                 http_client=None, ydl_pool=None, bandwidth=None,
+                 congestion=None, metrics=None, tracer=None):
         if download_path:
              self.base_path = download_path
         else:
@@ -34,260 +44,605 @@ class YouTubeDownloader:
                 except Exception as e:
                     print(f"Error creating dir {p}: {e}")
 
-    def get_video_info(self, url):
-        """获取视频信息和可用格式"""
+        # 提取计数：所有网络提取都经过 extract_info()
+        self.extraction_count = 0
+        self.on_extract = on_extract
+        self._extract_lock = threading.Lock()
+
+        # 信息缓存（按视频 ID，带 TTL 和 LRU），可替换为自定义实现
+        self.info_cache = info_cache if info_cache is not None else InfoCache()
+
+        # 每个任务每秒最多回调进度的次数
+        self.progress_hz = progress_hz
+
+        # 并行下载：connections 固定连接数，None 时按实测吞吐量自动调整；
+        # 大的单文件格式按 chunk_size 切成多个 range 分片并发下载
+        self.connections = connections
+        self.tuner = ConnectionTuner()
+        # 按主机的 AIMD 拥塞控制：遇到 429/403 减半并发，健康时逐步恢复，限流风暴时熔断暂停新下载
+        self.congestion = congestion or CongestionController()
+        self.chunk_size = chunk_size
+        self.range_param_hosts = range_param_hosts
+
+        # 视频流和音频流同时下载，两者都完成后立即合并
+        self.parallel_streams = parallel_streams
+
+        # 按选项配置复用已初始化的 YoutubeDL 实例（提取、下载和后处理共用），不再每次调用都新建
+        self.ydl_pool = ydl_pool or YDLPool()
+
+        # 后处理阶段（转 MP3、元数据、封面、响度）：下载完成后交给有界的 ffmpeg 工作池，网络槽位立即释放
+        self.postprocessor = postprocessor or PostProcessor(ydl_pool=self.ydl_pool)
+        # 按输出配置统计：直接复制流 vs 重新编码
+        self.codec_report = CodecReport()
+
+        # ffmpeg 能力（路径、版本、编码器），None 时使用 tools.probe() 的进程级缓存
+        self.ffmpeg = ffmpeg
+
+        # 输出目录索引：每个目录只扫描一次，线程安全地分配不冲突的文件名
+        self.output_index = output_index or OutputIndex()
+
+        # 下载存档（DownloadArchive）：已完成的 (extractor, video_id, profile) 在提取前直接跳过
+        self.archive = archive
+
+        # 共享 HTTP 传输层（超时、重试、代理、限速），yt-dlp 通过选项使用相同设置
+        self.http = http_client or default_client()
+
+        # 封面缓存（按视频 ID）：预览和保存共用一次下载
+        self.thumbnails = thumbnails or ThumbnailCache(client=self.http)
+
+        # 全局带宽控制（BandwidthGovernor）：所有下载共用一个令牌桶，按任务优先级加权分配
+        self.bandwidth = bandwidth
+
+        # 每个任务各阶段的耗时、字节数和重试次数（可导出为 Prometheus 格式），DownloadResult 附带任务摘要
+        self.metrics = metrics or Metrics()
+
+        # 可选的 Tracer：按线程记录每个任务各阶段的时间线（Chrome trace-event 格式），默认不记录
+        self.tracer = tracer or NULL_TRACER
+
+        # 由 JobQueue 设置的分阶段并发限制（提取 / 下载 / 后处理）
+        self.stage_limits = None
+
+        # 不经任务队列直接调用时暂停的下载：保存已解析的 info、选定格式和输出模板，继续时无需重新提取
+        self.paused_downloads = {}
+
+    def extract_info(self, url):
+        """执行一次信息提取（计入 extraction_count）"""
+        with self._extract_lock:
+            self.extraction_count += 1
+        if self.on_extract:
+            self.on_extract(url)
+
         ydl_opts = {
+            **self.http.ydl_options(),
             'quiet': True,
             'no_warnings': True,
         }
-        try:
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=False)
+        with self._stage('extract'), self.ydl_pool.borrow(ydl_opts) as ydl, \
+                self.tracer.span('extract_info', 'extract', url=url):
+            started = time.perf_counter()
+            try:
+                return ydl.extract_info(url, download=False)
+            finally:
+                self.metrics.observe('extract', time.perf_counter() - started)
+
+    @staticmethod
+    def _resume_key(kind, url, format_id=None):
+        return (kind, canonical_video_id(url), format_id)
+
+    @staticmethod
+    def _selected_format(info_dict):
+        """yt-dlp 实际选中的格式，例如 "137+140" """
+        requested = info_dict.get('requested_formats')
+        if requested:
+            return '+'.join(f['format_id'] for f in requested)
+        return info_dict.get('format_id')
+
+    @staticmethod
+    def _pausable(d):
+        """所有字节都已收到时不再暂停，否则继续时服务器只会返回 416"""
+        total = d.get('total_bytes') or d.get('total_bytes_estimate')
+        return d['status'] == 'downloading' and not (total and d.get('downloaded_bytes', 0) >= total)
+
+    @staticmethod
+    def _remember_paused(resume, info, ydl_opts, selected):
+        """暂停时把 info、实际选中的格式和文件名记入 resume，继续时不再重新提取（info 只留在内存中）"""
+        if info is not None:
+            resume.update(info=info, format=selected.get('format') or ydl_opts['format'], outtmpl=ydl_opts['outtmpl'])
+
+    def _resume(self, resume, ydl_opts, share=None):
+        """暂停后继续、或崩溃重启后重新运行的任务：沿用 resume 中记录的格式和文件名，yt-dlp 从 .part 断点续传而不是换个新名字从头下载，已在磁盘上的字节不再计入 share；新下载返回 False"""
+        if not resume or not resume.get('outtmpl'):
+            return False
+        ydl_opts['format'] = resume['format']
+        ydl_opts['outtmpl'] = resume['outtmpl']
+        directory, stem = self._output_stem(resume['outtmpl'])
+        self.output_index.claim(directory, stem)
+        if share is not None:
+            share.skip_existing(partial_files(directory, stem))
+        return True
+
+    @staticmethod
+    def _output_stem(outtmpl):
+        directory, name = os.path.split(outtmpl)
+        return directory, name.rsplit('.%(ext)s', 1)[0]
+
+    @staticmethod
+    def _record_output(resume, ydl_opts):
+        resume.update(format=ydl_opts['format'], outtmpl=ydl_opts['outtmpl'])
+
+    def discard_partial(self, resume):
+        """删除不再继续的下载（例如已取消的任务）留下的 .part、.ytdl 和分片文件，并清空 resume"""
+        outtmpl = resume.get('outtmpl')
+        resume.clear()
+        if not outtmpl:
+            return
+        for path in partial_files(*self._output_stem(outtmpl)):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+
+    def _stage(self, name):
+        return self.stage_limits.slot(name) if self.stage_limits else nullcontext()
+
+    def _postprocess_hook(self, timings=None):
+        """ffmpeg 运行期间占用一个 'postprocess' 并发名额，把 yt-dlp 的合并耗时记入 timings，并记录每个后处理器的 trace"""
+        held = []
+        running = {}  # 后处理器 -> 开始时间
+
+        def hook(d):
+            name = d.get('postprocessor')
+            if name and d['status'] == 'started':
+                running[name] = time.perf_counter()
+            elif name in running and d['status'] == 'finished':
+                started = running.pop(name)
+                self.tracer.complete(name, 'postprocess', started)
+                if name == 'Merger' and timings is not None:
+                    seconds = time.perf_counter() - started
+                    hook.merge_seconds += seconds
+                    timings.add('merge', seconds)
+            if not self.stage_limits:
+                return
+            if d['status'] == 'started' and not held:
+                self.stage_limits.acquire('postprocess')
+                held.append(True)
+            elif d['status'] == 'finished' and held:
+                held.pop()
+                self.stage_limits.release('postprocess')
+
+        hook.held = held
+        hook.merge_seconds = 0.0
+        return hook
+
+    def _info_for(self, url, refresh=False):
+        """优先从缓存读取 info，未命中时提取并写入缓存"""
+        if not refresh:
+            info = self.info_cache.get(url)
+            if info is not None:
                 return info
+        info = yt_dlp.YoutubeDL.sanitize_info(self.extract_info(url), True)
+        self.info_cache.put(url, info)
+        return info
+
+    def get_video_info(self, url):
+        """获取视频信息和可用格式（最近解析过的视频直接命中缓存）"""
+        try:
+            return self._info_for(url)
         except Exception as e:
             print(f"Error fetching info: {e}")
             return None
 
-    def download_video(self, url, format_id=None, progress_callback=None, cancel_check=None):
-        """下载视频（指定格式或最佳画质）"""
+    def _unique_title(self, directory, title):
+        """净化标题，并从输出目录索引中预留一个任何扩展名都不冲突的文件名"""
+        safe_title = "".join([c for c in title if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip()
+        return self.output_index.reserve(directory, safe_title)
+
+    @staticmethod
+    def _output_path(info):
+        """yt-dlp 处理后报告的最终文件路径"""
+        downloads = info.get('requested_downloads') or [{}]
+        return downloads[0].get('filepath') or info.get('filepath')
+
+    @staticmethod
+    def _media_url(info):
+        formats = info.get('requested_formats') or info.get('formats') or [info]
+        return formats[-1].get('url') or info.get('url')
+
+    def _connections_for(self, info):
+        """本次下载的并发连接数（固定值或由 tuner 按主机选择，不超过拥塞控制给该主机的上限）"""
+        url = self._media_url(info)
+        return self.congestion.connections(url, self.connections or self.tuner.connections(url))
+
+    def _chunked(self, info):
+        return chunk_formats(info, self.chunk_size, self.range_param_hosts)
+
+    def _throughput_hook(self, connections):
+        """每个格式下载完成后，把实测吞吐量交给 tuner 和拥塞控制"""
+        def hook(d):
+            if d['status'] == 'finished' and d.get('elapsed'):
+                url = (d.get('info_dict') or {}).get('url')
+                nbytes = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                self.tuner.record(url, connections, nbytes, d['elapsed'])
+                self.congestion.record_throughput(url, nbytes, d['elapsed'])
+        return hook
+
+    def _bandwidth_share(self, priority):
+        """任务在全局带宽中的份额（progress hook），未设置 bandwidth 时为 None"""
+        return self.bandwidth.share(priority) if self.bandwidth is not None else None
+
+    def _download_with_info(self, url, info, ydl_opts, measure=True, timings=None, phase=None):
+        """用已提取的 info 直接下载（不再重复提取），链接过期时重新提取一次；大文件按 range 分片并发下载。耗时、字节数和重试记入 timings 的 phase 阶段，phase 为 None 表示只剩合并"""
+        timings = timings or JobTimings(None, None, url)
+        label = phase or 'merge'
+        pp_hook = self._postprocess_hook(timings)
+        connections = self._connections_for(info)
+        ydl_opts = {**self.congestion.ydl_options(), **self.http.ydl_options(), **ydl_opts,
+                    'postprocessor_hooks': [pp_hook], 'concurrent_fragment_downloads': connections}
+        if self.bandwidth is not None:
+            ydl_opts.update(self.bandwidth.ydl_options())
+        if measure:
+            ydl_opts['progress_hooks'] = ydl_opts['progress_hooks'] + [self._throughput_hook(connections)]
+        if phase:
+            ydl_opts['progress_hooks'] = ydl_opts['progress_hooks'] + [timings.bytes_hook(phase)]
+        queued = time.perf_counter()
+        started = None
+        try:
+            with self.congestion.slot(self._media_url(info)), self._stage('download'), \
+                    self.ydl_pool.borrow(ydl_opts) as ydl, \
+                    self.congestion.observing(ydl, timings.response_listener(label)), \
+                    self.tracer.observing(ydl), self.tracer.span('download', 'download', phase=label):
+                started = time.perf_counter()
+                timings.add('download_wait', started - queued)
+                try:
+                    return ydl.process_ie_result(self._chunked(ydl.sanitize_info(info, True)), download=True)
+                except yt_dlp.utils.DownloadError as e:
+                    if "Download Cancelled" in str(e) or "HTTP Error 403" not in str(e):
+                        raise
+                timings.retry(label)
+                fresh = self._info_for(url, refresh=True)
+                return ydl.process_ie_result(self._chunked(fresh), download=True)
+        except BaseException:
+            timings.failed_phase = timings.failed_phase or label
+            raise
+        finally:
+            if phase and started is not None:
+                # 同一次 yt-dlp 运行中的合并已单独计时
+                timings.add(phase, time.perf_counter() - started - pp_hook.merge_seconds)
+            if pp_hook.held:
+                self.stage_limits.release('postprocess')
+
+    def component_formats(self, info, format_spec, format_sort=None):
+        """format_spec 需要合并的各个格式（如视频+音频），单文件格式返回 None"""
+        opts = {'quiet': True, 'no_warnings': True, 'format': format_spec}
+        if format_sort:
+            opts['format_sort'] = format_sort
+        with self.ydl_pool.borrow(opts) as ydl:
+            resolved = ydl.process_ie_result(ydl.sanitize_info(info, True), download=False)
+        requested = resolved.get('requested_formats')
+        return requested if requested and len(requested) > 1 else None
+
+    @staticmethod
+    def _stream_names(formats):
+        names = {}
+        for f in formats:
+            name = 'audio' if f.get('vcodec') == 'none' else 'video'
+            names[f['format_id']] = name if name not in names.values() else f['format_id']
+        return names
+
+    def download_streams(self, url, info, formats, outtmpl, progress_callback=None, cancel_check=None,
+                         concurrent=True, measure=True, share=None, timings=None):
+        """
+        同时下载各个分量流（每个流一个线程），保存为 yt-dlp 合并时查找的
+        "<名称>.f<format_id>.<ext>" 文件。进度回调收到合计进度，每个流的进度在 snapshot.streams 中
+        """
+        base = outtmpl.rsplit('.%(ext)s', 1)[0]
+        names = self._stream_names(formats)
+        streams = {names[f['format_id']]: ProgressSnapshot(0, f.get('filesize') or f.get('filesize_approx'))
+                   for f in formats}
+        lock = threading.Lock()
+        throttle = RateLimiter(self.progress_hz)
+        errors = []
+
+        def hook_for(name):
+            def hook(d):
+                if cancel_check and self._pausable(d) and cancel_check():
+                    raise Exception("Download Cancelled")
+                if d['status'] not in ('downloading', 'finished'):
+                    return
+                snapshot = ProgressSnapshot.from_hook(d)
+                if d['status'] == 'finished':
+                    snapshot.downloaded = snapshot.total = d.get('total_bytes') or d.get('downloaded_bytes') or 0
+                with lock:
+                    streams[name] = snapshot
+                    combined = ProgressSnapshot.combine(streams)
+                    ready = d['status'] == 'finished' or throttle.ready()
+                if progress_callback and ready:
+                    progress_callback(combined)
+            return hook
+
+        def fetch(f):
+            opts = {
+                'format': f['format_id'],
+                'outtmpl': f"{base}.f%(format_id)s.%(ext)s",
+                'progress_hooks': [hook_for(names[f['format_id']])] + ([share] if share else []),
+            }
+            phase = 'audio' if f.get('vcodec') == 'none' else 'video'
+            try:
+                self._download_with_info(url, info, opts, measure, timings, phase)
+            except Exception as e:
+                errors.append(e)
+
+        if concurrent:
+            threads = [threading.Thread(target=fetch, args=(f,), daemon=True) for f in formats]
+            for t in threads:
+                t.start()
+            for t in threads:
+                t.join()
+        else:
+            for f in formats:
+                fetch(f)
+        if errors:
+            cancelled = [e for e in errors if "Download Cancelled" in str(e)]
+            raise (cancelled or errors)[0]
+
+    def _ffmpeg(self):
+        """本机 ffmpeg 的能力，探测结果按进程缓存"""
+        return self.ffmpeg or probe()
+
+    def _done(self, kind, profile, info, passes, path, ext, converted=False):
+        """按输出配置生成完成结果，并记录走的是流复制还是转码"""
+        transcoded = profile.transcodes(info, passes)
+        self.codec_report.record(profile.name, transcoded)
+        if self.archive is not None:
+            self.archive.record(info, profile.name, path)
+        return DownloadResult.done(kind, path, ext, converted, profile.name, transcoded)
+
+    def _archived(self, url, profile, info=None):
+        """存档中该视频在此输出配置下的记录（未下载过则为 None）"""
+        if self.archive is None:
+            return None
+        return self.archive.find(url, profile.name, info)
+
+    def _hand_off(self, kind, info, passes, ydl_opts, wait, make_result, timings):
+        """把下载好的文件交给后处理阶段；wait 为 False 时返回 DownloadResult 的 Future"""
+        options = {'ffmpeg_location': ydl_opts['ffmpeg_location']} if ydl_opts.get('ffmpeg_location') else {}
+
+        def timer(name, seconds):
+            timings.add('postprocess_wait' if name == 'wait' else 'transcode', seconds)
+            if name != 'wait':
+                # 在后处理线程上、该步骤刚结束时调用
+                self.tracer.complete(name, 'postprocess', time.perf_counter() - seconds)
+
+        future = then(self.postprocessor.submit(self._output_path(info), info, passes, options, timer),
+                      make_result, lambda e: DownloadResult.failed(kind, e))
+        return future.result() if wait else future
+
+    def download_video(self, url, format_id=None, progress_callback=None, cancel_check=None, info=None,
+                       passes=None, wait=True, profile=None, format_query=None, priority=0, resume=None):
+        """下载视频（指定格式或最佳画质），传入 info 可跳过提取；暂停后继续时从 .part 断点续传。resume 是每个任务自己的字典（JobQueue 会持久化），记录选定的文件名，崩溃后重新运行时续传同一个 .part。进度回调收到 ProgressSnapshot，返回 DownloadResult"""
+        profile = get_profile(profile, 'video')
+        progress_callback = self.tracer.wrap(progress_callback, 'progress')
+        resume_key = self._resume_key('video', url, format_id)
+        own_resume = resume is None
+        if own_resume:
+            resume = self.paused_downloads.pop(resume_key, None) or {}
+        selected = {}
         
+        throttle = RateLimiter(self.progress_hz)
+
         def progress_hook(d):
-            if cancel_check and cancel_check():
+            if 'format' not in selected:
+                selected['format'] = self._selected_format(d.get('info_dict') or {})
+            if cancel_check and self._pausable(d) and cancel_check():
                 raise Exception("Download Cancelled")
 
             if d['status'] == 'downloading':
-                if progress_callback:
-                    # 1. 尝试解析百分比
-                    p_str = d.get('_percent_str', '0%').strip()
-                    try:
-                        p_match = re.search(r"(\d+\.?\d*)", p_str)
-                        if p_match:
-                            val = float(p_match.group(1))
-                            p = val / 100.0
-                        else:
-                            p = 0.0
-                        
-                        # 2. 尝试解析 ETA
-                        raw_eta = d.get('_eta_str', '')
-                        eta = raw_eta.strip()
-                        if not re.match(r"^\d+:\d+", eta):
-                             eta = "Unknown"
-                        
-                        # 3. 构建详细状态信息
-                        total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-                        total_bytes_str = format_size(total_bytes)
-                        
-                        speed = d.get('speed')
-                        speed_str = f"{format_size(speed)}/s" if speed else "Unknown speed"
-                        
-                        eta_str = d.get('_eta_str') or eta
-                        # 如果没有格式化的时间，尝试从秒数转换
-                        if (not eta_str or "Unknown" in eta_str) and d.get('eta'):
-                             eta_s = d.get('eta')
-                             eta_str = f"{int(eta_s//60):02d}:{int(eta_s%60):02d}"
-
-                        # 格式化百分比
-                        p_str = f"{p*100:.1f}%"
-                        
-                        status_msg = f"[download] {p_str} of {total_bytes_str} at {speed_str} ETA {eta_str}"
-                        
-                        progress_callback(p, status_msg)
-                    except Exception as e:
-                       print(f"Progress error: {e}")
+                # Numeric fields only, at most progress_hz callbacks per second
+                if progress_callback and throttle.ready():
+                    progress_callback(ProgressSnapshot.from_hook(d))
             elif d['status'] == 'finished':
                 if progress_callback:
-                    progress_callback(1.0, "处理中...")
+                    progress_callback(ProgressSnapshot(phase=Phase.MERGING))
 
         # 检查本地或系统的 FFMPEG
-        import shutil
-        ffmpeg_local = os.path.join(os.getcwd(), 'ffmpeg.exe')
-        has_ffmpeg = os.path.exists(ffmpeg_local) or shutil.which('ffmpeg') is not None
-        ffmpeg_location = ffmpeg_local if os.path.exists(ffmpeg_local) else None
+        ffmpeg = self._ffmpeg()
+        has_ffmpeg = ffmpeg.available
 
         ydl_opts = {
             'outtmpl': os.path.join(self.video_path, '%(title)s.%(ext)s'),
             'progress_hooks': [progress_hook],
-            'merge_output_format': 'mp4',
+            **profile.ydl_options(),
         }
         
-        if ffmpeg_location:
-            ydl_opts['ffmpeg_location'] = ffmpeg_location
+        if ffmpeg.available:
+            ydl_opts['ffmpeg_location'] = ffmpeg.location
 
-        if format_id:
-            ydl_opts['format'] = f"{format_id}+bestaudio/best"
-        else:
-            ydl_opts['format'] = 'bestvideo+bestaudio/best'
+        passes = list(passes or [])
+        ydl_opts.update(download_options(passes))
+
+        ydl_opts['format'] = profile.video_selector(format_id)
+
+        timings = self.metrics.start('video', url)
+        share = self._bandwidth_share(priority)
+        if share is not None:
+            ydl_opts['progress_hooks'].append(share)
 
         try:
-            # 1. 先获取标题，计算唯一文件名，防止跳过
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl_temp:
-                info = ydl_temp.extract_info(url, download=False)
-                base_title = info.get('title', 'video')
-                
-                # 简单净化文件名
-                safe_title = "".join([c for c in base_title if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip()
-                
-                # 检测文件名冲突
-                final_title = safe_title
-                counter = 1
-                while True:
-                    # 假设最终是 mp4
-                    check_path = os.path.join(self.video_path, f"{final_title}.mp4")
-                    if os.path.exists(check_path):
-                        final_title = f"{safe_title} ({counter})"
-                        counter += 1
-                    else:
-                        break
-            
-            # 更新输出模板为唯一文件名
-            ydl_opts['outtmpl'] = os.path.join(self.video_path, f"{final_title}.%(ext)s")
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                ydl.download([url])
-            return "视频下载完成"
+            resumed = self._resume(resume, ydl_opts, share)
+            if resumed:
+                # 继续已暂停的任务：沿用原来的 info、格式和文件名
+                info = resume.get('info') or info
+                if info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+            else:
+                # 已在存档中：一次查询即可跳过，不再提取和下载
+                entry = self._archived(url, profile, info)
+                if entry is None and info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+                    entry = self._archived(url, profile, info)
+                if entry is not None:
+                    return self.metrics.finish(timings, DownloadResult.skipped('video', entry['path'], profile.name))
+                if format_query and not format_id:
+                    # 按条件从格式索引中选择，没有匹配时使用默认画质
+                    ydl_opts['format'] = profile.video_selector(format_index(info).select('video', format_query))
+                # 1. 计算唯一文件名，防止跳过
+                with timings.phase('filename'):
+                    final_title = self._unique_title(self.video_path, info.get('title', 'video'))
+
+                # 更新输出模板为唯一文件名
+                ydl_opts['outtmpl'] = os.path.join(self.video_path, f"{final_title}.%(ext)s")
+                self._record_output(resume, ydl_opts)
+
+            # 能合并时先并行下载视频流和音频流，之后的下载直接进入合并
+            formats = (self.component_formats(info, ydl_opts['format'], ydl_opts.get('format_sort'))
+                       if self.parallel_streams and has_ffmpeg else None)
+            if formats:
+                selected['format'] = ydl_opts['format'] = '+'.join(f['format_id'] for f in formats)
+                self.download_streams(url, info, formats, ydl_opts['outtmpl'], progress_callback, cancel_check,
+                                      measure=not resumed, share=share, timings=timings)
+
+            # 两路流已下载完时只剩合并需要计时
+            info = self._download_with_info(url, info, ydl_opts, not resumed, timings,
+                                            None if formats else 'video')
+            if passes:
+                result = self._hand_off('video', info, passes, ydl_opts, wait,
+                                        lambda path: self._done('video', profile, info, passes, path, info.get('ext')),
+                                        timings)
+            else:
+                result = self._done('video', profile, info, passes, self._output_path(info), info.get('ext'))
+            return self.metrics.finish(timings, result)
         except Exception as e:
             if "Download Cancelled" in str(e):
-                return "已暂停"
-            return f"错误: {e}"
+                self._remember_paused(resume, info, ydl_opts, selected)
+                if own_resume:
+                    self.paused_downloads[resume_key] = resume
+                return self.metrics.finish(timings, DownloadResult.paused('video'))
+            return self.metrics.finish(timings, DownloadResult.failed('video', e))
+        finally:
+            if share is not None:
+                share.close()
 
-    def download_audio(self, url, progress_callback=None, cancel_check=None):
-        """下载音频（尝试转换为 MP3）"""
-        import shutil
-        
-        ffmpeg_local = os.path.join(os.getcwd(), 'ffmpeg.exe')
-        has_ffmpeg = os.path.exists(ffmpeg_local) or shutil.which('ffmpeg') is not None
-        ffmpeg_location = ffmpeg_local if os.path.exists(ffmpeg_local) else None
+    def download_audio(self, url, progress_callback=None, cancel_check=None, info=None,
+                       passes=None, wait=True, profile=None, format_query=None, priority=0, resume=None):
+        """下载音频（默认 mp3 配置尝试转换为 MP3，其他配置保留原编码），传入 info 可跳过提取；暂停后继续时从 .part 断点续传，resume 同 download_video"""
+        profile = get_profile(profile, 'audio')
+        progress_callback = self.tracer.wrap(progress_callback, 'progress')
+        ffmpeg = self._ffmpeg()
+
+        resume_key = self._resume_key('audio', url)
+        own_resume = resume is None
+        if own_resume:
+            resume = self.paused_downloads.pop(resume_key, None) or {}
+        selected = {}
+
+        throttle = RateLimiter(self.progress_hz)
 
         def progress_hook(d):
-            if cancel_check and cancel_check():
+            if 'format' not in selected:
+                selected['format'] = self._selected_format(d.get('info_dict') or {})
+            if cancel_check and self._pausable(d) and cancel_check():
                 raise Exception("Download Cancelled")
 
             if d['status'] == 'downloading':
-                if progress_callback:
-                    p = 0.0
-                    # 1. 尝试计算百分比
-                    total = d.get('total_bytes') or d.get('total_bytes_estimate')
-                    downloaded = d.get('downloaded_bytes')
-                    
-                    if total and downloaded:
-                        p = float(downloaded) / float(total)
-                    
-                    # 2. ETA 处理
-                    eta_seconds = d.get('eta')
-                    if eta_seconds is not None:
-                        m, s = divmod(eta_seconds, 60)
-                        h, m = divmod(m, 60)
-                        if h > 0:
-                            eta_str = f"{int(h):02d}:{int(m):02d}:{int(s):02d}"
-                        else:
-                            eta_str = f"{int(m):02d}:{int(s):02d}"
-                    else:
-                        raw_eta = d.get('_eta_str', '')
-                        eta_str = raw_eta.strip()
-
-                        if not re.search(r"\d+:\d+", eta_str):
-                            eta_str = "Unknown"
-                    
-                    # 3. 构建详细状态信息
-                    total_bytes = d.get('total_bytes') or d.get('total_bytes_estimate')
-                    total_bytes_str = format_size(total_bytes)
-                    
-                    speed = d.get('speed')
-                    speed_str = f"{format_size(speed)}/s" if speed else "Unknown speed"
-                    
-                    percent_str = f"{p*100:.1f}%"
-                    
-                    raw_eta = d.get('_eta_str')
-                    if raw_eta:
-                         eta_str = raw_eta.strip()
-                    
-                    # 清理可能存在的 ANSI 字符
-                    ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-                    if eta_str: eta_str = ansi_escape.sub('', eta_str)
-
-                    status_msg = f"[download] {percent_str} of {total_bytes_str} at {speed_str} ETA {eta_str}"
-                    
-                    progress_callback(p, status_msg)
-
+                # Numeric fields only, at most progress_hz callbacks per second
+                if progress_callback and throttle.ready():
+                    progress_callback(ProgressSnapshot.from_hook(d))
             elif d['status'] == 'finished':
                 if progress_callback:
-                    step = "转换中..." if has_ffmpeg else "完成中..."
-                    progress_callback(1.0, step)
+                    phase = Phase.CONVERTING if passes else Phase.FINISHING
+                    progress_callback(ProgressSnapshot(phase=phase))
 
         ydl_opts = {
-            'format': 'bestaudio/best',
+            'format': profile.audio_format,
             'outtmpl': os.path.join(self.audio_path, '%(title)s.%(ext)s'),
             'progress_hooks': [progress_hook],
         }
         
-        if ffmpeg_location:
-            ydl_opts['ffmpeg_location'] = ffmpeg_location
+        if ffmpeg.available:
+            ydl_opts['ffmpeg_location'] = ffmpeg.location
 
-        if has_ffmpeg:
-            ydl_opts['postprocessors'] = [{
-                'key': 'FFmpegExtractAudio',
-                'preferredcodec': 'mp3',
-                'preferredquality': '192',
-            }]
+        # mp3 192k transcode and any extra passes run on the post-processing stage
+        audio_passes = profile.audio_passes(ffmpeg)
+        passes = audio_passes + list(passes or [])
+        ydl_opts.update(download_options(passes))
+
+        timings = self.metrics.start('audio', url)
+        share = self._bandwidth_share(priority)
+        if share is not None:
+            ydl_opts['progress_hooks'].append(share)
 
         try:
-            # 1. 计算唯一文件名
-            with yt_dlp.YoutubeDL({'quiet': True}) as ydl_temp:
-                info = ydl_temp.extract_info(url, download=False)
-                base_title = info.get('title', 'audio')
-                safe_title = "".join([c for c in base_title if c.isalpha() or c.isdigit() or c in (' ', '-', '_', '.')]).rstrip()
-                
-                final_title = safe_title
-                counter = 1
-                while True:
-                    # 音频可能是 mp3
-                    check_path = os.path.join(self.audio_path, f"{final_title}.mp3")
-                    if os.path.exists(check_path):
-                        final_title = f"{safe_title} ({counter})"
-                        counter += 1
-                    else:
-                        break
-
-            ydl_opts['outtmpl'] = os.path.join(self.audio_path, f"{final_title}.%(ext)s")
-
-            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                info = ydl.extract_info(url, download=True) 
-                ext = info.get('ext', 'audio')
-                if has_ffmpeg:
-                     return "Audio Download Complete (MP3)"
-                else:
-                     return f"Audio Download Complete (Saved as .{ext} - Install FFmpeg for MP3)"
+            resumed = self._resume(resume, ydl_opts, share)
+            if resumed:
+                # 继续已暂停的任务
+                info = resume.get('info') or info
+                if info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+            else:
+                # 已在存档中：一次查询即可跳过，不再提取和下载
+                entry = self._archived(url, profile, info)
+                if entry is None and info is None:
+                    with timings.phase('extract', observe=False):
+                        info = self._info_for(url)
+                    entry = self._archived(url, profile, info)
+                if entry is not None:
+                    return self.metrics.finish(timings, DownloadResult.skipped('audio', entry['path'], profile.name))
+                if format_query:
+                    ydl_opts['format'] = format_index(info).select('audio', format_query) or ydl_opts['format']
+                # 1. 计算唯一文件名（检查所有扩展名）
+                with timings.phase('filename'):
+                    final_title = self._unique_title(self.audio_path, info.get('title', 'audio'))
+
+                ydl_opts['outtmpl'] = os.path.join(self.audio_path, f"{final_title}.%(ext)s")
+                self._record_output(resume, ydl_opts)
+
+            info = self._download_with_info(url, info, ydl_opts, not resumed, timings, 'audio')
+            if passes:
+                result = self._hand_off('audio', info, passes, ydl_opts, wait, lambda path: self._done(
+                    'audio', profile, info, passes, path, os.path.splitext(path)[1][1:], bool(audio_passes)), timings)
+            else:
+                result = self._done('audio', profile, info, passes, self._output_path(info), info.get('ext', 'audio'))
+            return self.metrics.finish(timings, result)
         except Exception as e:
             if "Download Cancelled" in str(e):
-                return "已暂停"
-            return f"Error: {e}"
+                self._remember_paused(resume, info, ydl_opts, selected)
+                if own_resume:
+                    self.paused_downloads[resume_key] = resume
+                return self.metrics.finish(timings, DownloadResult.paused('audio'))
+            return self.metrics.finish(timings, DownloadResult.failed('audio', e))
+        finally:
+            if share is not None:
+                share.close()
 
-    def download_thumbnail(self, url):
-        """下载封面图片"""
-        import requests
-        
-        info = self.get_video_info(url)
+    def download_thumbnail(self, url, info=None):
+        """下载封面图片，传入 info 可跳过提取；图片取自封面缓存，预览过的不再重复下载"""
+        timings = self.metrics.start('thumbnail', url)
+        if info is None:
+            with timings.phase('extract', observe=False):
+                info = self.get_video_info(url)
         if not info:
-             return "无法获取信息"
+             return self.metrics.finish(timings, DownloadResult.failed('thumbnail', "无法获取信息"))
         
         thumbnail_url = info.get('thumbnail')
         title = info.get('title', 'thumbnail')
         
         if not thumbnail_url:
-            return "未找到封面"
+            return self.metrics.finish(timings, DownloadResult.failed('thumbnail', "未找到封面"))
 
         try:
-            response = requests.get(thumbnail_url)
-            if response.status_code == 200:
-                # 净化文件名
-                safe_title = "".join([c for c in title if c.isalpha() or c.isdigit() or c==' ' or c=='_']).rstrip()
-                filename = f"{safe_title}_thumbnail.jpg"
-                path = os.path.join(self.video_path, filename)
-                
-                with open(path, 'wb') as f:
-                    f.write(response.content)
-                return f"封面已下载: {filename}"
-            else:
-                return "下载封面失败"
+            # 净化文件名
+            safe_title = "".join([c for c in title if c.isalpha() or c.isdigit() or c==' ' or c=='_']).rstrip()
+            ext = thumbnail_ext(thumbnail_url)
+            path = os.path.join(self.video_path, f"{safe_title}_thumbnail.{ext}")
+            with timings.phase('thumbnail'), self.tracer.span('thumbnail', 'download', url=url):
+                self.thumbnails.save(info, path)
+            timings.add_bytes('thumbnail', os.path.getsize(path))
+            result = DownloadResult.done('thumbnail', path, ext)
+        except HTTPError:
+            result = DownloadResult.failed('thumbnail', "下载封面失败")
         except Exception as e:
-            return f"错误: {e}"
+            result = DownloadResult.failed('thumbnail', e)
+        return self.metrics.finish(timings, result)
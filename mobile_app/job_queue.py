@@ -0,0 +1,500 @@
+import heapq
+import itertools
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from records import DownloadResult, JobStatus, ProgressSnapshot
+
+# Job states
+PENDING = JobStatus.PENDING
+RUNNING = JobStatus.RUNNING
+PAUSING = JobStatus.PAUSING
+PAUSED = JobStatus.PAUSED
+DONE = JobStatus.DONE
+SKIPPED = JobStatus.SKIPPED
+FAILED = JobStatus.FAILED
+CANCELLED = JobStatus.CANCELLED
+
+FINISHED_STATES = (DONE, SKIPPED, FAILED, CANCELLED)
+
+# Fields written to the state file; callbacks and info dicts stay in memory
+PERSISTED_FIELDS = ('job_id', 'kind', 'url', 'priority', 'options', 'state',
+                    'progress', 'snapshot', 'result', 'created', 'resume')
+
+DEFAULT_LIMITS = {
+    'extract': 2,                       # concurrent metadata extractions
+    'download': 3,                      # concurrent network downloads
+    'postprocess': os.cpu_count() or 1, # concurrent ffmpeg runs
+}
+
+
+class StageLimits:
+    """
+    Separate concurrency caps for the extraction, network download and
+    ffmpeg post-processing stages of every job.
+    """
+
+    def __init__(self, limits=None):
+        self.limits = dict(DEFAULT_LIMITS, **(limits or {}))
+        self._semaphores = {k: threading.BoundedSemaphore(v) for k, v in self.limits.items()}
+        self._lock = threading.Lock()
+        # stage -> [active, waiting, entered, wait seconds, busy seconds]
+        self._counters = {k: [0, 0, 0, 0.0, 0.0] for k in self.limits}
+
+    @contextmanager
+    def slot(self, stage):
+        sem = self._semaphores.get(stage)
+        if sem is None:
+            yield
+            return
+        counters = self._counters[stage]
+        requested = time.perf_counter()
+        with self._lock:
+            counters[1] += 1
+        sem.acquire()
+        entered = time.perf_counter()
+        with self._lock:
+            counters[0] += 1
+            counters[1] -= 1
+            counters[2] += 1
+            counters[3] += entered - requested
+        try:
+            yield
+        finally:
+            sem.release()
+            with self._lock:
+                counters[0] -= 1
+                counters[4] += time.perf_counter() - entered
+
+    def stats(self):
+        """
+        Per stage: limit, slots in use, threads waiting for one, and the total
+        time spent waiting for and holding slots.
+        """
+        with self._lock:
+            return {stage: {'limit': self.limits[stage], 'active': active, 'waiting': waiting,
+                            'entered': entered, 'wait_seconds': round(wait, 3), 'busy_seconds': round(busy, 3)}
+                    for stage, (active, waiting, entered, wait, busy) in self._counters.items()}
+
+    def acquire(self, stage):
+        sem = self._semaphores.get(stage)
+        if sem is not None:
+            sem.acquire()
+
+    def release(self, stage):
+        sem = self._semaphores.get(stage)
+        if sem is not None:
+            sem.release()
+
+
+class Job:
+    """
+    One queued download. kind is 'video', 'audio' or 'thumbnail'.
+    snapshot is the latest ProgressSnapshot, result the DownloadResult.
+    resume holds the output name and format the downloader picked, so a
+    rerun continues the same .part file.
+    """
+    __slots__ = ('job_id', 'kind', 'url', 'priority', 'options', 'state',
+                 'progress', 'snapshot', 'result', 'created', 'info', 'resume')
+
+    def __init__(self, kind, url, priority=0, options=None, job_id=None):
+        self.job_id = job_id or uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.url = url
+        self.priority = priority
+        self.options = options or {}
+        self.state = PENDING
+        self.progress = 0.0
+        self.snapshot = None
+        self.result = None
+        self.created = time.time()
+        self.info = None  # pre-extracted info dict, never persisted
+        self.resume = {}
+
+    def describe(self):
+        """
+        Human-readable status line: the result once finished, else the progress.
+        """
+        record = self.result or self.snapshot
+        return record.describe() if record else ""
+
+    def to_dict(self):
+        data = {k: getattr(self, k) for k in PERSISTED_FIELDS}
+        data['state'] = self.state.value
+        data['snapshot'] = self.snapshot.to_dict() if self.snapshot else None
+        data['result'] = self.result.to_dict() if self.result else None
+        # Copied first: the download thread may be updating it. The paused
+        # info dict stays in memory, like job.info
+        data['resume'] = {k: v for k, v in dict(self.resume).items() if k != 'info'}
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        job = cls(data['kind'], data['url'], data.get('priority', 0), data.get('options'), data['job_id'])
+        job.state = JobStatus(data.get('state', PENDING))
+        job.progress = data.get('progress', 0.0)
+        job.created = data.get('created', job.created)
+        job.resume = dict(data.get('resume') or {})
+        # State files from older versions stored free-form strings here
+        if isinstance(data.get('snapshot'), dict):
+            job.snapshot = ProgressSnapshot.from_dict(data['snapshot'])
+        if isinstance(data.get('result'), dict):
+            job.result = DownloadResult.from_dict(data['result'])
+        return job
+
+
+class JobQueue:
+    """
+    Priority job queue drained by a fixed pool of worker threads.
+
+    listener(job) is called from worker threads whenever a job's progress or
+    state changes; more listeners can be added with add_listener(). With
+    state_path set, jobs are saved to disk on every state change and
+    unfinished jobs are re-queued on the next start.
+    """
+
+    def __init__(self, downloader, workers=2, limits=None, state_path=None, listener=None):
+        self.downloader = downloader
+        self.workers = workers
+        self.limits = StageLimits(limits)
+        self.state_path = state_path
+        self.listeners = [listener] if listener else []
+
+        # Let the downloader respect the per-stage caps
+        downloader.stage_limits = self.limits
+
+        self._jobs = {}
+        self._heap = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._threads = []
+        self._stopping = False
+
+        if state_path:
+            with self._cond:
+                self._load()
+
+    # --- public API ---
+
+    def start(self):
+        with self._cond:
+            if self._threads:
+                return
+            self._stopping = False
+            for i in range(self.workers):
+                t = threading.Thread(target=self._worker, name=f"job-worker-{i}", daemon=True)
+                self._threads.append(t)
+                t.start()
+
+    def stop(self, wait=True):
+        with self._cond:
+            self._stopping = True
+            self._cond.notify_all()
+        if wait:
+            for t in self._threads:
+                t.join()
+        self._threads = []
+
+    def submit(self, kind, url, priority=0, info=None, **options):
+        """
+        Queues a job and returns its id. Higher priority runs first.
+        """
+        job = Job(kind, url, priority, options)
+        job.info = info
+        with self._cond:
+            self._jobs[job.job_id] = job
+        # Announce the pending job before a worker can pick it up
+        self._notify(job)
+        with self._cond:
+            self._push(job)
+            self._save()
+        return job.job_id
+
+    def add_listener(self, listener):
+        self.listeners.append(listener)
+
+    def get(self, job_id):
+        return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._cond:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancels a job. A running one stops at its next progress report;
+        the partial files of a paused one are deleted now.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            paused = job is not None and job.state == PAUSED
+        if not self._set_state(job_id, CANCELLED):
+            return False
+        if paused:
+            self._discard_partial(job)
+        return True
+
+    def pause(self, job_id):
+        """
+        Pauses a job. A running one is PAUSING until its download has
+        actually stopped and left its .part file; it is PAUSED after that.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in (PENDING, RUNNING):
+                return False
+            job.state = PAUSING if job.state == RUNNING else PAUSED
+            self._save()
+        self._notify(job)
+        return True
+
+    def resume(self, job_id):
+        """
+        Queues a paused job again. A job still PAUSING keeps running
+        instead; if its download already stopped, _finish() re-queues it,
+        so two downloads never write the same .part file.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in (PAUSING, PAUSED):
+                return False
+            if job.state == PAUSING:
+                job.state = RUNNING
+            else:
+                job.state = PENDING
+                job.result = None
+                self._push(job)
+            self._save()
+        self._notify(job)
+        return True
+
+    def discard(self, job_id):
+        """
+        Forgets a finished job so long-running batches keep memory flat.
+        """
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state not in FINISHED_STATES:
+                return False
+            del self._jobs[job_id]
+            self._save()
+        return True
+
+    def stats(self):
+        """
+        Job counts by state, stage slot usage and, when the downloader has
+        them, post-processing queue depth, per-pass timings and stream copy
+        vs transcode counts per output profile, content store savings,
+        per-host HTTP connection counters, YoutubeDL pool reuse, the
+        bandwidth governor's rate and waits, the congestion controller's
+        per-host caps and decisions, and p50/p95 seconds per job phase.
+        """
+        with self._cond:
+            states = {}
+            for job in self._jobs.values():
+                states[job.state.value] = states.get(job.state.value, 0) + 1
+        stats = {'jobs': states, 'stages': self.limits.stats()}
+        postprocessor = getattr(self.downloader, 'postprocessor', None)
+        if postprocessor is not None:
+            stats['postprocess'] = postprocessor.stats()
+        archive = getattr(self.downloader, 'archive', None)
+        if archive is not None:
+            stats['archive'] = archive.stats()
+        codec_report = getattr(self.downloader, 'codec_report', None)
+        if codec_report is not None:
+            stats['codecs'] = codec_report.stats()
+        content_store = getattr(self.downloader, 'content_store', None)
+        if content_store is not None:
+            stats['content_store'] = content_store.report()
+        http = getattr(self.downloader, 'http', None)
+        if http is not None:
+            stats['http'] = http.stats()
+        ydl_pool = getattr(self.downloader, 'ydl_pool', None)
+        if ydl_pool is not None:
+            stats['ydl_pool'] = ydl_pool.stats()
+        bandwidth = getattr(self.downloader, 'bandwidth', None)
+        if bandwidth is not None:
+            stats['bandwidth'] = bandwidth.stats()
+        congestion = getattr(self.downloader, 'congestion', None)
+        if congestion is not None:
+            stats['congestion'] = congestion.stats()
+        metrics = getattr(self.downloader, 'metrics', None)
+        if metrics is not None:
+            stats['metrics'] = metrics.stats()
+        return stats
+
+    def is_stopped(self, job_id):
+        """
+        cancel_check for the downloader: True once the job was paused or cancelled.
+        """
+        job = self._jobs.get(job_id)
+        return job is None or job.state in (PAUSING, PAUSED, CANCELLED)
+
+    # --- internals ---
+
+    def _push(self, job):
+        # Caller holds the lock
+        heapq.heappush(self._heap, (-job.priority, next(self._seq), job.job_id))
+        self._cond.notify()
+
+    def _set_state(self, job_id, state):
+        with self._cond:
+            job = self._jobs.get(job_id)
+            if job is None or job.state in FINISHED_STATES:
+                return False
+            job.state = state
+            self._save()
+        self._notify(job)
+        return True
+
+    def _next_job(self):
+        with self._cond:
+            while True:
+                if self._stopping:
+                    return None
+                while self._heap:
+                    _, _, job_id = heapq.heappop(self._heap)
+                    job = self._jobs.get(job_id)
+                    # Skip entries for jobs paused/cancelled while queued
+                    if job is not None and job.state == PENDING:
+                        job.state = RUNNING
+                        job.result = None
+                        self._save()
+                        return job
+                self._cond.wait()
+
+    def _worker(self):
+        while True:
+            job = self._next_job()
+            if job is None:
+                return
+            self._notify(job)
+            tracer = getattr(self.downloader, 'tracer', None)
+            if tracer is not None:
+                # Async span: a job handed to post-processing ends on another thread
+                tracer.begin(f"{job.kind} job", 'job', job.job_id, url=job.url)
+            try:
+                result = self._run(job)
+            except Exception as e:
+                result = DownloadResult.failed(job.kind, e)
+
+            if isinstance(result, Future):
+                # The download is done and its file sits in the post-processing
+                # queue; this worker moves on to the next download meanwhile
+                result.add_done_callback(lambda f, job=job: self._finish(job, f.result()))
+                continue
+            self._finish(job, result)
+
+    def _finish(self, job, result):
+        tracer = getattr(self.downloader, 'tracer', None)
+        if tracer is not None:
+            tracer.end(f"{job.kind} job", 'job', job.job_id, status=result.status.value)
+        with self._cond:
+            job.result = result
+            if job.state is RUNNING and result.status is PAUSED:
+                # Resumed while the pause was taking effect: run it again
+                job.state = PENDING
+                job.result = None
+                self._push(job)
+            elif job.state in (RUNNING, PAUSING):
+                job.state = result.status
+                if result.ok:
+                    job.progress = 1.0
+            # A job cancelled meanwhile keeps that state; if its download
+            # stopped half-way, the partial files go too
+            discard = job.state is CANCELLED and result.status is PAUSED
+            if job.state in FINISHED_STATES and not discard:
+                job.resume.clear()
+            self._save()
+        if discard:
+            self._discard_partial(job)
+        self._notify(job)
+
+    def _discard_partial(self, job):
+        discard_partial = getattr(self.downloader, 'discard_partial', None)
+        if discard_partial is not None:
+            discard_partial(job.resume)
+        else:
+            job.resume.clear()
+        with self._cond:
+            self._save()
+
+    def _run(self, job):
+        saved = []
+
+        def progress(snapshot):
+            job.snapshot = snapshot
+            job.progress = snapshot.fraction
+            if job.resume and not saved:
+                # Persist the chosen output name while the .part is still small
+                saved.append(True)
+                with self._cond:
+                    self._save()
+            self._notify(job)
+
+        def cancel_check():
+            return self.is_stopped(job.job_id)
+
+        d = self.downloader
+        if job.kind == 'video':
+            return d.download_video(job.url, job.options.get('format_id'), progress, cancel_check, info=job.info,
+                                    passes=job.options.get('passes'), wait=False, profile=job.options.get('profile'),
+                                    format_query=job.options.get('format_query'), priority=job.priority,
+                                    resume=job.resume)
+        if job.kind == 'audio':
+            return d.download_audio(job.url, progress, cancel_check, info=job.info,
+                                    passes=job.options.get('passes'), wait=False, profile=job.options.get('profile'),
+                                    format_query=job.options.get('format_query'), priority=job.priority,
+                                    resume=job.resume)
+        if job.kind == 'thumbnail':
+            return d.download_thumbnail(job.url, info=job.info)
+        raise ValueError(f"Unknown job kind: {job.kind}")
+
+    def _notify(self, job):
+        for listener in self.listeners:
+            try:
+                listener(job)
+            except Exception as e:
+                print(f"Job listener error: {e}")
+
+    def _save(self):
+        # Caller holds the lock; write-then-rename so a crash never leaves a torn file
+        if not self.state_path:
+            return
+        tmp = f"{self.state_path}.tmp"
+        try:
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump([j.to_dict() for j in self._jobs.values()], f, ensure_ascii=False)
+            os.replace(tmp, self.state_path)
+        except OSError as e:
+            print(f"Error saving job state: {e}")
+
+    def _load(self):
+        # Caller holds the lock
+        if not os.path.exists(self.state_path):
+            return
+        try:
+            with open(self.state_path, encoding='utf-8') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            print(f"Error loading job state: {e}")
+            return
+
+        for data in saved:
+            job = Job.from_dict(data)
+            if job.state in FINISHED_STATES:
+                continue
+            # A job that was running when the process died restarts under the
+            # output name saved in job.resume, so yt-dlp continues its .part
+            if job.state == RUNNING:
+                job.state = PENDING
+            elif job.state == PAUSING:
+                job.state = PAUSED
+            self._jobs[job.job_id] = job
+            if job.state == PENDING:
+                self._push(job)
@@ -1,7 +1,12 @@
 import flet as ft
+import os
 import threading
-import re
+import time
 from downloader_logic import YouTubeDownloader
+from format_index import format_index
+from job_queue import JobQueue, RUNNING, PAUSED
+from progress import DEFAULT_HZ, ProgressAggregator
+from records import Phase
 
 def main(page: ft.Page):
     page.title = "YouTube 视频下载器"
@@ -13,11 +18,12 @@ def main(page: ft.Page):
     # 逻辑实例
     downloader = YouTubeDownloader()
     video_info = {}
+    video_url = None  # video_info 对应的链接
     format_map = {}
     
     # 状态
-    download_tasks = {}
-    cancel_flags = {}
+    job_ids = {}  # 各任务对应的队列 job_id
+    restored_jobs = set()  # 上次会话遗留的任务：在后台完成，不影响本次的进度条
     progress_map = {}
     is_paused = False
 
@@ -83,29 +89,22 @@ def main(page: ft.Page):
         page.update()
 
         def task():
-            nonlocal video_info
+            nonlocal video_info, video_url
             info = downloader.get_video_info(url)
             if info:
                 video_info = info
+                video_url = url
                 # 更新 UI
                 thumb_img.src = info.get('thumbnail')
                 thumb_img.visible = True
                 
                 video_title_label.value = info.get('title', 'Unknown')
                 
-                # 格式处理
-                formats = info.get('formats', [])
-                resolutions = set()
+                # 格式处理：每种分辨率/帧率/容器保留最佳格式，已按画质排序
+                choices = format_index(info).choices()
                 format_map.clear()
-                
-                for f in formats:
-                    if f.get('vcodec') != 'none' and f.get('height'):
-                        res_str = f"{f['height']}p - {f['ext']}"
-                        if res_str not in resolutions:
-                            resolutions.add(res_str)
-                            format_map[res_str] = f['format_id']
-                
-                sorted_res = sorted(list(resolutions), key=lambda x: int(x.split('p')[0]), reverse=True)
+                format_map.update(choices)
+                sorted_res = [label for label, _ in choices]
                 res_dropdown.options = [ft.dropdown.Option(r) for r in sorted_res]
                 if sorted_res:
                     res_dropdown.value = sorted_res[0]
@@ -158,31 +157,43 @@ def main(page: ft.Page):
         progress_bar.value = avg_percent
         update_ui_safe()
 
-    def download_wrapper(url, format_id, audio_only, task_type):
-        def check_cancel():
-            return cancel_flags.get(task_type, False)
-
-        def progress(percent, status_msg):
-            progress_map[task_type] = percent
-            update_progress_bar()
-            
-            # 状态更新
-            if "[download]" in status_msg:
-                 # 去除 ANSI 字符
-                ansi_escape = re.compile(r'\x1B(?:[@-Z\\-_]|\[[0-?]*[ -/]*[@-~])')
-                clean_msg = ansi_escape.sub('', status_msg)
-                status_label.value = f"{clean_msg}"
-                update_ui_safe()
+    def cached_info(url):
+        return video_info if video_info and url == video_url else None
 
-        if audio_only:
-            result = downloader.download_audio(url, progress, check_cancel)
-        else:
-            result = downloader.download_video(url, format_id, progress, check_cancel)
+    def progress(task_type, snapshot):
+        # 只修改控件，由 progress_ticker 统一刷新
+        progress_map[task_type] = snapshot.fraction
+        total = sum(progress_map.values())
+        progress_bar.value = total / len(progress_map)
         
-        finish_download(result, task_type)
+        # 状态更新：下载阶段显示速度/剩余时间
+        if snapshot.phase is Phase.DOWNLOADING:
+            status_label.value = snapshot.describe()
+
+    def on_job_update(job):
+        # 由队列工作线程调用：只记录最新状态，不直接刷新界面
+        if job.job_id in restored_jobs:
+            return
+        progress_feed.publish(job.kind, (job.state, job.snapshot, job.result))
+
+    def progress_ticker():
+        # 每个周期批量应用一次进度，只调用一次 page.update()
+        while True:
+            time.sleep(1 / DEFAULT_HZ)
+            batch = progress_feed.drain()
+            running = False
+            for task_type, (state, snapshot, result) in batch.items():
+                if state is RUNNING:
+                    if snapshot:
+                        progress(task_type, snapshot)
+                        running = True
+                elif result is not None:
+                    finish_download(result, task_type)
+            if running:
+                update_ui_safe()
 
     def finish_download(result, task_type):
-        if result == "已暂停":
+        if result.status is PAUSED:
             status_label.value = "下载已暂停"
             update_ui_safe()
             return
@@ -198,13 +209,13 @@ def main(page: ft.Page):
             check_btn.disabled = False
             btn_control.visible = False
             progress_map.clear()
-            cancel_flags.clear()
+            job_ids.clear()
             status_label.value = "所有任务已完成"
             
-            page.snack_bar = ft.SnackBar(ft.Text(f"下载完成: {result}"))
+            page.snack_bar = ft.SnackBar(ft.Text(f"下载完成: {result.describe()}"))
             page.snack_bar.open = True
         else:
-             status_label.value = f"{task_type}: {result}"
+             status_label.value = f"{task_type}: {result.describe()}"
         
         update_ui_safe()
 
@@ -214,30 +225,20 @@ def main(page: ft.Page):
         fid = format_map.get(res)
         
         prepare_download_ui('video', is_resume)
-        cancel_flags['video'] = False
-        t = threading.Thread(target=download_wrapper, args=(url, fid, False, 'video'))
-        download_tasks['video'] = t
-        t.start()
+        # 复用解析时的 info，避免重复提取
+        job_ids['video'] = jobs.submit('video', url, info=cached_info(url), format_id=fid)
 
     def start_download_audio(e=None, is_resume=False):
         url = url_input.value
         prepare_download_ui('audio', is_resume)
-        cancel_flags['audio'] = False
-        t = threading.Thread(target=download_wrapper, args=(url, None, True, 'audio'))
-        download_tasks['audio'] = t
-        t.start()
+        job_ids['audio'] = jobs.submit('audio', url, info=cached_info(url))
         
     def start_download_thumb(e=None):
         url = url_input.value
         prepare_download_ui('thumbnail')
-        
-        def task():
-            progress_map['thumbnail'] = 0.5
-            update_progress_bar()
-            res = downloader.download_thumbnail(url)
-            finish_download(res, 'thumbnail')
-            
-        threading.Thread(target=task).start()
+        progress_map['thumbnail'] = 0.5
+        update_progress_bar()
+        job_ids['thumbnail'] = jobs.submit('thumbnail', url, priority=1, info=cached_info(url))
 
     def toggle_pause(e):
         nonlocal is_paused
@@ -246,17 +247,15 @@ def main(page: ft.Page):
             is_paused = False
             btn_control.text = "暂停下载"
             btn_control.icon = "pause"
-            if 'video' in progress_map and progress_map['video'] < 1.0:
-                start_download_video(is_resume=True)
-            if 'audio' in progress_map and progress_map['audio'] < 1.0:
-                start_download_audio(is_resume=True)
+            for job_id in job_ids.values():
+                jobs.resume(job_id)
         else:
             # 暂停
             is_paused = True
             btn_control.text = "继续下载"
             btn_control.icon = "play_arrow"
-            for k in cancel_flags:
-                cancel_flags[k] = True
+            for job_id in job_ids.values():
+                jobs.pause(job_id)
         update_ui_safe()
 
     btn_download.on_click = start_download_video
@@ -264,4 +263,15 @@ def main(page: ft.Page):
     btn_thumb.on_click = start_download_thumb
     btn_control.on_click = toggle_pause
 
+    # 进度汇总：工作线程发布，progress_ticker 按固定频率批量刷新
+    progress_feed = ProgressAggregator()
+    threading.Thread(target=progress_ticker, daemon=True).start()
+
+    # 下载队列（未完成的任务保存到磁盘，重启后继续）
+    jobs = JobQueue(downloader, workers=2,
+                    state_path=os.path.join(downloader.base_path, '.youtube_jobs.json'),
+                    listener=on_job_update)
+    restored_jobs.update(job.job_id for job in jobs.jobs())
+    jobs.start()
+
 ft.app(target=main)
@@ -0,0 +1,262 @@
+import os
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from contextlib import contextmanager
+
+from postprocess import then
+
+PREFIX = 'youtube_scraper'
+# Phases a job's wall time is split into; the waits are time queued for a
+# download slot and for a post-processing worker, transcode the passes
+PHASES = ('extract', 'filename', 'download_wait', 'video', 'audio', 'merge', 'postprocess_wait', 'transcode',
+          'thumbnail')
+BUCKETS = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+RECENT_SAMPLES = 1000
+RECENT_JOBS = 200
+
+
+class Histogram:
+    """
+    Prometheus-style histogram over BUCKETS, plus the last RECENT_SAMPLES
+    observations for exact quantiles.
+    """
+    __slots__ = ('counts', 'sum', 'count', 'recent')
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS)  # per bucket, not cumulative
+        self.sum = 0.0
+        self.count = 0
+        self.recent = deque(maxlen=RECENT_SAMPLES)
+
+    def observe(self, value):
+        self.sum += value
+        self.count += 1
+        self.recent.append(value)
+        for i, bound in enumerate(BUCKETS):
+            if value <= bound:
+                self.counts[i] += 1
+                break
+
+    def quantile(self, q):
+        if not self.recent:
+            return None
+        ordered = sorted(self.recent)
+        return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+    def cumulative(self):
+        total = 0
+        for bound, n in zip(BUCKETS, self.counts):
+            total += n
+            yield bound, total
+
+
+class JobTimings:
+    """
+    Where one download call's wall time went: seconds per phase, bytes
+    moved per phase and retried requests. Phases that run side by side
+    (the video and audio streams) are timed separately, so their sum can
+    exceed the wall time. Thread-safe.
+    """
+
+    def __init__(self, metrics, kind, url):
+        self.metrics = metrics
+        self.kind = kind
+        self.url = url
+        self.started = time.time()
+        self._t0 = time.perf_counter()
+        self.phases = {}
+        self.bytes = {}
+        self.retries = 0
+        self.failed_phase = None
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def phase(self, name, observe=True):
+        """
+        Times the block as phase name. observe=False keeps it out of the
+        histograms (when the work already recorded itself there).
+        """
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException:
+            self.failed_phase = self.failed_phase or name
+            raise
+        finally:
+            self.add(name, time.perf_counter() - started, observe)
+
+    def add(self, name, seconds, observe=True):
+        with self._lock:
+            self.phases[name] = self.phases.get(name, 0.0) + seconds
+        if observe and self.metrics is not None:
+            self.metrics.observe(name, seconds)
+
+    def add_bytes(self, phase, nbytes):
+        with self._lock:
+            self.bytes[phase] = self.bytes.get(phase, 0) + nbytes
+        if self.metrics is not None:
+            self.metrics.count('bytes', phase, nbytes)
+
+    def retry(self, phase):
+        with self._lock:
+            self.retries += 1
+        if self.metrics is not None:
+            self.metrics.count('retries', phase)
+
+    def bytes_hook(self, phase):
+        """
+        progress_hooks entry adding each downloaded file's size to phase.
+        (Concurrent fragments report downloaded_bytes out of order, so
+        running deltas would overcount; files already on disk carry no
+        elapsed and are skipped.)
+        """
+        def hook(d):
+            if d.get('status') == 'finished' and 'elapsed' in d:
+                self.add_bytes(phase, d.get('total_bytes') or d.get('downloaded_bytes') or 0)
+        return hook
+
+    def response_listener(self, phase):
+        """
+        Callback for CongestionController.observing(): a failed response
+        means yt-dlp retries (or gives up on) the request.
+        """
+        def listener(status):
+            if status is None or status >= 400:
+                self.retry(phase)
+        return listener
+
+    @property
+    def seconds(self):
+        return time.perf_counter() - self._t0
+
+    def to_dict(self, result=None):
+        with self._lock:
+            summary = {'kind': self.kind, 'url': self.url, 'started': round(self.started, 3),
+                       'seconds': round(self.seconds, 3),
+                       'phases': {name: round(s, 3) for name, s in self.phases.items()},
+                       'bytes': dict(self.bytes), 'retries': self.retries}
+        if result is not None:
+            summary['status'] = result.status.value
+            if result.error:
+                summary['error'] = result.error
+                summary['failed_phase'] = self.failed_phase
+        return summary
+
+
+class Metrics:
+    """
+    Process-wide job metrics: a histogram of seconds per phase and of whole
+    jobs per kind, counters of bytes and retries per phase and of finished
+    jobs per kind and status. render() gives the Prometheus text format,
+    stats() p50/p95 per phase, summaries() the JSON summary of recent jobs.
+    """
+
+    def __init__(self, recent_jobs=RECENT_JOBS):
+        self._phases = {}
+        self._jobs = {}
+        self._counters = {'bytes': {}, 'retries': {}, 'jobs': {}}
+        self._summaries = deque(maxlen=recent_jobs)
+        self._lock = threading.Lock()
+
+    def start(self, kind, url):
+        return JobTimings(self, kind, url)
+
+    def observe(self, phase, seconds):
+        with self._lock:
+            histogram = self._phases.get(phase)
+            if histogram is None:
+                histogram = self._phases[phase] = Histogram()
+            histogram.observe(seconds)
+
+    def count(self, counter, label, n=1):
+        with self._lock:
+            values = self._counters[counter]
+            values[label] = values.get(label, 0) + n
+
+    def finish(self, timings, result):
+        """
+        Records the job behind timings as finished with result (a
+        DownloadResult, or a Future of one) and attaches its summary to the
+        result as result.timings. Returns result.
+        """
+        if isinstance(result, Future):
+            return then(result, lambda r: self.finish(timings, r))
+        summary = timings.to_dict(result)
+        result.timings = summary
+        with self._lock:
+            histogram = self._jobs.get(timings.kind)
+            if histogram is None:
+                histogram = self._jobs[timings.kind] = Histogram()
+            histogram.observe(summary['seconds'])
+            jobs = self._counters['jobs']
+            key = (timings.kind, summary['status'])
+            jobs[key] = jobs.get(key, 0) + 1
+            self._summaries.append(summary)
+        return result
+
+    def summaries(self):
+        with self._lock:
+            return list(self._summaries)
+
+    def stats(self):
+        """
+        Per phase: count, total seconds, p50, p95 and max over the recent
+        samples; bytes and retries per phase.
+        """
+        def describe(h):
+            return {'count': h.count, 'seconds': round(h.sum, 3), 'p50': _round(h.quantile(0.5)),
+                    'p95': _round(h.quantile(0.95)), 'max': _round(max(h.recent, default=None))}
+
+        with self._lock:
+            return {'phases': {name: describe(h) for name, h in self._phases.items()},
+                    'jobs': {kind: describe(h) for kind, h in self._jobs.items()},
+                    'bytes': dict(self._counters['bytes']), 'retries': dict(self._counters['retries'])}
+
+    def render(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+
+        def histogram(name, help_text, label, histograms):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} histogram")
+            for value, h in sorted(histograms.items()):
+                for bound, total in h.cumulative():
+                    lines.append(f'{PREFIX}_{name}_bucket{{{label}="{value}",le="{bound:g}"}} {total}')
+                lines.append(f'{PREFIX}_{name}_bucket{{{label}="{value}",le="+Inf"}} {h.count}')
+                lines.append(f'{PREFIX}_{name}_sum{{{label}="{value}"}} {h.sum:.6f}')
+                lines.append(f'{PREFIX}_{name}_count{{{label}="{value}"}} {h.count}')
+
+        def counter(name, help_text, labels, values):
+            lines.append(f"# HELP {PREFIX}_{name} {help_text}")
+            lines.append(f"# TYPE {PREFIX}_{name} counter")
+            for key, n in sorted(values.items()):
+                key = key if isinstance(key, tuple) else (key,)
+                pairs = ','.join(f'{label}="{v}"' for label, v in zip(labels, key))
+                lines.append(f"{PREFIX}_{name}{{{pairs}}} {n}")
+
+        with self._lock:
+            histogram('phase_seconds', "Seconds spent per job phase.", 'phase', self._phases)
+            histogram('job_seconds', "Wall time of a whole download call.", 'kind', self._jobs)
+            counter('bytes_total', "Bytes downloaded per phase.", ('phase',), self._counters['bytes'])
+            counter('retries_total', "Failed requests yt-dlp retried, per phase.", ('phase',),
+                    self._counters['retries'])
+            counter('jobs_total', "Finished download calls per kind and status.", ('kind', 'status'),
+                    self._counters['jobs'])
+        return '\n'.join(lines) + '\n'
+
+    def write(self, path):
+        """
+        Writes render() to path atomically, e.g. for node_exporter's textfile collector.
+        """
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            f.write(self.render())
+        os.replace(tmp, path)
+
+
+def _round(value):
+    return None if value is None else round(value, 3)
@@ -0,0 +1,163 @@
+import json
+import os
+import re
+import shutil
+import subprocess
+import threading
+
+TOOLS_DIR = os.path.join(os.path.expanduser("~"), ".youtube_scraper")
+REGISTRY_NAME = 'tools.json'
+
+# Encoders that produce each audio codec, best first
+AUDIO_ENCODERS = {
+    'mp3': ('libmp3lame', 'libshine', 'mp3_mf'),
+    'aac': ('libfdk_aac', 'aac', 'aac_mf', 'aac_at'),
+    'opus': ('libopus', 'opus'),
+    'vorbis': ('libvorbis', 'vorbis'),
+    'flac': ('flac',),
+    'alac': ('alac', 'alac_at'),
+}
+
+_VERSION = re.compile(r'^\S+ version (\S+)')
+_ENCODER = re.compile(r'^\s*[VAS][.\w]{5}\s+(\w\S*)')
+
+_cache = {}
+_lock = threading.Lock()
+
+
+def registry_path(tools_dir=None):
+    return os.path.join(tools_dir or TOOLS_DIR, REGISTRY_NAME)
+
+
+def registered(tools_dir=None):
+    """
+    {tool name: path} recorded by register(); {} when nothing was installed.
+    """
+    try:
+        with open(registry_path(tools_dir), encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def register(name, path, tools_dir=None):
+    """
+    Records where an installed tool (e.g. 'ffmpeg') lives, so every later
+    probe finds it without searching, and drops the cached probe.
+    """
+    tools = registered(tools_dir)
+    tools[name] = os.path.abspath(path)
+    os.makedirs(tools_dir or TOOLS_DIR, exist_ok=True)
+    path = registry_path(tools_dir)
+    tmp = f"{path}.tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(tools, f, indent=2)
+    os.replace(tmp, path)
+    invalidate()
+
+
+def invalidate():
+    with _lock:
+        _cache.clear()
+
+
+class FFmpegCapabilities:
+    """
+    What the ffmpeg found on this machine can do. ffmpeg/ffprobe are the
+    binary paths (None when missing), encoders the names listed by
+    "ffmpeg -encoders", hwaccels those listed by "ffmpeg -hwaccels".
+    """
+    __slots__ = ('ffmpeg', 'ffprobe', 'version', 'encoders', 'hwaccels')
+
+    def __init__(self, ffmpeg=None, ffprobe=None, version=None, encoders=(), hwaccels=()):
+        self.ffmpeg = ffmpeg
+        self.ffprobe = ffprobe
+        self.version = version
+        self.encoders = frozenset(encoders)
+        self.hwaccels = tuple(hwaccels)
+
+    @property
+    def available(self):
+        return self.ffmpeg is not None
+
+    @property
+    def location(self):
+        """
+        Folder to pass to yt-dlp as ffmpeg_location.
+        """
+        return os.path.dirname(self.ffmpeg) if self.ffmpeg else None
+
+    def can_encode(self, codec):
+        """
+        True when ffmpeg has an encoder for codec ('mp3', 'aac', ...). An
+        ffmpeg whose encoder list could not be read is trusted.
+        """
+        if not self.available:
+            return False
+        if not self.encoders:
+            return True
+        return any(e in self.encoders for e in AUDIO_ENCODERS.get(codec, (codec,)))
+
+    def to_dict(self):
+        return {'ffmpeg': self.ffmpeg, 'ffprobe': self.ffprobe, 'version': self.version,
+                'encoders': sorted(self.encoders), 'hwaccels': list(self.hwaccels)}
+
+    def __repr__(self):
+        return f"FFmpegCapabilities({self.ffmpeg!r}, version={self.version!r})"
+
+
+def _run(binary, *args):
+    try:
+        return subprocess.run([binary, '-hide_banner', *args], capture_output=True, text=True,
+                              timeout=10, errors='replace').stdout
+    except (OSError, subprocess.SubprocessError):
+        return ''
+
+
+def _find(name, tools_dir=None):
+    # Explicit setting, then what install_ffmpeg.py registered, then a copy
+    # next to the program (older installs), then PATH
+    env = os.environ.get('FFMPEG_LOCATION')
+    if env:
+        found = shutil.which(name, path=env if os.path.isdir(env) else os.path.dirname(env))
+        if found:
+            return os.path.abspath(found)
+    path = registered(tools_dir).get(name)
+    if path and os.path.isfile(path):
+        return path
+    found = shutil.which(name, path=os.getcwd()) or shutil.which(name)
+    return os.path.abspath(found) if found else None
+
+
+def _probe(tools_dir=None):
+    ffmpeg = _find('ffmpeg', tools_dir)
+    if ffmpeg is None:
+        return FFmpegCapabilities()
+    ffprobe = shutil.which('ffprobe', path=os.path.dirname(ffmpeg)) or _find('ffprobe', tools_dir)
+
+    match = _VERSION.match(_run(ffmpeg, '-version'))
+    encoders = [m.group(1) for m in map(_ENCODER.match, _run(ffmpeg, '-encoders').splitlines()) if m]
+    hwaccels = [line.strip() for line in _run(ffmpeg, '-hwaccels').splitlines()[1:] if line.strip()]
+    return FFmpegCapabilities(ffmpeg, ffprobe and os.path.abspath(ffprobe),
+                              match.group(1) if match else None, encoders, hwaccels)
+
+
+def probe(refresh=False, tools_dir=None):
+    """
+    FFmpegCapabilities of this machine. Runs the ffmpeg binary at most once
+    per process and configuration (PATH, FFMPEG_LOCATION, working folder,
+    tools folder);
+    register() or refresh=True start over.
+    """
+    key = (os.environ.get('PATH'), os.environ.get('FFMPEG_LOCATION'), os.getcwd(), tools_dir or TOOLS_DIR)
+    with _lock:
+        caps = None if refresh else _cache.get(key)
+    if caps is None:
+        caps = _probe(tools_dir)
+        with _lock:
+            _cache[key] = caps
+    return caps
+
+
+if __name__ == "__main__":
+    print(json.dumps(probe().to_dict(), indent=2))
@@ -0,0 +1,120 @@
+import importlib
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Options set per job on a borrowed instance; everything else is the
+# instance's profile and picks the pool it comes from
+JOB_OPTIONS = ('outtmpl', 'format', 'progress_hooks', 'postprocessor_hooks', 'concurrent_fragment_downloads')
+DEFAULT_MAX_IDLE = 4
+
+# yt-dlp internals _apply() resets on a reused instance. They are not public
+# API, so the install instructions pin yt-dlp and test_ydl_pool checks them
+YDL_INTERNALS = ('_parse_outtmpl', '_progress_hooks', '_postprocessor_hooks', '_pps',
+                 '_download_retcode', '_num_downloads', '_playlist_urls', 'format_selector')
+PP_INTERNALS = ('_progress_hooks', 'report_progress')
+
+
+def profile_key(options):
+    """
+    Stable key of the options that are fixed when a YoutubeDL is built.
+    Hooks and other callables count by identity.
+    """
+    base = {k: v for k, v in options.items() if k not in JOB_OPTIONS}
+    return json.dumps(base, sort_keys=True, default=lambda v: f"<{type(v).__name__} {id(v)}>")
+
+
+class YDLPool:
+    """
+    Warm yt_dlp.YoutubeDL instances, one pool per option profile (info-only,
+    video, audio, ...). Building a YoutubeDL loads the extractor list, the
+    cookie jar and the request handlers; a borrowed instance already has
+    them, and only the per-job JOB_OPTIONS (output template, format, hooks,
+    fragment concurrency) are swapped in for the job and cleared again when
+    it is returned. An instance is used by one thread at a time. Up to
+    max_idle instances are kept per profile.
+    """
+
+    def __init__(self, max_idle=DEFAULT_MAX_IDLE):
+        self.max_idle = max_idle
+        self.created = 0
+        self.reused = 0
+        self.setup_seconds = 0.0
+        self._idle = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def borrow(self, options):
+        """
+        A YoutubeDL configured with options for the duration of the block.
+        """
+        key = profile_key(options)
+        started = time.perf_counter()
+        with self._lock:
+            idle = self._idle.get(key)
+            ydl = idle.pop() if idle else None
+        if ydl is None:
+            yt_dlp = importlib.import_module('yt_dlp')
+            ydl = yt_dlp.YoutubeDL({k: v for k, v in options.items() if k not in JOB_OPTIONS})
+            counter = 'created'
+        else:
+            counter = 'reused'
+        self._apply(ydl, options)
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+            self.setup_seconds += time.perf_counter() - started
+        try:
+            yield ydl
+        finally:
+            self._apply(ydl, {})
+            with self._lock:
+                idle = self._idle.setdefault(key, [])
+                if len(idle) < self.max_idle:
+                    idle.append(ydl)
+                    ydl = None
+            if ydl is not None:
+                ydl.close()
+
+    @staticmethod
+    def _apply(ydl, options):
+        params = ydl.params
+        outtmpl = options.get('outtmpl')
+        params['outtmpl'] = dict(outtmpl) if isinstance(outtmpl, dict) else {'default': outtmpl} if outtmpl else {}
+        ydl._parse_outtmpl()
+
+        spec = params['format'] = options.get('format')
+        ydl.format_selector = spec if spec in (None, '-') or callable(spec) else ydl.build_format_selector(spec)
+
+        if 'concurrent_fragment_downloads' in options:
+            params['concurrent_fragment_downloads'] = options['concurrent_fragment_downloads']
+        else:
+            params.pop('concurrent_fragment_downloads', None)
+
+        # Hooks hold the previous job's closures: replace, never append
+        ydl._progress_hooks = list(options.get('progress_hooks') or [])
+        ydl._postprocessor_hooks = list(options.get('postprocessor_hooks') or [])
+        for pps in ydl._pps.values():
+            for pp in pps:
+                pp._progress_hooks = [pp.report_progress] + ydl._postprocessor_hooks
+
+        # Per-run counters yt-dlp keeps on the instance
+        ydl._download_retcode = 0
+        ydl._num_downloads = 0
+        ydl._playlist_urls = set()
+
+    def stats(self):
+        with self._lock:
+            return {'created': self.created, 'reused': self.reused,
+                    'idle': sum(len(idle) for idle in self._idle.values()),
+                    'setup_seconds': round(self.setup_seconds, 4)}
+
+    def close(self):
+        """
+        Closes every idle instance (saving cookie files).
+        """
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for instances in idle.values():
+            for ydl in instances:
+                ydl.close()
@@ -0,0 +1,165 @@
+import os
+import re
+import threading
+import time
+
+DEFAULT_RESCAN_INTERVAL = 30.0
+
+_SUFFIXED = re.compile(r'^(.*) \((\d+)\)$')
+# What may follow a name: ".mp4", ".f137.mp4.part", ".tagged.m4a", ...
+_EXTENSIONS = re.compile(r'^(?:\.[A-Za-z0-9_-]{1,10})+$')
+# What follows a name in yt-dlp's temporary files: ".mp4.part",
+# ".f137.mp4.part", ".mp4.part-Frag3.part", ".mp4.ytdl"
+_PARTIAL = re.compile(r'^(?:\.f[\w-]+)?\.[A-Za-z0-9]{1,5}\.(?:part(?:-Frag\d+(?:\.part)?)?|ytdl)$')
+
+
+def split_name(name):
+    """
+    "Song (3)" -> ("Song", 3), "Song" -> ("Song", 0).
+    """
+    m = _SUFFIXED.match(name)
+    return (m.group(1), int(m.group(2))) if m else (name, 0)
+
+
+def names_in(filename):
+    """
+    Every name filename may belong to: "Song (1).f137.mp4.part" counts for
+    "Song (1)", "Song (1).f137" and "Song (1).f137.mp4".
+    """
+    names = []
+    dot = filename.find('.', 1)
+    while dot != -1:
+        if _EXTENSIONS.match(filename[dot:]):
+            names.append(filename[:dot])
+        dot = filename.find('.', dot + 1)
+    return names
+
+
+def partial_files(directory, name):
+    """
+    Paths of the temporary files a download named name left in directory.
+    """
+    try:
+        entries = os.listdir(directory)
+    except OSError:
+        return []
+    return [os.path.join(directory, entry) for entry in entries
+            if entry.startswith(name) and _PARTIAL.match(entry[len(name):])]
+
+
+class _Directory:
+    __slots__ = ('used', 'cursor', 'reserved', 'scanned')
+
+    def __init__(self):
+        self.used = {}      # normcased stem -> set of taken suffixes (0 = the bare stem)
+        self.cursor = {}    # normcased stem -> lowest suffix not known to be taken
+        self.reserved = set()
+        self.scanned = float('-inf')
+
+    def add(self, name):
+        stem, n = split_name(os.path.normcase(name))
+        self.used.setdefault(stem, set()).add(n)
+
+
+class OutputIndex:
+    """
+    Allocates unique output names without probing the disk name by name.
+    Each directory is listed once; a name counts as taken when any file
+    starts with it followed by extensions ("Song.mp4", "Song.f137.webm.part",
+    ...), so every extension a job can produce is covered. reserve() hands
+    out the next free "stem (n)" under a lock, so concurrent workers never
+    get the same name. Files added by others are picked up by notice(), an
+    explicit rescan() or the periodic rescan after rescan_interval seconds.
+    """
+
+    def __init__(self, rescan_interval=DEFAULT_RESCAN_INTERVAL):
+        self.rescan_interval = rescan_interval
+        self.scans = 0
+        self._dirs = {}
+        self._lock = threading.Lock()
+
+    def reserve(self, directory, stem):
+        """
+        Returns a name ("stem" or "stem (n)") that no file in directory uses
+        and that no other reserve() call has returned.
+        """
+        # A title that already ends in " (n)" shares the counter of its stem
+        stem, first = split_name(stem)
+        key = os.path.normcase(stem)
+        with self._lock:
+            index = self._index(directory)
+            used = index.used.setdefault(key, set())
+            n = first or index.cursor.get(key, 0)
+            while n in used:
+                n += 1
+            used.add(n)
+            if not first:
+                index.cursor[key] = n + 1
+            name = f"{stem} ({n})" if n else stem
+            index.reserved.add(name)
+            return name
+
+    def claim(self, directory, name):
+        """
+        Marks name as taken in directory, e.g. an output name a job chose
+        before a restart and keeps using.
+        """
+        with self._lock:
+            index = self._index(directory)
+            index.add(name)
+            index.reserved.add(name)
+
+    def notice(self, path):
+        """
+        Marks an externally created file as taken (e.g. from a file watcher).
+        """
+        directory, filename = os.path.split(os.path.abspath(path))
+        with self._lock:
+            index = self._dirs.get(os.path.normcase(directory))
+            if index is not None:
+                for name in names_in(filename):
+                    index.add(name)
+
+    def rescan(self, directory=None):
+        """
+        Drops the cached listing of directory (all directories for None);
+        the next reserve() lists it again.
+        """
+        with self._lock:
+            if directory is None:
+                for index in self._dirs.values():
+                    index.scanned = float('-inf')
+            else:
+                index = self._dirs.get(os.path.normcase(os.path.abspath(directory)))
+                if index is not None:
+                    index.scanned = float('-inf')
+
+    def _index(self, directory):
+        # Caller holds the lock
+        key = os.path.normcase(os.path.abspath(directory))
+        index = self._dirs.get(key)
+        if index is None:
+            index = self._dirs[key] = _Directory()
+        now = time.monotonic()
+        if now - index.scanned >= self.rescan_interval:
+            self._scan(directory, index)
+            index.scanned = now
+        return index
+
+    def _scan(self, directory, index):
+        index.used, index.cursor = {}, {}
+        self.scans += 1
+        seen = set()
+        try:
+            with os.scandir(directory) as entries:
+                for entry in entries:
+                    for name in names_in(entry.name):
+                        index.add(name)
+                        seen.add(os.path.normcase(name))
+        except OSError:
+            pass
+        # Names handed out but not on disk yet stay taken; the rest are
+        # covered by their files from now on
+        index.reserved = {name for name in index.reserved if os.path.normcase(name) not in seen}
+        for name in index.reserved:
+            index.add(name)
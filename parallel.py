@@ -0,0 +1,116 @@
+import threading
+from urllib.parse import urlparse
+
+DEFAULT_CONNECTIONS = 4
+MAX_CONNECTIONS = 16
+DEFAULT_CHUNK_SIZE = 10 * 1024 * 1024
+
+# Hosts that serve a byte range for a "range=START-END" query parameter
+# (googlevideo does; yt-dlp relies on the same for YouTube's DASH formats)
+RANGE_PARAM_HOSTS = ('googlevideo.com',)
+
+# Throughput samples below this size are too noisy to tune on
+MIN_SAMPLE_BYTES = 1024 * 1024
+
+
+def host_key(url):
+    """
+    Registered domain of url ("rr3---sn-x.googlevideo.com" -> "googlevideo.com"),
+    so all edge servers of one CDN share their measurements.
+    """
+    host = (urlparse(url or '').hostname or '').lower()
+    labels = host.split('.')
+    if len(labels) > 2 and not labels[-1].isdigit():
+        return '.'.join(labels[-2:])
+    return host
+
+
+def split_ranges(size, chunk_size):
+    """
+    [(start, end), ...] inclusive byte ranges covering size bytes.
+    """
+    return [(start, min(start + chunk_size, size) - 1) for start in range(0, size, chunk_size)]
+
+
+def as_range_fragments(fmt, chunk_size=DEFAULT_CHUNK_SIZE, hosts=RANGE_PARAM_HOSTS):
+    """
+    Returns a copy of a progressive http(s) format rewritten as fixed-size
+    range fragments, so yt-dlp fetches them over concurrent connections
+    (concurrent_fragment_downloads) and resumes per fragment. Formats that
+    are already fragmented, have no exact filesize, fit in one chunk or live
+    on a host without range-parameter support are returned unchanged.
+    Chunk boundaries depend only on filesize and chunk_size, so a paused
+    download resumes into the same fragments.
+    """
+    size = fmt.get('filesize')
+    url = fmt.get('url')
+    if (fmt.get('protocol') not in (None, 'http', 'https') or fmt.get('fragments')
+            or not url or not size or size <= chunk_size
+            or not urlparse(url).scheme.startswith('http')
+            or host_key(url) not in hosts):
+        return fmt
+
+    sep = '&' if '?' in url else '?'
+    return dict(fmt, protocol='http_dash_segments', fragments=[
+        {'url': f"{url}{sep}range={start}-{end}"} for start, end in split_ranges(size, chunk_size)
+    ])
+
+
+def chunk_formats(info, chunk_size=DEFAULT_CHUNK_SIZE, hosts=RANGE_PARAM_HOSTS):
+    """
+    Copy of info with every eligible format passed through as_range_fragments().
+    """
+    info = dict(info)
+    for key in ('formats', 'requested_formats'):
+        if info.get(key):
+            info[key] = [as_range_fragments(f, chunk_size, hosts) for f in info[key]]
+    if not info.get('formats') and info.get('url'):
+        info = as_range_fragments(info, chunk_size, hosts)
+    return info
+
+
+class ConnectionTuner:
+    """
+    Picks the number of parallel connections per host from measured
+    throughput. Starts at initial, doubles while throughput keeps improving
+    and halves when fewer connections have not been tried yet but more did
+    not help, then settles on the best count seen. Rates are smoothed so a
+    single slow job does not flip the decision.
+    """
+
+    def __init__(self, initial=DEFAULT_CONNECTIONS, minimum=1, maximum=MAX_CONNECTIONS, gain=1.1):
+        self.initial = initial
+        self.minimum = minimum
+        self.maximum = maximum
+        self.gain = gain  # more connections must be this much faster to win
+        self._rates = {}  # host -> {connections: bytes/s}
+        self._lock = threading.Lock()
+
+    def connections(self, url):
+        with self._lock:
+            rates = self._rates.get(host_key(url))
+            if not rates:
+                return self.initial
+            best = min(rates)
+            for n in sorted(rates):
+                if rates[n] > rates[best] * self.gain:
+                    best = n
+            up, down = best * 2, best // 2
+            if best == max(rates) and up <= self.maximum and up not in rates:
+                return up
+            if best == min(rates) and down >= self.minimum and down not in rates:
+                return down
+            return best
+
+    def record(self, url, connections, nbytes, seconds):
+        if nbytes < MIN_SAMPLE_BYTES or seconds <= 0:
+            return
+        rate = nbytes / seconds
+        with self._lock:
+            rates = self._rates.setdefault(host_key(url), {})
+            old = rates.get(connections)
+            rates[connections] = rate if old is None else (old + rate) / 2
+
+    def stats(self):
+        with self._lock:
+            return {host: dict(rates) for host, rates in self._rates.items()}
@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+
+from ydl_pool import YDLPool
+
+
+class LoudnessNormalize:
+    """
+    EBU R128 loudness normalization with ffmpeg's loudnorm filter, in place.
+    """
+
+    def __init__(self, ydl, target=-16.0, true_peak=-1.5, lra=11):
+        from yt_dlp.postprocessor.ffmpeg import FFmpegPostProcessor
+        self._ffmpeg = FFmpegPostProcessor(ydl)
+        self.filter = f"loudnorm=I={target}:TP={true_peak}:LRA={lra}"
+
+    def run(self, info):
+        path = info['filepath']
+        root, ext = os.path.splitext(path)
+        tmp = f"{root}.loudnorm{ext}"
+        self._ffmpeg.run_ffmpeg(path, tmp, ['-af', self.filter])
+        os.replace(tmp, path)
+        return [], info
+
+
+def _extract_audio(ydl, codec='mp3', quality='192'):
+    from yt_dlp.postprocessor import FFmpegExtractAudioPP
+    return FFmpegExtractAudioPP(ydl, preferredcodec=codec, preferredquality=quality)
+
+
+def _metadata(ydl):
+    from yt_dlp.postprocessor import FFmpegMetadataPP
+    return FFmpegMetadataPP(ydl, add_metadata=True, add_chapters=True)
+
+
+def _embed_thumbnail(ydl):
+    # Needs the thumbnail on disk: download with 'writethumbnail' (see DOWNLOAD_OPTIONS)
+    from yt_dlp.postprocessor import EmbedThumbnailPP
+    return EmbedThumbnailPP(ydl)
+
+
+# name -> factory(ydl, **options) returning an object with run(info) -> (files_to_delete, info),
+# i.e. a yt-dlp postprocessor or anything shaped like one
+PASSES = {
+    'extract_audio': _extract_audio,
+    'metadata': _metadata,
+    'embed_thumbnail': _embed_thumbnail,
+    'loudnorm': LoudnessNormalize,
+}
+
+# Extra yt-dlp download options a pass needs while the file is fetched
+DOWNLOAD_OPTIONS = {
+    'embed_thumbnail': {
+        'writethumbnail': True,
+        'postprocessors': [{'key': 'FFmpegThumbnailsConvertor', 'format': 'jpg', 'when': 'before_dl'}],
+    },
+}
+
+
+def register_pass(name, factory, download_options=None):
+    """
+    Plugs an extra pass into the post-processing stage.
+    """
+    PASSES[name] = factory
+    if download_options:
+        DOWNLOAD_OPTIONS[name] = download_options
+
+
+def download_options(passes):
+    """
+    yt-dlp options the download needs for passes, merged.
+    """
+    opts = {}
+    for spec in passes:
+        extra = DOWNLOAD_OPTIONS.get(_pass_name(spec), {})
+        for key, value in extra.items():
+            if isinstance(value, list):
+                opts[key] = opts.get(key, []) + value
+            else:
+                opts[key] = value
+    return opts
+
+
+def _pass_name(spec):
+    return spec if isinstance(spec, str) else spec[0]
+
+
+def then(future, fn, on_error=None):
+    """
+    Future of fn(result of future). An exception in either propagates, or
+    becomes the result of on_error(exception) if given.
+    """
+    chained = Future()
+
+    def done(f):
+        try:
+            chained.set_result(fn(f.result()))
+        except Exception as e:
+            if on_error is None:
+                chained.set_exception(e)
+            else:
+                chained.set_result(on_error(e))
+
+    future.add_done_callback(done)
+    return chained
+
+
+class PostProcessor:
+    """
+    The post-processing stage. Downloads hand finished files over with
+    submit() and go back to the network; a bounded pool (one worker per core
+    by default, each driving one ffmpeg process at a time) runs the passes.
+    A pass is a name from PASSES or (name, {options}). Passes run on a
+    YoutubeDL borrowed from ydl_pool.
+    """
+
+    def __init__(self, workers=None, ydl_options=None, ydl_pool=None):
+        self.workers = workers or os.cpu_count() or 1
+        self.ydl_options = ydl_options or {}
+        self.ydl_pool = ydl_pool or YDLPool()
+        self._pool = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="postprocess")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.failed = 0
+        self.wait_seconds = 0.0
+        self._timings = {}  # pass name -> [count, seconds, max seconds]
+
+    def submit(self, path, info, passes, ydl_options=None, timer=None):
+        """
+        Queues passes over the downloaded file at path; returns a Future of
+        the final file path. timer(name, seconds) is called with the time
+        spent queued ('wait') and then with each pass's run time.
+        """
+        with self._lock:
+            self.queued += 1
+        return self._pool.submit(self._process, time.perf_counter(), path, info, list(passes),
+                                 dict(self.ydl_options, **(ydl_options or {})), timer)
+
+    def run(self, path, info, passes, ydl_options=None):
+        return self.submit(path, info, passes, ydl_options).result()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'workers': self.workers,
+                'queued': self.queued,
+                'running': self.running,
+                'completed': self.completed,
+                'failed': self.failed,
+                'wait_seconds': round(self.wait_seconds, 3),
+                'passes': {name: {'count': c, 'seconds': round(s, 3), 'max_seconds': round(m, 3)}
+                           for name, (c, s, m) in self._timings.items()},
+            }
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
+
+    def _process(self, submitted, path, info, passes, ydl_options, timer=None):
+        waited = time.perf_counter() - submitted
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_seconds += waited
+        if timer:
+            timer('wait', waited)
+        ok = False
+        try:
+            info = dict(info, filepath=path)
+            info.setdefault('ext', os.path.splitext(path)[1][1:])
+            with self.ydl_pool.borrow(dict({'quiet': True, 'no_warnings': True}, **ydl_options)) as ydl:
+                for spec in passes:
+                    name = _pass_name(spec)
+                    options = {} if isinstance(spec, str) else spec[1]
+                    started = time.perf_counter()
+                    info = ydl.run_pp(PASSES[name](ydl, **options), info)
+                    seconds = time.perf_counter() - started
+                    self._record(name, seconds)
+                    if timer:
+                        timer(name, seconds)
+            ok = True
+            return info['filepath']
+        finally:
+            with self._lock:
+                self.running -= 1
+                if ok:
+                    self.completed += 1
+                else:
+                    self.failed += 1
+
+    def _record(self, name, seconds):
+        with self._lock:
+            entry = self._timings.setdefault(name, [0, 0.0, 0.0])
+            entry[0] += 1
+            entry[1] += seconds
+            entry[2] = max(entry[2], seconds)
@@ -0,0 +1,131 @@
+import threading
+
+# Codec families as reported by yt-dlp ('mp4a.40.2' -> 'aac', 'avc1.64001F' -> 'h264')
+_CODEC_PREFIXES = (('mp4a', 'aac'), ('aac', 'aac'), ('opus', 'opus'), ('vorbis', 'vorbis'),
+                   ('mp3', 'mp3'), ('flac', 'flac'), ('alac', 'alac'),
+                   ('avc', 'h264'), ('h264', 'h264'), ('vp09', 'vp9'), ('vp9', 'vp9'), ('vp8', 'vp8'),
+                   ('av01', 'av1'), ('av1', 'av1'), ('hev', 'hevc'), ('hvc', 'hevc'), ('h265', 'hevc'))
+
+# Passes that re-encode whatever they touch
+TRANSCODING_PASSES = ('loudnorm',)
+
+
+def codec_family(codec):
+    codec = (codec or '').lower()
+    for prefix, family in _CODEC_PREFIXES:
+        if codec.startswith(prefix):
+            return family
+    return codec or None
+
+
+class OutputProfile:
+    """
+    What a download should end up as. The format selectors prefer streams
+    whose codecs already fit the target, so the merge (always -c copy in
+    yt-dlp) or the audio pass only rewraps them; audio_codec is the codec a
+    transcode targets, or None when the source codec is kept.
+    """
+    __slots__ = ('name', 'label', 'video_format', 'audio_format', 'format_sort',
+                 'merge_output_format', 'audio_codec', 'audio_quality')
+
+    def __init__(self, name, label, video_format='bestvideo+bestaudio/best', audio_format='bestaudio/best',
+                 format_sort=None, merge_output_format='mp4', audio_codec=None, audio_quality=None):
+        self.name = name
+        self.label = label
+        self.video_format = video_format
+        self.audio_format = audio_format
+        self.format_sort = format_sort
+        self.merge_output_format = merge_output_format
+        self.audio_codec = audio_codec
+        self.audio_quality = audio_quality
+
+    def video_selector(self, format_id=None):
+        if not format_id:
+            return self.video_format
+        audio = self.audio_format.split('/')[0]
+        fallback = f"/{format_id}+bestaudio" if audio != 'bestaudio' else ""
+        return f"{format_id}+{audio}{fallback}/best"
+
+    def audio_passes(self, ffmpeg):
+        """
+        Passes that turn the downloaded audio into this profile's codec, or
+        none when ffmpeg (FFmpegCapabilities) has no encoder for it.
+        """
+        if not self.audio_codec or not ffmpeg.can_encode(self.audio_codec):
+            return []
+        options = {'codec': self.audio_codec}
+        if self.audio_quality:
+            options['quality'] = self.audio_quality
+        return [('extract_audio', options)]
+
+    def ydl_options(self):
+        opts = {'merge_output_format': self.merge_output_format}
+        if self.format_sort:
+            opts['format_sort'] = list(self.format_sort)
+        return opts
+
+    def transcodes(self, info, passes):
+        """
+        True when producing this profile's file from the downloaded info
+        re-encodes anything, False when every step is a stream copy.
+        """
+        names = [p if isinstance(p, str) else p[0] for p in passes]
+        if any(name in TRANSCODING_PASSES for name in names):
+            return True
+        if 'extract_audio' in names and self.audio_codec:
+            return codec_family(info.get('acodec')) != self.audio_codec
+        return False
+
+
+PROFILES = {
+    # Legacy defaults: best streams merged to mp4; audio transcoded to mp3 192k.
+    # An mp3 source is only copied as-is when it is already 192k or better
+    'mp4': OutputProfile('mp4', "MP4"),
+    'mp3': OutputProfile('mp3', "MP3 192k", audio_format='bestaudio[acodec=mp3][abr>=192]/bestaudio/best',
+                         audio_codec='mp3', audio_quality='192'),
+    # Source codecs in the first container that holds them as-is
+    'original': OutputProfile('original', "Original container", merge_output_format='mp4/webm/mkv'),
+    # mp4-native codecs (h264/aac) first, so the merge never needs another container
+    'remux': OutputProfile('remux', "Lossless remux only",
+                           audio_format='bestaudio[acodec^=mp4a]/bestaudio/best',
+                           format_sort=('vcodec:h264', 'acodec:aac')),
+}
+
+DEFAULT_PROFILES = {'video': 'mp4', 'audio': 'mp3'}
+
+
+def get_profile(name, kind='video'):
+    """
+    Profile by name (or the kind's default for None); ValueError if unknown.
+    """
+    name = name or DEFAULT_PROFILES[kind]
+    try:
+        return PROFILES[name]
+    except KeyError:
+        raise ValueError(f"Unknown output profile: {name} (choose from {', '.join(PROFILES)})") from None
+
+
+class CodecReport:
+    """
+    Counts finished downloads per profile by whether they took the stream
+    copy path or had to be transcoded.
+    """
+
+    def __init__(self):
+        self._counts = {}  # profile -> {'copy': n, 'transcode': n}
+        self._lock = threading.Lock()
+
+    def record(self, profile, transcoded):
+        with self._lock:
+            counts = self._counts.setdefault(profile, {'copy': 0, 'transcode': 0})
+            counts['transcode' if transcoded else 'copy'] += 1
+
+    def stats(self):
+        with self._lock:
+            return {profile: dict(counts) for profile, counts in self._counts.items()}
+
+    def summary(self):
+        stats = self.stats()
+        copy = sum(c['copy'] for c in stats.values())
+        transcode = sum(c['transcode'] for c in stats.values())
+        return f"stream copy: {copy}, transcoded: {transcode}"
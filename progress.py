@@ -0,0 +1,64 @@
+import threading
+import time
+
+DEFAULT_HZ = 4.0
+
+_SIZE_UNITS = ('B', 'KiB', 'MiB', 'GiB', 'TiB')
+
+
+def format_size(bytes_val):
+    if not bytes_val:
+        return "N/A"
+    n = 0
+    while bytes_val >= 1024 and n < len(_SIZE_UNITS) - 1:
+        bytes_val /= 1024
+        n += 1
+    return f"{bytes_val:.2f}{_SIZE_UNITS[n]}"
+
+
+def format_eta(seconds):
+    if seconds is None:
+        return "Unknown"
+    m, s = divmod(int(seconds), 60)
+    h, m = divmod(m, 60)
+    return f"{h:02d}:{m:02d}:{s:02d}" if h else f"{m:02d}:{s:02d}"
+
+
+class RateLimiter:
+    """
+    ready() is True at most hz times per second.
+    """
+    __slots__ = ('interval', 'last')
+
+    def __init__(self, hz=DEFAULT_HZ):
+        self.interval = 1.0 / hz if hz else 0.0
+        self.last = float('-inf')
+
+    def ready(self):
+        now = time.monotonic()
+        if now - self.last < self.interval:
+            return False
+        self.last = now
+        return True
+
+
+class ProgressAggregator:
+    """
+    Collects progress from any number of jobs and hands frontends one batch
+    per UI tick. publish() only overwrites the job's slot, so worker threads
+    never wait on the UI; drain() returns the latest value of every job that
+    changed since the previous drain.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._lock = threading.Lock()
+
+    def publish(self, key, value):
+        with self._lock:
+            self._pending[key] = value
+
+    def drain(self):
+        with self._lock:
+            batch, self._pending = self._pending, {}
+        return batch
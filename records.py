@@ -0,0 +1,194 @@
+import os
+from enum import Enum
+
+from progress import format_eta, format_size
+
+
+class JobStatus(str, Enum):
+    """
+    State of a queued job, and the outcome of a finished download.
+    A str subclass, so it compares equal to (and serializes as) its value.
+    """
+    PENDING = 'pending'
+    RUNNING = 'running'
+    PAUSING = 'pausing'     # paused while running; the download has not stopped yet
+    PAUSED = 'paused'
+    DONE = 'done'
+    SKIPPED = 'skipped'     # already in the download archive
+    FAILED = 'failed'
+    CANCELLED = 'cancelled'
+
+    def __str__(self):
+        return self.value
+
+
+class Phase(str, Enum):
+    """
+    What a download is doing right now.
+    """
+    DOWNLOADING = 'downloading'
+    MERGING = 'merging'         # ffmpeg merges video and audio
+    CONVERTING = 'converting'   # ffmpeg extracts/converts audio
+    FINISHING = 'finishing'     # no post-processing, file is being finalized
+
+    def __str__(self):
+        return self.value
+
+
+_PHASE_LABELS = {
+    Phase.MERGING: "处理中...",
+    Phase.CONVERTING: "转换中...",
+    Phase.FINISHING: "完成中...",
+}
+
+
+class ProgressSnapshot:
+    """
+    Numeric progress of one download, built straight from the fields yt-dlp
+    passes to progress hooks; no string parsing involved. When the video
+    and audio streams download side by side, streams maps each stream name
+    to its own snapshot and the top-level fields are their sum.
+    """
+    __slots__ = ('downloaded', 'total', 'speed', 'eta', 'phase', 'streams')
+
+    def __init__(self, downloaded=0, total=None, speed=None, eta=None, phase=Phase.DOWNLOADING, streams=None):
+        self.downloaded = downloaded
+        self.total = total
+        self.speed = speed
+        self.eta = eta
+        self.phase = phase
+        self.streams = streams
+
+    @classmethod
+    def from_hook(cls, d):
+        return cls(d.get('downloaded_bytes') or 0,
+                   d.get('total_bytes') or d.get('total_bytes_estimate'),
+                   d.get('speed'), d.get('eta'))
+
+    @classmethod
+    def combine(cls, streams):
+        """
+        Overall progress of several concurrent streams ({name: snapshot}).
+        """
+        snaps = list(streams.values())
+        totals = [s.total for s in snaps]
+        etas = [s.eta for s in snaps if s.eta is not None]
+        return cls(sum(s.downloaded for s in snaps),
+                   sum(totals) if all(totals) else None,
+                   sum(s.speed or 0 for s in snaps) or None,
+                   max(etas) if etas else None,
+                   streams=dict(streams))
+
+    @property
+    def fraction(self):
+        if self.phase is not Phase.DOWNLOADING:
+            return 1.0
+        if not self.total:
+            return 0.0
+        return min(self.downloaded / self.total, 1.0)
+
+    def describe(self):
+        if self.phase is not Phase.DOWNLOADING:
+            return _PHASE_LABELS[self.phase]
+        # [download] 52.1% of 2.56GiB at 326.73KiB/s ETA 01:05:27
+        speed = f"{format_size(self.speed)}/s" if self.speed else "Unknown speed"
+        line = (f"[download] {self.fraction * 100:.1f}% of {format_size(self.total)} "
+                f"at {speed} ETA {format_eta(self.eta)}")
+        if self.streams:
+            line += " (" + ", ".join(f"{name} {s.fraction * 100:.0f}%" for name, s in self.streams.items()) + ")"
+        return line
+
+    __str__ = describe
+
+    def to_dict(self):
+        data = {'downloaded': self.downloaded, 'total': self.total, 'speed': self.speed,
+                'eta': self.eta, 'phase': self.phase.value, 'fraction': self.fraction}
+        if self.streams:
+            data['streams'] = {name: s.to_dict() for name, s in self.streams.items()}
+        return data
+
+    @classmethod
+    def from_dict(cls, data):
+        streams = data.get('streams')
+        if streams:
+            streams = {name: cls.from_dict(s) for name, s in streams.items()}
+        return cls(data.get('downloaded') or 0, data.get('total'), data.get('speed'),
+                   data.get('eta'), Phase(data.get('phase', Phase.DOWNLOADING)), streams)
+
+
+class DownloadResult:
+    """
+    Outcome of one download_video/download_audio/download_thumbnail call.
+    status is JobStatus.DONE, SKIPPED, PAUSED or FAILED; path is the saved
+    file (for SKIPPED, where the archive says it was saved, if known).
+    profile is the output profile used and transcoded whether getting there
+    re-encoded anything (None when not known). timings is the job's
+    metrics summary (see metrics.JobTimings.to_dict()), when recorded.
+    """
+    __slots__ = ('status', 'kind', 'path', 'ext', 'converted', 'error', 'profile', 'transcoded', 'timings')
+
+    def __init__(self, status, kind, path=None, ext=None, converted=False, error=None,
+                 profile=None, transcoded=None):
+        self.status = status
+        self.kind = kind
+        self.path = path
+        self.ext = ext
+        self.converted = converted
+        self.error = error
+        self.profile = profile
+        self.transcoded = transcoded
+        self.timings = None
+
+    @classmethod
+    def done(cls, kind, path=None, ext=None, converted=False, profile=None, transcoded=None):
+        return cls(JobStatus.DONE, kind, path, ext, converted, profile=profile, transcoded=transcoded)
+
+    @classmethod
+    def skipped(cls, kind, path=None, profile=None):
+        return cls(JobStatus.SKIPPED, kind, path, profile=profile)
+
+    @classmethod
+    def paused(cls, kind):
+        return cls(JobStatus.PAUSED, kind)
+
+    @classmethod
+    def failed(cls, kind, error):
+        return cls(JobStatus.FAILED, kind, error=str(error))
+
+    @property
+    def ok(self):
+        return self.status in (JobStatus.DONE, JobStatus.SKIPPED)
+
+    def describe(self):
+        if self.status is JobStatus.PAUSED:
+            return "已暂停"
+        if self.status is JobStatus.SKIPPED:
+            return "Already downloaded (skipped)" if self.kind == 'audio' else "已下载过，跳过"
+        if self.status is JobStatus.FAILED:
+            return f"Error: {self.error}" if self.kind == 'audio' else f"错误: {self.error}"
+        if self.kind == 'audio':
+            if self.converted:
+                return f"Audio Download Complete ({(self.ext or 'mp3').upper()})"
+            if self.profile not in (None, 'mp3'):
+                return f"Audio Download Complete (.{self.ext})"
+            return f"Audio Download Complete (Saved as .{self.ext} - Install FFmpeg for MP3)"
+        if self.kind == 'thumbnail':
+            return f"封面已下载: {os.path.basename(self.path or '')}"
+        return "视频下载完成"
+
+    __str__ = describe
+
+    def __repr__(self):
+        return f"DownloadResult({self.status.value}, {self.kind!r}, path={self.path!r}, error={self.error!r})"
+
+    def to_dict(self):
+        return {'status': self.status.value, 'kind': self.kind, 'path': self.path,
+                'ext': self.ext, 'converted': self.converted, 'error': self.error,
+                'profile': self.profile, 'transcoded': self.transcoded, 'timings': self.timings}
+
+    @classmethod
+    def from_dict(cls, data):
+        result = cls(JobStatus(data['status']), data['kind'], data.get('path'), data.get('ext'),
+                     data.get('converted', False), data.get('error'), data.get('profile'), data.get('transcoded'))
+        result.timings = data.get('timings')
+        return result
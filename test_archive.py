@@ -0,0 +1,94 @@
+from archive import ANY_PROFILE, DownloadArchive, archive_key
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+from records import JobStatus
+import io
+import multiprocessing
+import os
+import tempfile
+
+AUDIO = os.urandom(64 * 1024)
+
+
+def test_keys_match_with_or_without_extraction():
+    assert archive_key("https://www.youtube.com/watch?v=jNQXAC9IVRw&t=3") == ('youtube', 'jNQXAC9IVRw')
+    assert archive_key(info={'extractor_key': 'Youtube', 'id': 'jNQXAC9IVRw'}) == ('youtube', 'jNQXAC9IVRw')
+    assert archive_key(info={'ie_key': 'Vimeo', 'id': 123}) == ('vimeo', '123')
+    assert archive_key("https://example.com/clip.mp4") is None
+
+
+def test_lookup_profiles_and_text_round_trip():
+    with tempfile.TemporaryDirectory() as root:
+        archive = DownloadArchive(os.path.join(root, 'archive.db'))
+        archive.add('youtube', 'jNQXAC9IVRw', 'mp3', '/music/Me at the zoo.mp3')
+        assert archive.find("https://youtu.be/jNQXAC9IVRw", 'mp3')['path'] == '/music/Me at the zoo.mp3'
+        assert archive.find("https://youtu.be/jNQXAC9IVRw", 'mp4') is None
+
+        # A yt-dlp archive says nothing about profiles: it counts for all of them
+        assert archive.import_(io.StringIO("youtube dQw4w9WgXcQ\nvimeo 42 original\n# comment\n")) == 2
+        assert archive.find("https://youtu.be/dQw4w9WgXcQ", 'remux')['profile'] == ANY_PROFILE
+        assert archive.find(info={'extractor_key': 'Vimeo', 'id': '42'}, profile='original')
+
+        out = io.StringIO()
+        assert archive.export(out) == 3
+        copy = DownloadArchive(os.path.join(root, 'copy.db'))
+        copy.import_(io.StringIO(out.getvalue()))
+        assert len(copy) == 3
+
+        out = io.StringIO()
+        archive.export(out, ytdlp=True)
+        assert out.getvalue().splitlines() == ["vimeo 42", "youtube dQw4w9WgXcQ", "youtube jNQXAC9IVRw"]
+        archive.close()
+        copy.close()
+
+
+def _record_many(path, worker):
+    archive = DownloadArchive(path)
+    for i in range(100):
+        archive.add('youtube', f"w{worker}-{i}", 'mp4')
+    archive.close()
+
+
+def test_worker_processes_share_one_archive():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'archive.db')
+        DownloadArchive(path).close()
+        procs = [multiprocessing.Process(target=_record_many, args=(path, w)) for w in range(4)]
+        for p in procs:
+            p.start()
+        for p in procs:
+            p.join()
+        assert all(p.exitcode == 0 for p in procs)
+        assert len(DownloadArchive(path)) == 400
+
+
+def test_archived_videos_are_skipped_before_extraction():
+    with LocalMediaServer({'/a.m4a': AUDIO}) as server, tempfile.TemporaryDirectory() as root:
+        archive = DownloadArchive(os.path.join(root, 'archive.db'))
+        dl = YouTubeDownloader(root, connections=1, archive=archive)
+
+        archive.add('youtube', 'jNQXAC9IVRw', 'mp4', '/videos/zoo.mp4')
+        result = dl.download_video("https://www.youtube.com/watch?v=jNQXAC9IVRw")
+        assert result.status is JobStatus.SKIPPED and result.ok and result.path == '/videos/zoo.mp4'
+        assert dl.extraction_count == 0
+
+        info = {'id': 'song', 'title': 'Song', 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': server.url('/a.m4a'),
+                'formats': [{'format_id': '140', 'url': server.url('/a.m4a'), 'ext': 'm4a',
+                             'filesize': len(AUDIO), 'vcodec': 'none', 'acodec': 'mp4a.40.2'}]}
+        first = dl.download_audio(info['webpage_url'], info=info, profile='original')
+        requests = len(server.requests)
+        again = dl.download_audio(info['webpage_url'], info=info, profile='original')
+
+        assert first.status is JobStatus.DONE and again.status is JobStatus.SKIPPED
+        assert again.path == first.path and len(server.requests) == requests
+        assert not os.path.exists(os.path.join(dl.audio_path, 'Song (1).m4a'))
+        assert archive.stats() == {'hits': 2, 'misses': 1}
+
+
+if __name__ == "__main__":
+    test_keys_match_with_or_without_extraction()
+    test_lookup_profiles_and_text_round_trip()
+    test_worker_processes_share_one_archive()
+    test_archived_videos_are_skipped_before_extraction()
+    print("Download archive checks passed.")
@@ -0,0 +1,117 @@
+from bandwidth import BLOCK_SIZE, BandwidthGovernor, parse_rate, parse_schedule
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer, local_info
+from types import SimpleNamespace
+import os
+import tempfile
+import threading
+import time
+
+MiB = 1024 * 1024
+
+
+def test_rates_and_schedule_windows_parse():
+    assert parse_rate('2M') == 2 * MiB and parse_rate('500k') == 500 * 1024
+    assert parse_rate('1.5MB/s') == int(1.5 * MiB) and parse_rate('4096') == 4096
+    assert parse_rate('off') is None and parse_rate(0) is None
+
+    clock = SimpleNamespace(tm_hour=12, tm_min=0)
+    governor = BandwidthGovernor(MiB, schedule=parse_schedule(['09:00-18:00=256K', '23:00-07:00=off']),
+                                 local_time=lambda: clock)
+    assert governor.rate == 256 * 1024
+    clock.tm_hour = 20
+    assert governor.rate == MiB
+    clock.tm_hour = 2  # the night window wraps past midnight
+    assert governor.rate is None
+
+
+def test_backlogged_jobs_share_by_priority_weight():
+    governor = BandwidthGovernor(8 * MiB)
+    low, high = governor.share(priority=0), governor.share(priority=1)
+    deadline = time.monotonic() + 0.8
+
+    def pull(share):
+        while time.monotonic() < deadline:
+            governor.consume(share, BLOCK_SIZE)
+
+    threads = [threading.Thread(target=pull, args=(s,)) for s in (low, high)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    # Weight 2 against 1 while both wait on the bucket
+    assert 1.6 < high.bytes / low.bytes < 2.5, (high.bytes, low.bytes)
+    assert governor.stats()['jobs'] == 2
+
+
+def test_set_rate_applies_to_waiting_downloads():
+    governor = BandwidthGovernor(64 * 1024)
+    share = governor.share()
+    governor.consume(share, 4 * MiB)  # deep in debt: a minute at this rate
+    done = threading.Event()
+    threading.Thread(target=lambda: (governor.consume(share, BLOCK_SIZE), done.set()), daemon=True).start()
+    assert not done.wait(0.3)
+    governor.set_rate(None)
+    assert done.wait(1.0)
+
+
+def test_share_draws_each_byte_once():
+    share = BandwidthGovernor().share()
+    with tempfile.TemporaryDirectory() as root:
+        fresh, resumed = os.path.join(root, 'fresh.mp4.part'), os.path.join(root, 'old.mp4.part')
+        # A fast new download's first report is charged in full
+        share({'status': 'downloading', 'tmpfilename': fresh, 'downloaded_bytes': 3 * MiB})
+        assert share.bytes == 3 * MiB
+        # Concurrent fragments report out of order: a lower count draws nothing
+        for done in (5 * MiB, 4 * MiB, 6 * MiB):
+            share({'status': 'downloading', 'tmpfilename': fresh, 'downloaded_bytes': done})
+        assert share.bytes == 6 * MiB
+
+        # What a resumed .part already holds is not charged again
+        with open(resumed, 'wb') as f:
+            f.write(b'\0' * MiB)
+        share.skip_existing([resumed, os.path.join(root, 'missing.part')])
+        share({'status': 'downloading', 'tmpfilename': resumed, 'downloaded_bytes': MiB + BLOCK_SIZE})
+        assert share.bytes == 6 * MiB + BLOCK_SIZE
+
+
+def test_concurrent_downloads_stay_within_the_cap():
+    size, cap = 1536 * 1024, MiB
+    files = {f'/clip{i}.mp4': os.urandom(size) for i in range(2)}
+    # The server alone would allow 8 MiB/s per connection
+    with LocalMediaServer(files, per_connection_rate=8 * MiB) as server, \
+            tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(os.path.join(root, 'out'), connections=1, parallel_streams=False,
+                               bandwidth=BandwidthGovernor(cap))
+        results = [None, None]
+
+        def fetch(i):
+            url = server.url(f'/clip{i}.mp4')
+            results[i] = dl.download_video(url, info=local_info(url, f'clip{i}', size), priority=i)
+
+        started = time.monotonic()
+        threads = [threading.Thread(target=fetch, args=(i,)) for i in range(2)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.monotonic() - started
+
+        assert all(r.ok for r in results), results
+        for i, r in enumerate(results):
+            with open(r.path, 'rb') as f:
+                assert f.read() == files[f'/clip{i}.mp4']
+        throughput = 2 * size / elapsed
+        assert 0.7 * cap < throughput < 1.15 * cap, throughput / cap
+        stats = dl.bandwidth.stats()
+        assert stats['jobs'] == 0 and stats['wait_seconds'] > 0
+
+
+if __name__ == "__main__":
+    test_rates_and_schedule_windows_parse()
+    test_backlogged_jobs_share_by_priority_weight()
+    test_set_rate_applies_to_waiting_downloads()
+    test_share_draws_each_byte_once()
+    test_concurrent_downloads_stay_within_the_cap()
+    print("Bandwidth checks passed.")
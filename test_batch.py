@@ -0,0 +1,59 @@
+from batch import iter_sources, run_batch
+from records import DownloadResult
+import io
+import os
+import tempfile
+import threading
+import time
+
+
+class StubPlaylistDownloader:
+    """
+    Enumerates a slow "playlist" lazily and downloads instantly.
+    """
+
+    def __init__(self, count):
+        self.count = count
+        self.enumerated = 0
+        self.enumerated_at_first_download = None
+        self.stage_limits = None
+        self._lock = threading.Lock()
+
+    def iter_entries(self, url):
+        for i in range(self.count):
+            time.sleep(0.01)  # next page of the playlist
+            self.enumerated += 1
+            yield f"{url}#{i}", None
+
+    def download_audio(self, url, progress_callback=None, cancel_check=None, info=None, **options):
+        with self._lock:
+            if self.enumerated_at_first_download is None:
+                self.enumerated_at_first_download = self.enumerated
+        return DownloadResult.done('audio', ext='mp3', converted=True)
+
+
+def test_iter_sources_reads_args_files_and_stdin():
+    with tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'urls.txt')
+        with open(path, 'w') as f:
+            f.write("# channel list\nhttps://youtu.be/aaaaaaaaaaa\n\nhttps://youtu.be/bbbbbbbbbbb\n")
+        stdin = io.StringIO("https://youtu.be/ccccccccccc\n")
+        assert list(iter_sources(['https://youtu.be/zzzzzzzzzzz', '-'], [path], stdin=stdin)) == [
+            'https://youtu.be/zzzzzzzzzzz', 'https://youtu.be/ccccccccccc',
+            'https://youtu.be/aaaaaaaaaaa', 'https://youtu.be/bbbbbbbbbbb',
+        ]
+
+
+def test_downloads_start_before_enumeration_finishes():
+    stub = StubPlaylistDownloader(count=40)
+    finished = list(run_batch(stub, ['playlist'], kind='audio', workers=2, ahead=4))
+
+    assert len(finished) == 40
+    assert all(job.state == 'done' for job in finished)
+    assert stub.enumerated_at_first_download < 40
+
+
+if __name__ == "__main__":
+    test_iter_sources_reads_args_files_and_stdin()
+    test_downloads_start_before_enumeration_finishes()
+    print("Batch checks passed.")
@@ -0,0 +1,109 @@
+from congestion import CongestionController
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer, local_info
+from parallel import split_ranges
+import os
+import tempfile
+import threading
+import time
+
+URL = 'https://rr1---sn-abc.googlevideo.com/videoplayback?id=1'
+SIZE = 4 * 1024 * 1024
+CHUNK = 256 * 1024
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_throttling_halves_once_per_hold_and_health_adds_back():
+    clock = FakeClock()
+    control = CongestionController(window=4, hold=1.0, clock=clock)
+    assert control.connections(URL, 8) == 8
+
+    control.record(URL, 429)
+    control.record(URL, 429)  # same burst: no second decrease
+    assert control.connections(URL, 8) == 4
+    clock.now += 2
+    for _ in range(4):
+        control.record(URL, 206)
+    assert control.connections(URL, 8) == 5
+
+    stats = control.stats()['googlevideo.com']
+    assert stats['decisions'] == {'increase': 1, 'decrease': 1, 'open': 0, 'close': 0}
+    assert stats['throttled'] == 2 and stats['downloads'] == 2 and stats['breaker'] == 'closed'
+
+
+def test_storm_opens_the_breaker_until_a_probe_succeeds():
+    clock = FakeClock()
+    control = CongestionController(storm_threshold=3, cooldown=5, clock=clock)
+    for _ in range(3):
+        control.record(URL, 429)
+    assert control.breaker(URL) == 'open'
+
+    clock.now += 6
+    assert control.breaker(URL) == 'half-open'
+    control.record(URL, 429, retry_after=1)  # the probe is throttled: twice the cooldown
+    clock.now += 6
+    assert control.breaker(URL) == 'open'
+    clock.now += 5
+    control.record(URL, 200)
+    assert control.breaker(URL) == 'closed'
+    assert control.stats()['googlevideo.com']['decisions']['open'] == 2
+
+
+def test_open_breaker_holds_new_downloads():
+    control = CongestionController(storm_threshold=2, cooldown=0.4)
+    control.record(URL, 429)
+    control.record(URL, 429)
+    entered = threading.Event()
+
+    def download():
+        with control.slot(URL):
+            entered.set()
+
+    started = time.monotonic()
+    threading.Thread(target=download, daemon=True).start()
+    assert entered.wait(2.0)
+    assert time.monotonic() - started >= 0.3
+
+
+def test_injected_429s_back_off_then_recover():
+    payload = os.urandom(SIZE)
+    with LocalMediaServer({'/a.mp4': payload, '/b.mp4': payload}, error_rate=0.2, seed=3) as server, \
+            tempfile.TemporaryDirectory() as root:
+        control = CongestionController(window=4, hold=0.0, storm_threshold=1000, retry_backoff=0.01)
+        dl = YouTubeDownloader(os.path.join(root, 'out'), connections=8, chunk_size=CHUNK,
+                               range_param_hosts=('127.0.0.1',), congestion=control)
+
+        url = server.url('/a.mp4')
+        result = dl.download_video(url, info=local_info(url, 'a', SIZE))
+        assert result.ok, result
+        with open(result.path, 'rb') as f:
+            assert f.read() == payload
+        stats = control.stats()['127.0.0.1']
+        # Every injected 429 was seen and answered with a decrease
+        assert stats['throttled'] == server.errors_sent > 0
+        assert stats['decisions']['decrease'] >= 1
+        backed_off = dl._connections_for(local_info(url, 'a', SIZE))
+        assert backed_off < 8
+
+        server.error_rate = 0.0
+        url = server.url('/b.mp4')
+        assert dl.download_video(url, info=local_info(url, 'b', SIZE)).ok
+        stats = control.stats()['127.0.0.1']
+        assert stats['decisions']['increase'] >= 1
+        assert stats['connections'] > backed_off or stats['connections'] == control.maximum
+        assert stats['responses'] >= 2 * len(split_ranges(SIZE, CHUNK))
+
+
+if __name__ == "__main__":
+    test_throttling_halves_once_per_hold_and_health_adds_back()
+    test_storm_opens_the_breaker_until_a_probe_succeeds()
+    test_open_breaker_holds_new_downloads()
+    test_injected_429s_back_off_then_recover()
+    print("Congestion control checks passed.")
@@ -0,0 +1,97 @@
+from content_store import ContentStore, StreamHasher
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+from records import JobStatus
+import hashlib
+import os
+import tempfile
+
+AUDIO = os.urandom(3 * 1024 * 1024 + 123)
+
+
+def _info(server, video_id, title, path):
+    return {'id': video_id, 'title': title, 'extractor': 'generic', 'extractor_key': 'Generic',
+            'webpage_url': server.url(path),
+            'formats': [{'format_id': '140', 'url': server.url(path), 'ext': 'm4a',
+                         'filesize': len(AUDIO), 'vcodec': 'none', 'acodec': 'mp4a.40.2'}]}
+
+
+def sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def test_hasher_reads_each_byte_once_and_ignores_existing_files():
+    with tempfile.TemporaryDirectory() as root:
+        part, final = os.path.join(root, 'a.m4a.part'), os.path.join(root, 'a.m4a')
+        hasher = StreamHasher(min_read=1000)
+        with open(part, 'wb') as f:
+            for start in range(0, len(AUDIO), 4096):
+                f.write(AUDIO[start:start + 4096])
+                f.flush()
+                hasher({'status': 'downloading', 'filename': final, 'tmpfilename': part,
+                        'downloaded_bytes': f.tell()})
+        os.replace(part, final)
+        hasher({'status': 'finished', 'filename': final})
+
+        assert hasher.pop(final) == (hashlib.sha256(AUDIO).hexdigest(), len(AUDIO))
+        assert hasher.bytes_read == len(AUDIO)
+        # Already on disk: yt-dlp only reports "finished", nothing is read
+        hasher({'status': 'finished', 'filename': final})
+        assert hasher.pop(final) is None and hasher.bytes_read == len(AUDIO)
+
+        # Downloads that error or are cancelled leave nothing behind
+        def start(name):
+            hasher({'status': 'downloading', 'filename': os.path.join(root, name), 'downloaded_bytes': 0})
+        start('x.m4a')
+        hasher({'status': 'error', 'filename': os.path.join(root, 'x.m4a')})
+        for name in ('b.f137.mp4', 'b.f140.m4a', 'b (1).mp4'):
+            start(name)
+        hasher.discard(os.path.join(root, 'b'))
+        assert list(hasher._open) == [os.path.join(os.path.abspath(root), 'b (1).mp4')]
+
+
+def test_store_links_identical_files_and_reports_savings():
+    with tempfile.TemporaryDirectory() as root:
+        store = ContentStore(os.path.join(root, '.store'))
+        paths = []
+        for name, data in (('a', b'same bytes'), ('b', b'same bytes'), ('c', b'same bytes'), ('d', b'other')):
+            paths.append(os.path.join(root, name))
+            with open(paths[-1], 'wb') as f:
+                f.write(data)
+        assert [store.ingest(path, sha256(path)) for path in paths] == [False, True, True, False]
+        assert os.path.samefile(paths[0], paths[2]) and not os.path.samefile(paths[0], paths[3])
+        assert store.ingest(paths[1], sha256(paths[1])) is False
+        report = store.report()
+        assert report['objects'] == 2 and report['bytes_saved'] == 2 * len(b'same bytes')
+        assert report['stored_bytes'] == len(b'same bytes') + len(b'other')
+        # The running totals agree with a fresh walk of the store
+        fresh = ContentStore(store.root).report()
+        assert {k: fresh[k] for k in ('objects', 'stored_bytes', 'bytes_saved')} == \
+            {k: report[k] for k in ('objects', 'stored_bytes', 'bytes_saved')}
+
+
+def test_identical_downloads_are_stored_once_without_a_second_read():
+    with LocalMediaServer({'/a.m4a': AUDIO, '/mirror.m4a': AUDIO}) as server, \
+            tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root, connections=1, content_store=ContentStore(os.path.join(root, '.store')))
+        first = dl.download_audio(server.url('/a.m4a'), info=_info(server, 'a', 'Song', '/a.m4a'),
+                                  profile='original')
+        mirror = dl.download_audio(server.url('/mirror.m4a'),
+                                   info=_info(server, 'b', 'Song (re-upload)', '/mirror.m4a'), profile='original')
+
+        assert first.status is JobStatus.DONE and mirror.status is JobStatus.DONE
+        assert first.path != mirror.path and os.path.samefile(first.path, mirror.path)
+        assert dl.stream_hasher.bytes_read == 2 * len(AUDIO)
+        report = dl.content_store.report()
+        assert report['objects'] == 1 and report['deduplicated'] == 1
+        assert report['bytes_saved'] == len(AUDIO)
+        with open(mirror.path, 'rb') as f:
+            assert f.read() == AUDIO
+
+
+if __name__ == "__main__":
+    test_hasher_reads_each_byte_once_and_ignores_existing_files()
+    test_store_links_identical_files_and_reports_savings()
+    test_identical_downloads_are_stored_once_without_a_second_read()
+    print("Content store checks passed.")
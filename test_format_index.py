@@ -0,0 +1,51 @@
+from format_index import FormatIndex, format_index
+
+INFO = {'id': 'x', 'title': 'X', 'duration': 100, 'formats': [
+    {'format_id': '139', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.5', 'abr': 48, 'filesize': 600_000},
+    {'format_id': '140', 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 129, 'filesize': 1_600_000},
+    {'format_id': '251', 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus', 'abr': 135, 'filesize': 1_500_000},
+    {'format_id': '18', 'ext': 'mp4', 'height': 360, 'fps': 30, 'vcodec': 'avc1.42001E', 'acodec': 'mp4a.40.2', 'tbr': 500},
+    {'format_id': '136', 'ext': 'mp4', 'height': 720, 'fps': 30, 'vcodec': 'avc1.4d401f', 'acodec': 'none', 'tbr': 1500},
+    {'format_id': '398', 'ext': 'mp4', 'height': 720, 'fps': 30, 'vcodec': 'av01.0.05M.08', 'acodec': 'none', 'tbr': 900},
+    {'format_id': '137', 'ext': 'mp4', 'height': 1080, 'fps': 30, 'vcodec': 'avc1.640028', 'acodec': 'none', 'tbr': 4000},
+    {'format_id': '299', 'ext': 'mp4', 'height': 1080, 'fps': 60, 'vcodec': 'avc1.64002a', 'acodec': 'none', 'tbr': 6000},
+    {'format_id': '303', 'ext': 'webm', 'height': 1080, 'fps': 60, 'vcodec': 'vp09.00.41.08', 'acodec': 'none', 'tbr': 5000},
+    {'format_id': '315', 'ext': 'webm', 'height': 2160, 'fps': 60, 'vcodec': 'vp9', 'acodec': 'none', 'tbr': 20000},
+]}
+
+
+def test_ranked_queries():
+    index = FormatIndex(INFO)
+    assert index.heights == [2160, 1080, 720, 360]
+    assert index.best_video().format_id == '315'
+    assert index.best_video(max_height=1080).format_id == '299'
+    assert index.best_video(max_height=1080, codec='vp9').format_id == '303'
+    # 1080p60 h264 is ~75 MB over 100 s, 720p av1 ~11 MB
+    assert index.best_video(max_height=1080, max_size=40e6).format_id == '136'
+    assert index.best_video(max_height=1080, max_size=40e6, codec='av01').format_id == '398'
+    assert index.best_audio().format_id == '251'
+    assert index.best_audio(max_abr=130, codec='aac').format_id == '140'
+    assert index.best_audio(min_abr=128, smallest=True).format_id == '251'
+    assert index.best_audio(min_abr=500) is None
+
+
+def test_menu_keeps_the_best_format_per_label():
+    choices = FormatIndex(INFO).choices()
+    assert [label for label, _ in choices] == ['2160p60 - webm', '1080p60 - mp4', '1080p60 - webm',
+                                              '1080p - mp4', '720p - mp4', '360p - mp4']
+    # Two 720p mp4 formats: the h264 one, not whichever came first
+    assert dict(choices)['720p - mp4'] == '136'
+
+
+def test_index_is_built_once_per_info():
+    assert format_index(INFO) is format_index(INFO)
+    assert format_index(dict(INFO)) is not format_index(INFO)
+    assert format_index(INFO).select('video', {'max_height': 720}) == '136'
+    assert format_index(INFO).select('audio', {'min_abr': 100, 'codec': 'aac'}) == '140'
+
+
+if __name__ == "__main__":
+    test_ranked_queries()
+    test_menu_keeps_the_best_format_per_label()
+    test_index_is_built_once_per_info()
+    print("Format index checks passed.")
@@ -0,0 +1,148 @@
+from http_api import JobServer, ProgressFeed
+from job_queue import Job, JobQueue
+from records import DownloadResult, JobStatus, ProgressSnapshot
+import http.client
+import json
+import threading
+import time
+import urllib.request
+
+
+class StandInDownloader:
+    """
+    Local stand-in for YouTubeDownloader: "downloads" in steps, no network.
+    """
+
+    def __init__(self, steps=50, delay=0.01):
+        self.steps = steps
+        self.delay = delay
+        self.stage_limits = None
+        self.gate = threading.Event()
+        self.gate.set()
+
+    def download_video(self, url, format_id=None, progress_callback=None, cancel_check=None, info=None, **options):
+        for i in range(self.steps):
+            self.gate.wait()
+            if cancel_check and cancel_check():
+                return DownloadResult.paused('video')
+            time.sleep(self.delay)
+            progress_callback(ProgressSnapshot(i + 1, self.steps))
+        return DownloadResult.done('video')
+
+    download_audio = None
+
+
+def request(server, method, path, payload=None):
+    data = json.dumps(payload).encode() if payload is not None else None
+    req = urllib.request.Request(server.address + path, data=data, method=method,
+                                 headers={'Content-Type': 'application/json'})
+    try:
+        with urllib.request.urlopen(req, timeout=5) as resp:
+            return resp.status, json.loads(resp.read())
+    except urllib.error.HTTPError as e:
+        return e.code, json.loads(e.read())
+
+
+def read_events(server, job_id, until_state):
+    events = []
+    with urllib.request.urlopen(f"{server.address}/events?job={job_id}", timeout=10) as resp:
+        for raw in resp:
+            line = raw.decode().strip()
+            if line.startswith('data: '):
+                events.append(json.loads(line[6:]))
+                if events[-1]['state'] == until_state:
+                    return events
+    return events
+
+
+def start_server(downloader, workers=1):
+    jobs = JobQueue(downloader, workers=workers)
+    server = JobServer(jobs, port=0, max_rate=10)
+    server.start()
+    jobs.start()
+    return jobs, server
+
+
+def test_submit_list_and_stream_progress():
+    jobs, server = start_server(StandInDownloader())
+    try:
+        status, body = request(server, 'POST', '/jobs', {'kind': 'video', 'url': 'local://clip'})
+        assert status == 201
+        job_id = body['job_id']
+
+        events = read_events(server, job_id, 'done')
+        assert events[-1]['state'] == 'done' and events[-1]['progress'] == 1.0
+        # 50 progress ticks in ~0.5s at <=10 events/s: the feed coalesced them
+        assert len(events) < 20
+
+        status, listed = request(server, 'GET', '/jobs')
+        assert status == 200 and [j['job_id'] for j in listed] == [job_id]
+        assert request(server, 'POST', '/jobs', {'url': 'x'})[0] == 400
+        for bad in ({'priority': 'high'}, {'priority': 1.5}, {'options': ['x']},
+                    {'options': {'priority': 3}}, {'options': {'url': 'y'}}):
+            status, body = request(server, 'POST', '/jobs', {'kind': 'video', 'url': 'x', **bad})
+            assert status == 400 and body['error'], (bad, status, body)
+        assert len(jobs.jobs()) == 1
+    finally:
+        server.stop()
+        jobs.stop(wait=False)
+
+
+def test_feed_drops_finished_jobs_once_every_client_has_them():
+    feed = ProgressFeed()
+    fast, slow = feed.subscribe(), feed.subscribe()
+    job = Job('video', 'local://a', 0, {})
+    job.state = JobStatus.DONE
+    feed.publish(job)
+    version, changed = feed.changes_since(0, 0, fast)
+    assert [snap['state'] for snap in changed] == ['done']
+    # The slow client has not read it yet
+    assert feed.changes_since(0, 0)[1]
+    feed.changes_since(0, 0, slow)
+    assert feed.changes_since(0, 0)[1] == []
+
+    # A client that leaves no longer holds snapshots back
+    feed.publish(job)
+    feed.unsubscribe(slow)
+    assert feed.changes_since(version, 0)[1]
+    feed.unsubscribe(fast)
+    assert feed.changes_since(version, 0)[1] == []
+
+
+def test_pause_resume_and_cancel():
+    stand_in = StandInDownloader(delay=0.02)
+    jobs, server = start_server(stand_in)
+    try:
+        running = request(server, 'POST', '/jobs', {'kind': 'video', 'url': 'local://a'})[1]['job_id']
+        queued = request(server, 'POST', '/jobs', {'kind': 'video', 'url': 'local://b'})[1]['job_id']
+
+        assert request(server, 'POST', f'/jobs/{queued}/cancel')[1]['ok']
+        assert request(server, 'GET', f'/jobs/{queued}')[1]['state'] == 'cancelled'
+
+        assert request(server, 'POST', f'/jobs/{running}/pause')[1]['ok']
+        assert read_events(server, running, 'paused')[-1]['state'] == 'paused'
+        assert request(server, 'POST', f'/jobs/{running}/resume')[1]['ok']
+        assert read_events(server, running, 'done')[-1]['state'] == 'done'
+
+        assert request(server, 'POST', '/jobs/ffff/cancel')[0] == 404
+
+        # Bodies on action routes are read, so the keep-alive connection stays in sync
+        conn = http.client.HTTPConnection(*server.httpd.server_address[:2], timeout=5)
+        statuses = []
+        for method, path in (('POST', f'/jobs/{running}/cancel'), ('POST', '/nowhere'), ('GET', '/jobs')):
+            conn.request(method, path, body=b'{"reason": "test"}' if method == 'POST' else None)
+            response = conn.getresponse()
+            response.read()
+            statuses.append(response.status)
+        assert statuses == [409, 404, 200]  # the job is done: nothing to cancel
+        conn.close()
+    finally:
+        server.stop()
+        jobs.stop(wait=False)
+
+
+if __name__ == "__main__":
+    test_submit_list_and_stream_progress()
+    test_feed_drops_finished_jobs_once_every_client_has_them()
+    test_pause_resume_and_cancel()
+    print("HTTP API checks passed.")
@@ -0,0 +1,63 @@
+from info_cache import InfoCache, canonical_video_id
+import os
+import tempfile
+import time
+
+
+def test_canonical_video_id():
+    key = "youtube:jNQXAC9IVRw"
+    for url in [
+        "https://www.youtube.com/watch?v=jNQXAC9IVRw",
+        "https://youtube.com/watch?v=jNQXAC9IVRw&t=10",
+        "https://youtu.be/jNQXAC9IVRw?si=abc",
+        "https://www.youtube.com/shorts/jNQXAC9IVRw",
+        "https://m.youtube.com/embed/jNQXAC9IVRw",
+        "youtu.be/jNQXAC9IVRw",
+    ]:
+        assert canonical_video_id(url) == key, url
+    assert canonical_video_id("https://example.com/a.mp4#frag") == "https://example.com/a.mp4"
+
+
+def test_lru_eviction_and_counters():
+    cache = InfoCache(max_entries=2)
+    cache.put("https://youtu.be/aaaaaaaaaaa", {'id': 'a'})
+    cache.put("https://youtu.be/bbbbbbbbbbb", {'id': 'b'})
+    assert cache.get("https://www.youtube.com/watch?v=aaaaaaaaaaa") == {'id': 'a'}
+    cache.put("https://youtu.be/ccccccccccc", {'id': 'c'})  # evicts b, the least recent
+
+    assert cache.get("https://youtu.be/bbbbbbbbbbb") is None
+    stats = cache.stats()
+    assert (stats['hits'], stats['misses'], stats['evictions']) == (1, 1, 1)
+
+
+def test_ttl_and_stream_expiry():
+    cache = InfoCache(ttl=60)
+    cache.put("https://youtu.be/aaaaaaaaaaa", {'id': 'a'}, ttl=-1)
+    assert cache.get("https://youtu.be/aaaaaaaaaaa") is None
+    assert cache.stats()['expirations'] == 1
+
+    # Signed stream URL about to expire caps the entry lifetime
+    soon = int(time.time()) + InfoCache.EXPIRY_MARGIN - 1
+    cache.put("https://youtu.be/bbbbbbbbbbb", {'formats': [{'url': f"https://r1.example/videoplayback?expire={soon}"}]})
+    assert cache.get("https://youtu.be/bbbbbbbbbbb") is None
+
+
+def test_disk_tier_survives_restart():
+    with tempfile.TemporaryDirectory() as root:
+        db = os.path.join(root, 'info.sqlite')
+        cache = InfoCache(db_path=db)
+        cache.put("https://youtu.be/aaaaaaaaaaa", {'id': 'a', 'title': 'A'})
+        cache.close()
+
+        reopened = InfoCache(db_path=db)
+        assert reopened.get("https://www.youtube.com/shorts/aaaaaaaaaaa")['title'] == 'A'
+        assert reopened.stats()['disk_hits'] == 1
+        reopened.close()
+
+
+if __name__ == "__main__":
+    test_canonical_video_id()
+    test_lru_eviction_and_counters()
+    test_ttl_and_stream_expiry()
+    test_disk_tier_survives_restart()
+    print("Info cache checks passed.")
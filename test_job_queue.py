@@ -0,0 +1,97 @@
+from job_queue import JobQueue, DONE, PENDING, PAUSED
+from records import DownloadResult, ProgressSnapshot
+import os
+import tempfile
+import threading
+import time
+
+
+class StubDownloader:
+    """
+    Stands in for YouTubeDownloader: records call order and concurrency.
+    """
+
+    def __init__(self, delay=0.05):
+        self.delay = delay
+        self.order = []
+        self.active = 0
+        self.peak = 0
+        self.lock = threading.Lock()
+        self.stage_limits = None
+
+    def _work(self, url, progress_callback=None, cancel_check=None):
+        with self.stage_limits.slot('download'):
+            with self.lock:
+                self.order.append(url)
+                self.active += 1
+                self.peak = max(self.peak, self.active)
+            for i in range(5):
+                if cancel_check and cancel_check():
+                    with self.lock:
+                        self.active -= 1
+                    return DownloadResult.paused('video')
+                time.sleep(self.delay / 5)
+                if progress_callback:
+                    progress_callback(ProgressSnapshot(i + 1, 5))
+            with self.lock:
+                self.active -= 1
+        return DownloadResult.done('video')
+
+    def download_video(self, url, format_id=None, progress_callback=None, cancel_check=None, info=None, **options):
+        return self._work(url, progress_callback, cancel_check)
+
+    def download_audio(self, url, progress_callback=None, cancel_check=None, info=None, **options):
+        return self._work(url, progress_callback, cancel_check)
+
+
+def wait_for(queue, job_ids, states=(DONE,), timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        if all(queue.get(j).state in states for j in job_ids):
+            return
+        time.sleep(0.01)
+    raise AssertionError([queue.get(j).state for j in job_ids])
+
+
+def test_priority_order_and_download_cap():
+    stub = StubDownloader()
+    queue = JobQueue(stub, workers=4, limits={'download': 2})
+    ids = [queue.submit('audio', f"low-{i}") for i in range(3)]
+    ids.append(queue.submit('video', "urgent", priority=10))
+    queue.start()
+    wait_for(queue, ids)
+    queue.stop()
+
+    assert stub.order[0] == "urgent"
+    assert stub.peak <= 2
+
+
+def test_pause_resume_and_restart_from_state_file():
+    with tempfile.TemporaryDirectory() as root:
+        state = os.path.join(root, 'jobs.json')
+        stub = StubDownloader(delay=1.0)
+        queue = JobQueue(stub, workers=1, state_path=state)
+        running = queue.submit('video', "first")
+        waiting = queue.submit('video', "second")
+        queue.start()
+
+        while not stub.order:
+            time.sleep(0.01)
+        queue.pause(running)
+        wait_for(queue, [running], states=(PAUSED,))
+        queue.stop(wait=False)
+
+        # "Crash" and restart: the paused job stays paused, pending work is picked up
+        restored = JobQueue(StubDownloader(delay=0.01), workers=1, state_path=state)
+        assert restored.get(running).state == PAUSED
+        assert restored.get(waiting).state in (PENDING, 'running')
+        restored.start()
+        restored.resume(running)
+        wait_for(restored, [running, waiting])
+        restored.stop()
+
+
+if __name__ == "__main__":
+    test_priority_order_and_download_cap()
+    test_pause_resume_and_restart_from_state_file()
+    print("Job queue checks passed.")
@@ -21,10 +21,10 @@ def test_logic():
 
     # Test Download (Audio Only to be quick)
     print("Testing Audio Download...")
-    result = dl.download_audio(test_url, progress_callback=lambda p, e: print(f"Progress: {p:.2f}, ETA: {e}"))
+    result = dl.download_audio(test_url, progress_callback=lambda s: print(f"Progress: {s.fraction:.2f}, {s.describe()}"))
     print(f"Download Result: {result}")
     
-    if "Complete" in result:
+    if result.ok:
         print("Verification Successful!")
     else:
         print("Verification Failed.")
@@ -0,0 +1,70 @@
+from congestion import CongestionController
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer, local_info
+from metrics import Histogram, Metrics
+from records import DownloadResult
+import os
+import tempfile
+
+SIZE = 2 * 1024 * 1024
+CHUNK = 256 * 1024
+
+
+def test_histogram_quantiles_and_buckets():
+    h = Histogram()
+    for i in range(1, 101):
+        h.observe(i / 100)
+    assert h.count == 100 and abs(h.sum - 50.5) < 1e-9
+    assert h.quantile(0.5) == 0.51 and h.quantile(0.95) == 0.96
+    buckets = dict(h.cumulative())
+    assert buckets[0.05] == 5 and buckets[0.5] == 50 and buckets[1.0] == 100
+
+
+def test_render_and_summary_of_a_failed_job():
+    metrics = Metrics()
+    timings = metrics.start('video', 'https://example.com/v')
+    try:
+        with timings.phase('extract'):
+            raise RuntimeError("boom")
+    except RuntimeError:
+        pass
+    result = metrics.finish(timings, DownloadResult.failed('video', "boom"))
+    assert result.timings['failed_phase'] == 'extract' and result.timings['status'] == 'failed'
+    assert metrics.summaries() == [result.timings]
+
+    text = metrics.render()
+    assert '# TYPE youtube_scraper_phase_seconds histogram' in text
+    assert 'youtube_scraper_phase_seconds_bucket{phase="extract",le="+Inf"} 1' in text
+    assert 'youtube_scraper_jobs_total{kind="video",status="failed"} 1' in text
+
+
+def test_download_records_phases_bytes_and_retries():
+    payload = os.urandom(SIZE)
+    with LocalMediaServer({'/a.mp4': payload}, error_rate=0.2, seed=5) as server, \
+            tempfile.TemporaryDirectory() as root:
+        control = CongestionController(hold=0.0, storm_threshold=1000, retry_backoff=0.01)
+        dl = YouTubeDownloader(os.path.join(root, 'out'), connections=4, chunk_size=CHUNK,
+                               range_param_hosts=('127.0.0.1',), congestion=control)
+        url = server.url('/a.mp4')
+        result = dl.download_video(url, info=local_info(url, 'a', SIZE))
+        assert result.ok, result
+
+        summary = result.timings
+        assert summary['status'] == 'done' and summary['kind'] == 'video'
+        assert {'filename', 'download_wait', 'video'} <= set(summary['phases'])
+        assert summary['bytes']['video'] == SIZE
+        # Every injected 429 was a failed request yt-dlp retried
+        assert summary['retries'] == server.errors_sent > 0
+
+        stats = dl.metrics.stats()
+        assert stats['jobs']['video']['count'] == 1 and stats['retries']['video'] == server.errors_sent
+        text = dl.metrics.render()
+        assert 'youtube_scraper_phase_seconds_count{phase="video"} 1' in text
+        assert f'youtube_scraper_bytes_total{{phase="video"}} {SIZE}' in text
+
+
+if __name__ == "__main__":
+    test_histogram_quantiles_and_buckets()
+    test_render_and_summary_of_a_failed_job()
+    test_download_records_phases_bytes_and_retries()
+    print("Metrics checks passed.")
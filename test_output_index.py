@@ -0,0 +1,80 @@
+from output_index import OutputIndex, names_in, split_name
+import os
+import tempfile
+import threading
+
+
+def touch(directory, *names):
+    for name in names:
+        open(os.path.join(directory, name), 'w').close()
+
+
+def test_every_extension_counts():
+    with tempfile.TemporaryDirectory() as root:
+        touch(root, 'Song.webm', 'Song (1).f137.mp4.part', 'Mr. Bean.m4a')
+        index = OutputIndex()
+        assert index.reserve(root, 'Song') == 'Song (2)'
+        assert index.reserve(root, 'Mr. Bean') == 'Mr. Bean (1)'
+        assert index.reserve(root, 'Mr') == 'Mr'
+        assert names_in('Song (1).f137.mp4.part')[0] == 'Song (1)'
+        assert split_name('Song (12)') == ('Song', 12)
+
+
+def test_one_listing_serves_many_reservations():
+    with tempfile.TemporaryDirectory() as root:
+        touch(root, 'Clip.mp4', *[f"Clip ({n}).mp4" for n in range(1, 300)])
+        index = OutputIndex()
+        names = [index.reserve(root, 'Clip') for _ in range(100)]
+        assert names[0] == 'Clip (300)' and names[-1] == 'Clip (399)'
+        assert index.scans == 1
+
+
+def test_concurrent_workers_never_share_a_name():
+    with tempfile.TemporaryDirectory() as root:
+        index = OutputIndex()
+        names = []
+        lock = threading.Lock()
+
+        def worker():
+            for _ in range(50):
+                name = index.reserve(root, 'Same Title')
+                with lock:
+                    names.append(name)
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        assert len(set(names)) == 400
+
+
+def test_external_files_are_picked_up():
+    with tempfile.TemporaryDirectory() as root:
+        index = OutputIndex()
+        assert index.reserve(root, 'Song') == 'Song'
+
+        touch(root, 'Song (1).mp3')
+        index.notice(os.path.join(root, 'Song (1).mp3'))
+        assert index.reserve(root, 'Song') == 'Song (2)'
+
+        touch(root, 'Other.mp4')
+        assert index.reserve(root, 'Other') == 'Other'  # not seen yet
+        touch(root, 'Late.mp4')
+        index.rescan(root)
+        assert index.reserve(root, 'Late') == 'Late (1)'
+        # Reservations without a file yet survive the rescan
+        assert index.reserve(root, 'Song') == 'Song (3)'
+
+        periodic = OutputIndex(rescan_interval=0)
+        periodic.reserve(root, 'x')
+        touch(root, 'x (1).mp4')
+        assert periodic.reserve(root, 'x') == 'x (2)'
+
+
+if __name__ == "__main__":
+    test_every_extension_counts()
+    test_one_listing_serves_many_reservations()
+    test_concurrent_workers_never_share_a_name()
+    test_external_files_are_picked_up()
+    print("Output index checks passed.")
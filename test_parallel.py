@@ -0,0 +1,58 @@
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer, local_info
+from parallel import ConnectionTuner, as_range_fragments, host_key, split_ranges
+import os
+import tempfile
+
+SIZE = 4 * 1024 * 1024
+CHUNK = 512 * 1024
+PAYLOAD = os.urandom(SIZE)
+
+
+def test_only_large_progressive_formats_on_range_hosts_are_split():
+    fmt = {'url': 'https://rr1---sn-abc.googlevideo.com/videoplayback?id=1', 'protocol': 'https', 'filesize': 25}
+    split = as_range_fragments(fmt, chunk_size=10)
+    assert split['protocol'] == 'http_dash_segments'
+    assert [f['url'].rsplit('&', 1)[1] for f in split['fragments']] == ['range=0-9', 'range=10-19', 'range=20-24']
+
+    assert split_ranges(20, 10) == [(0, 9), (10, 19)]
+    assert 'fragments' not in as_range_fragments(dict(fmt, filesize=None), chunk_size=10)
+    assert 'fragments' not in as_range_fragments(dict(fmt, filesize=5), chunk_size=10)
+    assert 'fragments' not in as_range_fragments(dict(fmt, url='https://example.com/a.mp4'), chunk_size=10)
+    assert host_key('https://rr1---sn-abc.googlevideo.com/x') == 'googlevideo.com'
+
+
+def test_tuner_climbs_while_throughput_improves_then_settles():
+    tuner = ConnectionTuner(initial=4, maximum=16)
+    url = 'https://cdn.example.com/v.mp4'
+    # Simulated link: each connection adds 1 MB/s up to 8 connections
+    for _ in range(6):
+        n = tuner.connections(url)
+        tuner.record(url, n, 8 * 10**6, 8 / min(n, 8))
+    assert tuner.connections(url) == 8
+    assert sorted(tuner.stats()['example.com']) == [4, 8, 16]
+
+
+def test_parallel_range_download_matches_payload():
+    # 1 MiB/s per connection: 4 connections must overlap to finish in time
+    with LocalMediaServer({'/clip.mp4': PAYLOAD}, per_connection_rate=1024 * 1024) as server, \
+            tempfile.TemporaryDirectory() as root:
+        url = server.url('/clip.mp4')
+        dl = YouTubeDownloader(os.path.join(root, 'out'), connections=4, chunk_size=CHUNK,
+                               range_param_hosts=('127.0.0.1',))
+        result = dl.download_video(url, info=local_info(url, size=SIZE, title='Local Clip'))
+
+        assert result.ok, result
+        with open(result.path, 'rb') as f:
+            assert f.read() == PAYLOAD
+        assert server.peak_active >= 2
+        assert sorted(q for q in server.queries if q) == sorted(
+            f"range={s}-{e}" for s, e in split_ranges(SIZE, CHUNK))
+        assert server.bytes_sent == SIZE
+
+
+if __name__ == "__main__":
+    test_only_large_progressive_formats_on_range_hosts_are_split()
+    test_tuner_climbs_while_throughput_improves_then_settles()
+    test_parallel_range_download_matches_payload()
+    print("Parallel download checks passed.")
@@ -0,0 +1,87 @@
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+import os
+import shutil
+import subprocess
+import tempfile
+
+import pytest
+
+VIDEO = os.urandom(1024 * 1024)
+AUDIO = os.urandom(512 * 1024)
+
+
+def split_info(server):
+    # A DASH-style selection: video-only and audio-only formats to merge
+    return {
+        'id': 'clip', 'title': 'Local Clip', 'extractor': 'generic', 'extractor_key': 'Generic',
+        'webpage_url': server.url('/v.mp4'),
+        'formats': [
+            {'format_id': '137', 'url': server.url('/v.mp4'), 'ext': 'mp4', 'filesize': len(VIDEO),
+             'vcodec': 'avc1', 'acodec': 'none', 'height': 1080},
+            {'format_id': '140', 'url': server.url('/a.m4a'), 'ext': 'm4a', 'filesize': len(AUDIO),
+             'vcodec': 'none', 'acodec': 'mp4a'},
+        ],
+    }
+
+
+def test_streams_download_side_by_side_with_separate_progress():
+    with LocalMediaServer({'/v.mp4': VIDEO, '/a.m4a': AUDIO}, per_connection_rate=1024 * 1024) as server, \
+            tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root, connections=1, progress_hz=50)
+        info = split_info(server)
+        formats = dl.component_formats(info, 'bestvideo+bestaudio/best')
+        assert [f['format_id'] for f in formats] == ['137', '140']
+
+        seen = []
+        dl.download_streams(info['webpage_url'], info, formats,
+                            os.path.join(dl.video_path, 'Local Clip.%(ext)s'), seen.append)
+
+        assert server.peak_active == 2  # both streams were on the wire at once
+        with open(os.path.join(dl.video_path, 'Local Clip.f137.mp4'), 'rb') as f:
+            assert f.read() == VIDEO
+        with open(os.path.join(dl.video_path, 'Local Clip.f140.m4a'), 'rb') as f:
+            assert f.read() == AUDIO
+
+        assert set(seen[-1].streams) == {'video', 'audio'}
+        assert seen[-1].fraction == 1.0
+        # Each stream reported on its own while the other was still running
+        assert any(0 < s.streams['audio'].fraction < 1 and 0 < s.streams['video'].fraction < 1 for s in seen)
+
+
+def test_single_file_selection_is_not_split():
+    with LocalMediaServer({'/v.mp4': VIDEO, '/a.m4a': AUDIO}) as server, tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root)
+        assert dl.component_formats(split_info(server), '140') is None
+
+
+def ffmpeg_fixture(root):
+    # Real, mergeable streams: 1 s test pattern (video only) and 1 s tone (audio only)
+    video, audio = os.path.join(root, 'v.mp4'), os.path.join(root, 'a.m4a')
+    subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', 'testsrc=duration=1:size=320x240',
+                    '-an', video], check=True)
+    subprocess.run(['ffmpeg', '-loglevel', 'error', '-f', 'lavfi', '-i', 'sine=duration=1',
+                    '-vn', '-c:a', 'aac', audio], check=True)
+    with open(video, 'rb') as v, open(audio, 'rb') as a:
+        return v.read(), a.read()
+
+
+@pytest.mark.skipif(shutil.which('ffmpeg') is None, reason="merging needs ffmpeg")
+def test_download_video_merges_after_parallel_fetch():
+    with tempfile.TemporaryDirectory() as root:
+        video, audio = ffmpeg_fixture(root)
+        with LocalMediaServer({'/v.mp4': video, '/a.m4a': audio}) as server:
+            info = split_info(server)
+            info['formats'][0]['filesize'], info['formats'][1]['filesize'] = len(video), len(audio)
+            dl = YouTubeDownloader(os.path.join(root, 'out'))
+            result = dl.download_video(server.url('/v.mp4'), info=info)
+
+            assert result.ok, result
+            assert os.path.basename(result.path) == 'Local Clip.mp4'
+            assert {path for _, path, _ in server.requests} >= {'/v.mp4', '/a.m4a'}
+
+
+if __name__ == "__main__":
+    test_streams_download_side_by_side_with_separate_progress()
+    test_single_file_selection_is_not_split()
+    print("Parallel stream checks passed.")
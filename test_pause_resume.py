@@ -0,0 +1,152 @@
+from downloader_logic import YouTubeDownloader
+from job_queue import JobQueue, CANCELLED, DONE, PAUSED, PAUSING, RUNNING
+from local_media_server import LocalMediaServer
+from records import JobStatus
+import json
+import os
+import tempfile
+import time
+
+SIZE = 2 * 1024 * 1024
+PAYLOAD = os.urandom(SIZE)
+
+
+def test_pause_keeps_part_file_and_resumes_from_offset():
+    # ~4 MiB/s so the pause lands mid-stream
+    with LocalMediaServer({'/clip.mp4': PAYLOAD}, per_connection_rate=4 * 1024 * 1024) as server, \
+            tempfile.TemporaryDirectory() as root:
+        url = server.url('/clip.mp4')
+        dl = YouTubeDownloader(os.path.join(root, 'out'), progress_hz=50)
+        seen = []
+
+        def record(snapshot):
+            seen.append(snapshot.fraction)
+
+        def cancel_check():
+            return bool(seen) and seen[-1] >= 0.2
+
+        assert dl.download_video(url, progress_callback=record, cancel_check=cancel_check).status is JobStatus.PAUSED
+        part = os.path.join(dl.video_path, 'clip.mp4.part')
+        assert os.path.exists(part)
+        offset = os.path.getsize(part)
+        assert 0 < offset < SIZE
+
+        gets_before = [r for r in server.requests if r[0] == 'GET']
+
+        result = dl.download_video(url)
+        assert result.ok, result
+        assert result.path == os.path.join(dl.video_path, 'clip.mp4')
+        assert dl.extraction_count == 1  # resume did not extract again
+
+        resumed = [r for r in server.requests if r[0] == 'GET'][len(gets_before):]
+        assert resumed == [('GET', '/clip.mp4', f"bytes={offset}-")]
+        with open(os.path.join(dl.video_path, 'clip.mp4'), 'rb') as f:
+            assert f.read() == PAYLOAD
+        # First leg stopped near the pause point, second leg fetched only the rest
+        assert server.bytes_sent < SIZE + 512 * 1024
+
+
+def wait_until(predicate, timeout=10):
+    deadline = time.time() + timeout
+    while time.time() < deadline and not predicate():
+        time.sleep(0.01)
+    assert predicate()
+
+
+def test_restarted_queue_resumes_the_part_file_under_the_same_name():
+    with LocalMediaServer({'/clip.mp4': PAYLOAD}, per_connection_rate=2 * 1024 * 1024) as server, \
+            tempfile.TemporaryDirectory() as root:
+        url = server.url('/clip.mp4')
+        out, state = os.path.join(root, 'out'), os.path.join(root, 'jobs.json')
+        dl = YouTubeDownloader(out, progress_hz=50)
+        queue = JobQueue(dl, workers=1, state_path=state)
+        job_id = queue.submit('video', url)
+        queue.start()
+
+        part = os.path.join(dl.video_path, 'clip.mp4.part')
+        wait_until(lambda: os.path.exists(part) and os.path.getsize(part) > 256 * 1024)
+        with open(state, encoding='utf-8') as f:
+            crashed = f.read()  # the state file as a crash right now would leave it
+        assert json.loads(crashed)[0]['resume']['outtmpl'].endswith('clip.%(ext)s')
+        queue.pause(job_id)
+        wait_until(lambda: queue.get(job_id).result is not None)
+        queue.stop()
+        with open(state, 'w', encoding='utf-8') as f:
+            f.write(crashed)
+        offset = os.path.getsize(part)
+        gets_before = [r for r in server.requests if r[0] == 'GET']
+
+        # A fresh process: new downloader and output index, the job was RUNNING
+        restarted = JobQueue(YouTubeDownloader(out, progress_hz=50), workers=1, state_path=state)
+        assert restarted.get(job_id).state not in (RUNNING, PAUSED)
+        restarted.start()
+        wait_until(lambda: restarted.get(job_id).state == DONE, timeout=20)
+        restarted.stop()
+
+        result = restarted.get(job_id).result
+        assert result.path == os.path.join(dl.video_path, 'clip.mp4'), result
+        assert sorted(os.listdir(dl.video_path)) == ['clip.mp4']
+        resumed = [r for r in server.requests if r[0] == 'GET'][len(gets_before):]
+        assert resumed[-1] == ('GET', '/clip.mp4', f"bytes={offset}-")
+        with open(result.path, 'rb') as f:
+            assert f.read() == PAYLOAD
+
+
+def test_resume_while_pausing_never_runs_two_downloads():
+    with LocalMediaServer({'/clip.mp4': PAYLOAD}, per_connection_rate=4 * 1024 * 1024) as server, \
+            tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(os.path.join(root, 'out'), connections=1, progress_hz=50)
+        queue = JobQueue(dl, workers=2)
+        job_id = queue.submit('video', server.url('/clip.mp4'))
+        queue.start()
+        wait_until(lambda: queue.get(job_id).progress > 0.1)
+        queue.pause(job_id)
+        assert queue.get(job_id).state == PAUSING
+        queue.resume(job_id)  # before the download noticed the pause
+        wait_until(lambda: queue.get(job_id).state == DONE, timeout=20)
+        queue.stop()
+
+        assert server.peak_active == 1
+        with open(queue.get(job_id).result.path, 'rb') as f:
+            assert f.read() == PAYLOAD
+        assert os.listdir(dl.video_path) == ['clip.mp4']
+
+
+def test_paused_job_survives_a_restart_and_cancel_deletes_its_part():
+    files = {'/a.mp4': PAYLOAD, '/b.mp4': PAYLOAD}
+    with LocalMediaServer(files, per_connection_rate=4 * 1024 * 1024) as server, \
+            tempfile.TemporaryDirectory() as root:
+        out, state = os.path.join(root, 'out'), os.path.join(root, 'jobs.json')
+        dl = YouTubeDownloader(out, connections=1, progress_hz=50)
+        queue = JobQueue(dl, workers=2, state_path=state)
+        ids = [queue.submit('video', server.url(path)) for path in files]
+        queue.start()
+        wait_until(lambda: all(queue.get(j).progress > 0.1 for j in ids))
+        for j in ids:
+            queue.pause(j)
+        wait_until(lambda: all(queue.get(j).state == PAUSED for j in ids))
+        queue.stop()
+        assert sorted(os.listdir(dl.video_path)) == ['a.mp4.part', 'b.mp4.part']
+        offset = os.path.getsize(os.path.join(dl.video_path, 'a.mp4.part'))
+        gets_before = [r for r in server.requests if r[0] == 'GET']
+
+        restarted = JobQueue(YouTubeDownloader(out, connections=1), workers=1, state_path=state)
+        keep, drop = ids
+        assert restarted.cancel(drop) and restarted.get(drop).state == CANCELLED
+        assert not restarted.get(drop).resume
+        restarted.start()
+        restarted.resume(keep)
+        wait_until(lambda: restarted.get(keep).state == DONE, timeout=20)
+        restarted.stop()
+
+        assert sorted(os.listdir(dl.video_path)) == ['a.mp4']
+        resumed = [r for r in server.requests if r[0] == 'GET'][len(gets_before):]
+        assert resumed[-1] == ('GET', '/a.mp4', f"bytes={offset}-")
+
+
+if __name__ == "__main__":
+    test_pause_keeps_part_file_and_resumes_from_offset()
+    test_restarted_queue_resumes_the_part_file_under_the_same_name()
+    test_resume_while_pausing_never_runs_two_downloads()
+    test_paused_job_survives_a_restart_and_cancel_deletes_its_part()
+    print("Pause/resume checks passed.")
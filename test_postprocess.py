@@ -0,0 +1,126 @@
+from downloader_logic import YouTubeDownloader
+from job_queue import JobQueue, DONE
+from local_media_server import LocalMediaServer, audio_info, registered_pass
+from postprocess import PostProcessor, download_options
+import os
+import tempfile
+import threading
+import time
+
+AUDIO = os.urandom(256 * 1024)
+
+
+class Tag:
+    """
+    A pure-Python pass: renames the file to <name>.<suffix>.<ext>, optionally
+    waiting on gate first so tests can hold the post-processing stage busy.
+    """
+    gate = None
+
+    def __init__(self, ydl, suffix='tagged'):
+        self.suffix = suffix
+
+    def run(self, info):
+        if Tag.gate is not None:
+            Tag.gate.wait(10)
+        root, ext = os.path.splitext(info['filepath'])
+        path = f"{root}.{self.suffix}{ext}"
+        os.replace(info['filepath'], path)
+        return [], dict(info, filepath=path)
+
+
+def tag_pass():
+    return registered_pass('tag', Tag, {'writedescription': False})
+
+
+def test_passes_run_in_order_and_are_timed():
+    with tag_pass(), tempfile.TemporaryDirectory() as root:
+        path = os.path.join(root, 'song.m4a')
+        with open(path, 'wb') as f:
+            f.write(b'x')
+        pp = PostProcessor(workers=1)
+        final = pp.run(path, {'id': 'song'}, ['tag', ('tag', {'suffix': 'twice'})])
+        again = pp.run(final, {'id': 'song'}, [('tag', {'suffix': 'more'})])
+        pp.shutdown()
+
+        assert final == os.path.join(root, 'song.tagged.twice.m4a')
+        assert again == os.path.join(root, 'song.tagged.twice.more.m4a') and os.path.exists(again)
+        stats = pp.stats()
+        assert stats['completed'] == 2 and stats['failed'] == 0
+        assert stats['passes']['tag']['count'] == 3
+        # The second job ran on the first job's YoutubeDL
+        assert pp.ydl_pool.stats()['created'] == 1 and pp.ydl_pool.stats()['reused'] == 1
+
+
+def test_queue_depth_is_bounded_by_workers():
+    with tag_pass(), tempfile.TemporaryDirectory() as root:
+        Tag.gate = threading.Event()
+        try:
+            pp = PostProcessor(workers=1)
+            futures = []
+            for i in range(3):
+                path = os.path.join(root, f"{i}.m4a")
+                open(path, 'wb').close()
+                futures.append(pp.submit(path, {'id': str(i)}, ['tag']))
+            time.sleep(0.1)
+            assert pp.stats()['running'] == 1 and pp.stats()['queued'] == 2
+        finally:
+            Tag.gate.set()
+            Tag.gate = None
+        assert all(os.path.exists(f.result()) for f in futures)
+        assert pp.stats()['queued'] == 0 and pp.stats()['completed'] == 3
+        pp.shutdown()
+
+
+def test_download_options_merge():
+    with tag_pass():
+        opts = download_options(['embed_thumbnail', 'tag', 'extract_audio'])
+    assert opts['writethumbnail'] is True and opts['writedescription'] is False
+    assert [p['key'] for p in opts['postprocessors']] == ['FFmpegThumbnailsConvertor']
+
+
+def test_download_slot_is_free_while_post_processing():
+    files = {'/a.m4a': AUDIO, '/b.m4a': AUDIO}
+    with tag_pass(), LocalMediaServer(files) as server, tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root, connections=1)
+        queue = JobQueue(dl, workers=1, limits={'download': 1})
+        Tag.gate = threading.Event()
+        try:
+            first = queue.submit('audio', server.url('/a.m4a'), info=audio_info(server, 'a', len(AUDIO)),
+                                 passes=['tag'])
+            second = queue.submit('audio', server.url('/b.m4a'), info=audio_info(server, 'b', len(AUDIO)),
+                                  passes=['tag'])
+            queue.start()
+
+            # The single worker fetched both files while the first pass is still held
+            deadline = time.time() + 10
+            while time.time() < deadline and not (
+                    os.path.exists(os.path.join(dl.audio_path, 'Track b.m4a'))
+                    and queue.stats()['stages']['download']['entered'] == 2
+                    and queue.stats()['stages']['download']['active'] == 0):
+                time.sleep(0.01)
+            assert {path for _, path, _ in server.requests} == set(files)
+            assert queue.get(first).state is not DONE
+            assert queue.stats()['postprocess']['running'] == 1
+        finally:
+            Tag.gate.set()
+            Tag.gate = None
+
+        deadline = time.time() + 10
+        while time.time() < deadline and {queue.get(j).state for j in (first, second)} != {DONE}:
+            time.sleep(0.01)
+        queue.stop()
+
+        result = queue.get(first).result
+        assert result.ok and result.path.endswith('Track a.tagged.m4a') and result.ext == 'm4a'
+        with open(result.path, 'rb') as f:
+            assert f.read() == AUDIO
+        assert queue.stats()['postprocess']['passes']['tag']['count'] == 2
+
+
+if __name__ == "__main__":
+    test_passes_run_in_order_and_are_timed()
+    test_queue_depth_is_bounded_by_workers()
+    test_download_options_merge()
+    test_download_slot_is_free_while_post_processing()
+    print("Post-processing checks passed.")
@@ -0,0 +1,93 @@
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+from profiles import CodecReport, codec_family, get_profile
+from tools import FFmpegCapabilities
+import os
+import tempfile
+
+import pytest
+import yt_dlp
+
+AUDIO = os.urandom(128 * 1024)
+
+
+def info_with_codecs(url='http://127.0.0.1/x'):
+    # Same resolution in VP9 and H.264, audio in Opus, AAC and MP3
+    return {
+        'id': 'codecs', 'title': 'Codecs', 'extractor': 'generic', 'extractor_key': 'Generic', 'webpage_url': url,
+        'formats': [
+            {'format_id': '137', 'url': url, 'ext': 'mp4', 'vcodec': 'avc1.640028', 'acodec': 'none',
+             'height': 1080, 'tbr': 2500},
+            {'format_id': '248', 'url': url, 'ext': 'webm', 'vcodec': 'vp9', 'acodec': 'none',
+             'height': 1080, 'tbr': 3000},
+            {'format_id': '140', 'url': url, 'ext': 'm4a', 'vcodec': 'none', 'acodec': 'mp4a.40.2', 'abr': 128},
+            {'format_id': '251', 'url': url, 'ext': 'webm', 'vcodec': 'none', 'acodec': 'opus', 'abr': 160},
+            {'format_id': '900', 'url': url, 'ext': 'mp3', 'vcodec': 'none', 'acodec': 'mp3', 'abr': 96},
+        ],
+    }
+
+
+def resolve(profile, spec, *extra_formats):
+    info = info_with_codecs()
+    info['formats'] += [dict(f, url=info['webpage_url']) for f in extra_formats]
+    with yt_dlp.YoutubeDL({'quiet': True, 'no_warnings': True, 'format': spec, **profile.ydl_options()}) as ydl:
+        resolved = ydl.process_ie_result(ydl.sanitize_info(info, True), download=False)
+    return resolved.get('format_id'), resolved.get('ext')
+
+
+def test_profiles_pick_streams_that_copy_into_the_target():
+    remux = get_profile('remux')
+    assert resolve(remux, remux.video_selector()) == ('137+140', 'mp4')
+    assert resolve(remux, remux.video_selector('248')) == ('248+140', 'mp4')
+
+    original = get_profile('original')
+    assert resolve(original, original.video_selector()) == ('248+251', 'webm')
+
+    mp3 = get_profile('mp3', 'audio')
+    # A 96k mp3 is not worth keeping over 160k opus; a 192k one is copied as-is
+    assert resolve(mp3, mp3.audio_format)[0] == '251'
+    assert resolve(mp3, mp3.audio_format, {'format_id': '901', 'ext': 'mp3', 'vcodec': 'none',
+                                           'acodec': 'mp3', 'abr': 192})[0] == '901'
+    assert get_profile(None, 'audio') is mp3 and get_profile(None, 'video').name == 'mp4'
+    with pytest.raises(ValueError):
+        get_profile('flac')
+
+
+def test_copy_versus_transcode():
+    mp3 = get_profile('mp3')
+    passes = mp3.audio_passes(FFmpegCapabilities('/usr/bin/ffmpeg', encoders=['libmp3lame']))
+    assert passes and not mp3.audio_passes(FFmpegCapabilities('/usr/bin/ffmpeg', encoders=['aac']))
+    assert not mp3.transcodes({'acodec': 'mp3'}, passes)
+    assert mp3.transcodes({'acodec': 'opus'}, passes)
+    assert not get_profile('original').transcodes({'acodec': 'opus'}, [])
+    assert get_profile('original').transcodes({'acodec': 'opus'}, ['loudnorm'])
+    assert codec_family('mp4a.40.2') == 'aac'
+
+    report = CodecReport()
+    report.record('mp3', True)
+    report.record('original', False)
+    report.record('original', False)
+    assert report.stats()['original'] == {'copy': 2, 'transcode': 0}
+    assert report.summary() == "stream copy: 2, transcoded: 1"
+
+
+def test_original_audio_is_kept_and_counted_as_copy():
+    with LocalMediaServer({'/a.m4a': AUDIO}) as server, tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root, connections=1)
+        info = {'id': 'song', 'title': 'Song', 'extractor': 'generic', 'extractor_key': 'Generic',
+                'webpage_url': server.url('/a.m4a'),
+                'formats': [{'format_id': '140', 'url': server.url('/a.m4a'), 'ext': 'm4a',
+                             'filesize': len(AUDIO), 'vcodec': 'none', 'acodec': 'mp4a.40.2'}]}
+        result = dl.download_audio(info['webpage_url'], info=info, profile='original')
+
+        assert result.ok and result.path.endswith('Song.m4a')
+        assert result.profile == 'original' and result.transcoded is False
+        assert result.describe() == "Audio Download Complete (.m4a)"
+        assert dl.codec_report.stats() == {'original': {'copy': 1, 'transcode': 0}}
+
+
+if __name__ == "__main__":
+    test_profiles_pick_streams_that_copy_into_the_target()
+    test_copy_versus_transcode()
+    test_original_audio_is_kept_and_counted_as_copy()
+    print("Output profile checks passed.")
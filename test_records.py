@@ -0,0 +1,62 @@
+from job_queue import Job, JobQueue, DONE, PAUSED
+from records import DownloadResult, JobStatus, Phase, ProgressSnapshot
+import json
+import os
+import tempfile
+from types import SimpleNamespace
+
+
+def test_snapshot_is_numeric_and_formats_at_the_edge():
+    snap = ProgressSnapshot.from_hook({'status': 'downloading', 'downloaded_bytes': 512,
+                                       'total_bytes': 2048, 'speed': 1024.0, 'eta': 65})
+    assert snap.fraction == 0.25
+    assert snap.describe() == "[download] 25.0% of 2.00KiB at 1.00KiB/s ETA 01:05"
+    assert ProgressSnapshot(phase=Phase.CONVERTING).fraction == 1.0
+    assert ProgressSnapshot(phase=Phase.CONVERTING).describe() == "转换中..."
+
+
+def test_results_keep_their_localized_text():
+    assert DownloadResult.done('video').describe() == "视频下载完成"
+    assert DownloadResult.paused('audio').describe() == "已暂停"
+    assert DownloadResult.failed('video', "boom").describe() == "错误: boom"
+    assert DownloadResult.failed('audio', "boom").describe() == "Error: boom"
+    assert str(DownloadResult.done('audio', '/a/b.mp3', 'mp3', converted=True)) == "Audio Download Complete (MP3)"
+    assert DownloadResult.done('thumbnail', '/a/x_thumbnail.jpg').describe() == "封面已下载: x_thumbnail.jpg"
+
+
+def test_records_use_slots():
+    for record in (Job('video', 'u'), ProgressSnapshot(), DownloadResult.done('video')):
+        assert not hasattr(record, '__dict__')
+
+
+def test_job_round_trips_through_json():
+    job = Job('audio', 'https://youtu.be/aaaaaaaaaaa', priority=2)
+    job.state = DONE
+    job.snapshot = ProgressSnapshot(10, 20, 5.0, 2)
+    job.result = DownloadResult.done('audio', '/tmp/a.mp3', 'mp3', converted=True)
+
+    restored = Job.from_dict(json.loads(json.dumps(job.to_dict())))
+    assert restored.state is JobStatus.DONE
+    assert restored.snapshot.fraction == 0.5
+    assert restored.result.ok and restored.result.path == '/tmp/a.mp3'
+
+
+def test_loads_state_files_with_string_results():
+    with tempfile.TemporaryDirectory() as root:
+        state = os.path.join(root, 'jobs.json')
+        with open(state, 'w', encoding='utf-8') as f:
+            json.dump([{'job_id': 'abc123', 'kind': 'video', 'url': 'u', 'priority': 0, 'options': {},
+                        'state': 'paused', 'progress': 0.4, 'message': '[download] 40%',
+                        'result': '已暂停', 'created': 0}], f)
+        queue = JobQueue(SimpleNamespace(), state_path=state)
+        job = queue.get('abc123')
+        assert job.state is PAUSED and job.result is None and job.progress == 0.4
+
+
+if __name__ == "__main__":
+    test_snapshot_is_numeric_and_formats_at_the_edge()
+    test_results_keep_their_localized_text()
+    test_records_use_slots()
+    test_job_round_trips_through_json()
+    test_loads_state_files_with_string_results()
+    print("Record checks passed.")
@@ -0,0 +1,60 @@
+from downloader_logic import YouTubeDownloader
+from local_media_server import local_info
+import functools
+import http.server
+import os
+import tempfile
+import threading
+
+PAYLOAD = os.urandom(64 * 1024)
+
+
+def serve_payload(directory):
+    with open(os.path.join(directory, 'clip.mp4'), 'wb') as f:
+        f.write(PAYLOAD)
+    handler = functools.partial(http.server.SimpleHTTPRequestHandler, directory=directory)
+    handler.log_message = lambda *args: None
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}/clip.mp4"
+
+
+def test_download_with_info_runs_no_extraction():
+    with tempfile.TemporaryDirectory() as root:
+        server, media_url = serve_payload(root)
+        try:
+            traced = []
+            dl = YouTubeDownloader(os.path.join(root, 'out'), on_extract=traced.append)
+
+            result = dl.download_video(media_url, info=local_info(media_url, title='Local Clip'))
+            assert result.ok, result
+            assert dl.extraction_count == 0 and traced == []
+
+            result = dl.download_audio(media_url, info=local_info(media_url, title='Local Clip'))
+            assert result.ok, result
+            assert dl.extraction_count == 0
+
+            with open(os.path.join(dl.video_path, 'Local Clip.mp4'), 'rb') as f:
+                assert f.read() == PAYLOAD
+        finally:
+            server.shutdown()
+
+
+def test_download_without_info_extracts_once():
+    with tempfile.TemporaryDirectory() as root:
+        server, media_url = serve_payload(root)
+        try:
+            traced = []
+            dl = YouTubeDownloader(os.path.join(root, 'out'), on_extract=traced.append)
+            result = dl.download_video(media_url)
+            assert result.ok, result
+            assert dl.extraction_count == 1
+            assert traced == [media_url]
+        finally:
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    test_download_with_info_runs_no_extraction()
+    test_download_without_info_extracts_once()
+    print("Single extraction checks passed.")
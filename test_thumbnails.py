@@ -0,0 +1,95 @@
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+from records import JobStatus
+from thumbnails import ThumbnailCache
+from transport import HTTPClient
+import importlib.util
+import os
+import tempfile
+import time
+
+import pytest
+
+JPEG = b'\xff\xd8\xff\xe0' + os.urandom(20 * 1024)
+
+
+def _info(server, video_id='thumb1', path='/vi/thumb1/maxresdefault.jpg'):
+    return {'id': video_id, 'title': 'Clip', 'extractor': 'youtube', 'extractor_key': 'Youtube',
+            'webpage_url': server.url(f'/watch/{video_id}'), 'thumbnail': server.url(path)}
+
+
+def test_client_reuses_keep_alive_connections():
+    with LocalMediaServer({'/a': b'x' * 1000, '/b': b'y' * 10}) as server:
+        client = HTTPClient(timeout=5)
+        for _ in range(5):
+            assert client.get(server.url('/a')) == b'x' * 1000
+            assert client.get(server.url('/b')) == b'y' * 10
+        assert client.connections_opened == 1 and server.connections == 1
+        client.close()
+
+
+def test_analyze_then_save_costs_one_fetch():
+    with LocalMediaServer({'/vi/thumb1/maxresdefault.jpg': JPEG}, content_type='image/jpeg') as server, \
+            tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root, thumbnails=ThumbnailCache(os.path.join(root, 'cache')))
+        info = _info(server)
+
+        assert dl.thumbnails.fetch(info) == JPEG   # what analyze shows
+        result = dl.download_thumbnail(info['webpage_url'], info=info)
+        assert result.status is JobStatus.DONE and result.path.endswith('Clip_thumbnail.jpg')
+        with open(result.path, 'rb') as f:
+            assert f.read() == JPEG
+        assert len(server.requests) == 1 and dl.extraction_count == 0
+
+        # A fresh cache on the same folder (next start) reads it from disk
+        again = ThumbnailCache(os.path.join(root, 'cache'))
+        assert again.fetch(info) == JPEG and again.fetches == 0 and len(server.requests) == 1
+
+
+def test_disk_cache_drops_least_recently_used_files():
+    files = {f'/vi/{v}/maxresdefault.jpg': JPEG for v in 'abc'}
+    with LocalMediaServer(files, content_type='image/jpeg') as server, tempfile.TemporaryDirectory() as root:
+        folder = os.path.join(root, 'cache')
+
+        def fetch(video_id):
+            # A fresh cache every time, so each fetch goes to disk or the server;
+            # spaced out past the filesystem's timestamp granularity
+            time.sleep(0.05)
+            cache = ThumbnailCache(folder, max_disk_bytes=int(2.5 * len(JPEG)))
+            return cache.fetch(_info(server, video_id, f'/vi/{video_id}/maxresdefault.jpg'))
+
+        fetch('a'), fetch('b')
+        assert fetch('a') == JPEG and len(server.requests) == 2  # from disk, now the newest
+        fetch('c')
+        assert sorted(os.listdir(folder)) == ['youtube-a.jpg', 'youtube-c.jpg']
+
+
+def test_missing_thumbnail_fails_cleanly():
+    with LocalMediaServer({}) as server, tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root, thumbnails=ThumbnailCache(None))
+        info = _info(server, path='/missing.jpg')
+        result = dl.download_thumbnail(info['webpage_url'], info=info)
+        assert result.status is JobStatus.FAILED
+
+
+@pytest.mark.skipif(importlib.util.find_spec('PIL') is None, reason="needs Pillow")
+def test_previews_are_scaled_once():
+    from io import BytesIO
+    from PIL import Image
+    buf = BytesIO()
+    Image.new('RGB', (1280, 720), 'red').save(buf, 'JPEG')
+    with LocalMediaServer({'/vi/thumb1/maxresdefault.jpg': buf.getvalue()}) as server:
+        cache = ThumbnailCache(None)
+        preview = cache.preview(_info(server))
+        assert preview.size == (320, 180) and cache.preview(_info(server)) is preview
+        assert len(server.requests) == 1
+
+
+if __name__ == "__main__":
+    test_client_reuses_keep_alive_connections()
+    test_analyze_then_save_costs_one_fetch()
+    test_disk_cache_drops_least_recently_used_files()
+    test_missing_thumbnail_fails_cleanly()
+    if importlib.util.find_spec('PIL'):
+        test_previews_are_scaled_once()
+    print("Thumbnail checks passed.")
@@ -0,0 +1,96 @@
+import tools
+from tools import FFmpegCapabilities
+import os
+import stat
+import sys
+import tempfile
+from contextlib import contextmanager
+
+import pytest
+
+pytestmark = pytest.mark.skipif(sys.platform == 'win32', reason="fake ffmpeg is a shell script")
+
+FAKE_FFMPEG = """#!/bin/sh
+echo run >> "$(dirname "$0")/calls"
+case "$2" in
+  -version) echo "ffmpeg version 7.1-test Copyright (c) 2000-2024 the FFmpeg developers" ;;
+  -encoders) printf 'Encoders:\\n V..... = Video\\n ------\\n V....D libx264 H.264\\n A....D aac AAC\\n A....D libmp3lame MP3\\n' ;;
+  -hwaccels) printf 'Hardware acceleration methods:\\nvaapi\\ncuda\\n\\n' ;;
+esac
+"""
+
+
+def fake_tool(folder, name, body=FAKE_FFMPEG):
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, name)
+    with open(path, 'w') as f:
+        f.write(body)
+    os.chmod(path, os.stat(path).st_mode | stat.S_IEXEC)
+    return path
+
+
+@contextmanager
+def environment(cwd=None, **env):
+    saved_env, saved_cwd = dict(os.environ), os.getcwd()
+    for key, value in env.items():
+        if value is None:
+            os.environ.pop(key, None)
+        else:
+            os.environ[key] = value
+    if cwd:
+        os.chdir(cwd)
+    try:
+        yield
+    finally:
+        os.chdir(saved_cwd)
+        os.environ.clear()
+        os.environ.update(saved_env)
+
+
+def calls(folder):
+    try:
+        with open(os.path.join(folder, 'calls')) as f:
+            return len(f.readlines())
+    except OSError:
+        return 0
+
+
+def test_registered_ffmpeg_is_probed_once_and_cached():
+    with tempfile.TemporaryDirectory() as root, \
+            environment(root, PATH=os.path.join(root, 'empty'), FFMPEG_LOCATION=None):
+        state = os.path.join(root, 'state')
+        assert not tools.probe(tools_dir=state).available
+
+        bin_dir = os.path.join(root, 'bin')
+        tools.register('ffmpeg', fake_tool(bin_dir, 'ffmpeg'), tools_dir=state)
+        fake_tool(bin_dir, 'ffprobe', "#!/bin/sh\n")
+
+        caps = tools.probe(tools_dir=state)
+        assert caps.ffmpeg == os.path.join(bin_dir, 'ffmpeg') and caps.location == bin_dir
+        assert caps.ffprobe == os.path.join(bin_dir, 'ffprobe')
+        assert caps.version == '7.1-test'
+        assert caps.encoders == {'libx264', 'aac', 'libmp3lame'}
+        assert caps.hwaccels == ('vaapi', 'cuda')
+        assert caps.can_encode('mp3') and caps.can_encode('aac') and not caps.can_encode('opus')
+
+        probes = calls(bin_dir)
+        for _ in range(5):
+            assert tools.probe(tools_dir=state) is caps
+        assert calls(bin_dir) == probes
+        assert tools.probe(refresh=True, tools_dir=state) is not caps
+
+
+def test_ffmpeg_location_overrides_and_unknown_encoders_are_trusted():
+    with tempfile.TemporaryDirectory() as root:
+        silent = fake_tool(os.path.join(root, 'custom'), 'ffmpeg', "#!/bin/sh\n")
+        with environment(FFMPEG_LOCATION=silent):
+            caps = tools.probe(tools_dir=os.path.join(root, 'state'))
+        assert caps.ffmpeg == silent and caps.version is None
+        assert caps.can_encode('mp3')
+    assert not FFmpegCapabilities().can_encode('mp3')
+
+
+if __name__ == "__main__":
+    test_registered_ffmpeg_is_probed_once_and_cached()
+    test_ffmpeg_location_overrides_and_unknown_encoders_are_trusted()
+    print("Tool probe checks passed.")
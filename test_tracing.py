@@ -0,0 +1,63 @@
+from downloader_logic import YouTubeDownloader
+from job_queue import JobQueue, FINISHED_STATES
+from local_media_server import LocalMediaServer, audio_info, registered_pass
+from tracing import NULL_TRACER, Tracer
+import json
+import os
+import tempfile
+import time
+
+SIZE = 1024 * 1024
+CHUNK = 256 * 1024
+
+
+def test_disabled_tracer_records_nothing():
+    callback = print
+    assert NULL_TRACER.wrap(callback, 'progress') is callback
+    with NULL_TRACER.span('extract_info'):
+        pass
+    with tempfile.TemporaryDirectory() as root:
+        assert YouTubeDownloader(root).tracer is NULL_TRACER
+
+
+def test_trace_covers_jobs_downloads_fragments_and_passes():
+    files = {'/a.m4a': os.urandom(SIZE), '/b.m4a': os.urandom(SIZE)}
+    with registered_pass('noop'), LocalMediaServer(files) as server, tempfile.TemporaryDirectory() as root:
+        tracer = Tracer()
+        dl = YouTubeDownloader(os.path.join(root, 'out'), connections=4, chunk_size=CHUNK,
+                               range_param_hosts=('127.0.0.1',), progress_hz=50, tracer=tracer)
+        queue = JobQueue(dl, workers=2)
+        ids = [queue.submit('audio', server.url(f'/{v}.m4a'), info=audio_info(server, v, SIZE), passes=['noop'])
+               for v in 'ab']
+        queue.start()
+        deadline = time.time() + 20
+        while time.time() < deadline and not all(queue.get(j).state in FINISHED_STATES for j in ids):
+            time.sleep(0.01)
+        queue.stop()
+        assert all(queue.get(j).result.ok for j in ids)
+
+        path = os.path.join(root, 'trace.json')
+        tracer.write(path)
+        with open(path, encoding='utf-8') as f:
+            events = json.load(f)['traceEvents']
+
+    def named(name, ph='X'):
+        return [e for e in events if e['name'] == name and e['ph'] == ph]
+
+    threads = {e['tid']: e['args']['name'] for e in named('thread_name', 'M')}
+    downloads, fragments = named('download'), named('fragment')
+    assert len(downloads) == 2 and len(named('noop')) == 2 and named('progress')
+    assert len(named('audio job', 'b')) == len(named('audio job', 'e')) == 2
+    # Every fragment ran on a pool thread inside one of the downloads
+    assert sum(e['args']['bytes'] for e in fragments) == 2 * SIZE
+    assert len(fragments) >= 2 * SIZE // CHUNK
+    for frag in fragments:
+        assert frag['tid'] in threads and frag['tid'] not in {d['tid'] for d in downloads}
+        assert any(d['ts'] <= frag['ts'] and frag['ts'] + frag['dur'] <= d['ts'] + d['dur'] + 1
+                   for d in downloads)
+
+
+if __name__ == "__main__":
+    test_disabled_tracer_records_nothing()
+    test_trace_covers_jobs_downloads_fragments_and_passes()
+    print("Tracing checks passed.")
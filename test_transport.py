@@ -0,0 +1,97 @@
+from local_media_server import LocalMediaServer
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from transport import MAX_REDIRECTS, HTTPClient, HTTPError
+import os
+import tempfile
+import threading
+import time
+
+import pytest
+
+PAYLOAD = os.urandom(300 * 1024)
+
+
+def test_download_streams_to_file_and_counts_per_host():
+    with LocalMediaServer({'/ffmpeg.tar.xz': PAYLOAD}) as server, tempfile.TemporaryDirectory() as root:
+        client = HTTPClient(timeout=5)
+        seen = []
+        path = os.path.join(root, 'ffmpeg.tar.xz')
+        assert client.download(server.url('/ffmpeg.tar.xz'), path, lambda done, total: seen.append(total)) == len(PAYLOAD)
+        with open(path, 'rb') as f:
+            assert f.read() == PAYLOAD
+        assert seen and seen[-1] == len(PAYLOAD) and not os.path.exists(path + '.part')
+
+        client.get(server.url('/ffmpeg.tar.xz'))
+        stats = client.stats()['127.0.0.1']
+        assert stats['requests'] == 2 and stats['opened'] == 1 and stats['reused'] == 1
+        assert stats['bytes'] == 2 * len(PAYLOAD) and stats['retries'] == 0
+
+
+def test_throttled_answers_are_retried_with_backoff():
+    with LocalMediaServer({'/a': b'ok'}, error_rate=1.0, error_status=429) as server:
+        client = HTTPClient(timeout=5, retries=2, backoff=0.01)
+        with pytest.raises(HTTPError) as e:
+            client.get(server.url('/a'))
+        assert e.value.status == 429 and len(server.requests) == 3
+        assert client.stats()['127.0.0.1']['retries'] == 2
+
+        server.error_rate = 0.0
+        assert client.get(server.url('/a')) == b'ok'
+
+
+class _RedirectLoop(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        body = b'moved'
+        self.send_response(302)
+        self.send_header('Location', '/loop')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_redirect_loop_fails_without_leaking_the_connection():
+    httpd = ThreadingHTTPServer(('127.0.0.1', 0), _RedirectLoop)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    url = f"http://127.0.0.1:{httpd.server_address[1]}/start"
+    try:
+        client = HTTPClient(timeout=5)
+        for _ in range(2):
+            with pytest.raises(HTTPError) as e:
+                client.get(url)
+            assert e.value.status == 302
+        # Every redirect, the last one included, handed the connection back
+        stats = client.stats()['127.0.0.1']
+        assert stats['requests'] == 2 * (MAX_REDIRECTS + 1) and stats['opened'] == 1
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
+
+
+def test_rate_limit_spaces_requests_per_host():
+    with LocalMediaServer({'/a': b'x'}) as server:
+        client = HTTPClient(timeout=5, rate_limit=20)
+        start = time.monotonic()
+        for _ in range(5):
+            client.get(server.url('/a'))
+        assert time.monotonic() - start >= 4 / 20 - 0.01
+
+
+def test_ydl_options_carry_the_transport_settings():
+    assert HTTPClient(timeout=7).ydl_options() == {'socket_timeout': 7}
+    opts = HTTPClient(retries=5, proxy='http://127.0.0.1:3128', rate_limit=2).ydl_options()
+    assert opts['retries'] == 5 and opts['proxy'] == 'http://127.0.0.1:3128'
+    assert opts['sleep_interval_requests'] == 0.5
+
+
+if __name__ == "__main__":
+    test_download_streams_to_file_and_counts_per_host()
+    test_throttled_answers_are_retried_with_backoff()
+    test_redirect_loop_fails_without_leaking_the_connection()
+    test_rate_limit_spaces_requests_per_host()
+    test_ydl_options_carry_the_transport_settings()
+    print("Transport checks passed.")
@@ -0,0 +1,68 @@
+from downloader_logic import YouTubeDownloader
+from local_media_server import LocalMediaServer
+from records import JobStatus
+from ydl_pool import PP_INTERNALS, YDL_INTERNALS, YDLPool, profile_key
+import os
+import tempfile
+
+AUDIO = os.urandom(32 * 1024)
+FORMATS = [{'format_id': '18', 'url': 'http://127.0.0.1/18.mp4', 'ext': 'mp4', 'height': 360,
+            'vcodec': 'avc1', 'acodec': 'mp4a.40.2'},
+           {'format_id': '22', 'url': 'http://127.0.0.1/22.mp4', 'ext': 'mp4', 'height': 720,
+            'vcodec': 'avc1', 'acodec': 'mp4a.40.2'}]
+
+
+def test_installed_yt_dlp_has_the_internals_the_pool_resets():
+    from yt_dlp.postprocessor.common import PostProcessor
+
+    with YDLPool().borrow({'quiet': True}) as ydl:
+        assert [name for name in YDL_INTERNALS if not hasattr(ydl, name)] == []
+        assert [name for name in PP_INTERNALS if not hasattr(PostProcessor(ydl), name)] == []
+
+
+def test_job_options_are_swapped_on_a_reused_instance():
+    pool = YDLPool()
+    info = {'id': 'x', 'title': 'X', 'extractor': 'generic', 'webpage_url': 'http://127.0.0.1/x', 'formats': FORMATS}
+    calls = []
+    with pool.borrow({'quiet': True, 'format': '18', 'outtmpl': '/a/%(title)s.%(ext)s',
+                      'progress_hooks': [calls.append]}) as ydl:
+        first = ydl
+        assert ydl.process_ie_result(dict(info), download=False)['format_id'] == '18'
+        assert ydl.prepare_filename(info).startswith('/a/')
+    with pool.borrow({'quiet': True, 'format': 'best', 'outtmpl': '/b/%(title)s.%(ext)s'}) as ydl:
+        assert ydl is first and ydl._progress_hooks == []
+        assert ydl.process_ie_result(dict(info), download=False)['format_id'] == '22'
+        assert ydl.prepare_filename(info).startswith('/b/')
+    assert pool.stats()['created'] == 1 and pool.stats()['reused'] == 1
+
+    # Other construction options are another profile
+    assert profile_key({'quiet': True, 'format': '18'}) == profile_key({'quiet': True, 'format': '22'})
+    with pool.borrow({'quiet': True, 'no_warnings': True}) as ydl:
+        assert ydl is not first
+
+
+def test_downloads_borrow_warm_instances():
+    with LocalMediaServer({'/a.m4a': AUDIO, '/b.m4a': AUDIO[::-1]}) as server, \
+            tempfile.TemporaryDirectory() as root:
+        dl = YouTubeDownloader(root, connections=1)
+        results = []
+        for name in ('a', 'b'):
+            url = server.url(f'/{name}.m4a')
+            info = {'id': name, 'title': name.upper(), 'extractor': 'generic', 'extractor_key': 'Generic',
+                    'webpage_url': url,
+                    'formats': [{'format_id': '140', 'url': url, 'ext': 'm4a', 'filesize': len(AUDIO),
+                                 'vcodec': 'none', 'acodec': 'mp4a.40.2'}]}
+            results.append(dl.download_audio(url, info=info, profile='original'))
+
+        assert [r.status for r in results] == [JobStatus.DONE, JobStatus.DONE]
+        assert [os.path.basename(r.path) for r in results] == ['A.m4a', 'B.m4a']
+        with open(results[1].path, 'rb') as f:
+            assert f.read() == AUDIO[::-1]
+        assert dl.ydl_pool.stats()['created'] == 1 and dl.ydl_pool.stats()['reused'] == 1
+
+
+if __name__ == "__main__":
+    test_installed_yt_dlp_has_the_internals_the_pool_resets()
+    test_job_options_are_swapped_on_a_reused_instance()
+    test_downloads_borrow_warm_instances()
+    print("YoutubeDL pool checks passed.")
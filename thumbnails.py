@@ -0,0 +1,157 @@
+import hashlib
+import os
+import threading
+from collections import OrderedDict
+from urllib.parse import urlsplit
+
+from transport import default_client
+
+DEFAULT_CACHE_DIR = os.path.join(os.path.expanduser("~"), ".youtube_scraper", "thumbnails")
+PREVIEW_WIDTH = 320
+# Size cap of the on-disk cache; the least recently used files go first
+DEFAULT_DISK_LIMIT = 64 * 1024 * 1024
+
+
+def thumbnail_key(info):
+    """
+    Cache key of a video's thumbnail: "youtube-jNQXAC9IVRw", or a hash of
+    the thumbnail URL when info has no ID.
+    """
+    extractor = info.get('extractor_key') or info.get('extractor')
+    if extractor and info.get('id'):
+        key = f"{extractor}-{info['id']}".lower()
+        return "".join(c if c.isalnum() or c in '-_' else '_' for c in key)
+    return hashlib.sha1((info.get('thumbnail') or '').encode('utf-8')).hexdigest()
+
+
+def thumbnail_ext(url):
+    ext = os.path.splitext(urlsplit(url).path)[1][1:].lower()
+    return ext if ext in ('jpg', 'jpeg', 'png', 'webp') else 'jpg'
+
+
+class ThumbnailCache:
+    """
+    Thumbnails fetched once per video and kept by thumbnail_key(): the
+    original bytes in memory (LRU of max_entries) and under cache_dir, and
+    each preview size decoded and scaled once. Analyze-then-save therefore
+    costs a single fetch. Requests share one keep-alive HTTP client.
+
+    Calls block until the thumbnail is there; the GUI makes them from its
+    analyze thread. cache_dir is trimmed to max_disk_bytes and may be
+    deleted at any time.
+    """
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, client=None, max_entries=32,
+                 max_disk_bytes=DEFAULT_DISK_LIMIT):
+        self.cache_dir = cache_dir
+        self.client = client
+        self.max_entries = max_entries
+        self.max_disk_bytes = max_disk_bytes
+        self.fetches = 0
+        self._data = OrderedDict()      # key -> original bytes
+        self._previews = OrderedDict()  # (key, width) -> PIL image
+        self._lock = threading.Lock()
+
+    def _path(self, key, url):
+        return os.path.join(self.cache_dir, f"{key}.{thumbnail_ext(url)}") if self.cache_dir else None
+
+    def fetch(self, info):
+        """
+        Original thumbnail bytes of info's video; None when it has none.
+        """
+        url = info.get('thumbnail')
+        if not url:
+            return None
+        key = thumbnail_key(info)
+        with self._lock:
+            data = self._data.get(key)
+            if data is not None:
+                self._data.move_to_end(key)
+                return data
+        path = self._path(key, url)
+        data = None
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                os.utime(path)  # recently used: trimmed last
+            except OSError:
+                data = None
+        if data is None:
+            data = (self.client or default_client()).get(url)
+            with self._lock:
+                self.fetches += 1
+            if path:
+                os.makedirs(self.cache_dir, exist_ok=True)
+                with open(f"{path}.tmp", 'wb') as f:
+                    f.write(data)
+                os.replace(f"{path}.tmp", path)
+                self._trim_disk()
+        with self._lock:
+            self._data[key] = data
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+        return data
+
+    def _trim_disk(self):
+        """
+        Deletes the least recently used files until cache_dir holds at most
+        max_disk_bytes.
+        """
+        files = []
+        try:
+            for entry in os.scandir(self.cache_dir):
+                if entry.is_file() and not entry.name.endswith('.tmp'):
+                    st = entry.stat()
+                    files.append((st.st_mtime, st.st_size, entry.path))
+        except OSError:
+            return
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_disk_bytes:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            total -= size
+
+    def preview(self, info, width=PREVIEW_WIDTH):
+        """
+        PIL image of the thumbnail scaled to width, made once per size.
+        JPEGs are decoded at reduced scale and resized with BILINEAR, which
+        is plenty for a preview and much cheaper than LANCZOS at full size.
+        """
+        from io import BytesIO
+        from PIL import Image
+
+        key = (thumbnail_key(info), width)
+        with self._lock:
+            image = self._previews.get(key)
+            if image is not None:
+                self._previews.move_to_end(key)
+                return image
+        data = self.fetch(info)
+        if data is None:
+            return None
+        image = Image.open(BytesIO(data))
+        height = max(1, round(image.size[1] * width / image.size[0]))
+        image.draft('RGB', (width, height))
+        image = image.convert('RGB').resize((width, height), Image.Resampling.BILINEAR)
+        with self._lock:
+            self._previews[key] = image
+            while len(self._previews) > self.max_entries:
+                self._previews.popitem(last=False)
+        return image
+
+    def save(self, info, path):
+        """
+        Writes the full-resolution thumbnail to path (from the cache when
+        it was fetched before); False when the video has no thumbnail.
+        """
+        data = self.fetch(info)
+        if data is None:
+            return False
+        with open(path, 'wb') as f:
+            f.write(data)
+        return True
@@ -0,0 +1,207 @@
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager, nullcontext
+
+# Events kept in memory; later ones are counted as dropped
+MAX_EVENTS = 1000000
+
+_NULL_SPAN = nullcontext()
+
+
+class NullTracer:
+    """
+    The tracer while tracing is off. Every call is a no-op and wrap() hands
+    the callback back unchanged, so instrumented code pays one method call
+    per span.
+    """
+    enabled = False
+
+    def span(self, name, cat='job', **args):
+        return _NULL_SPAN
+
+    def complete(self, name, cat, started, **args):
+        pass
+
+    def begin(self, name, cat, span_id, **args):
+        pass
+
+    def end(self, name, cat, span_id, **args):
+        pass
+
+    def wrap(self, callback, name, cat='ui'):
+        return callback
+
+    def observing(self, ydl):
+        return nullcontext(ydl)
+
+
+NULL_TRACER = NullTracer()
+
+
+class Tracer(NullTracer):
+    """
+    Records spans from every thread as Chrome trace events; write() saves
+    them as JSON for ui.perfetto.dev or chrome://tracing. Each thread gets
+    its own row (extraction, downloads, fragments, post-processing passes,
+    progress dispatch), and jobs are async spans that may end on another
+    thread, so overlap across workers is visible at a glance.
+    """
+    enabled = True
+
+    def __init__(self, max_events=MAX_EVENTS):
+        self.max_events = max_events
+        self.dropped = 0
+        self._events = []
+        self._threads = {}  # tid -> thread name
+        self._pid = os.getpid()
+        self._t0 = time.perf_counter()
+        self._lock = threading.Lock()
+
+    def _ts(self, t):
+        return round((t - self._t0) * 1e6, 1)
+
+    def _emit(self, event, args):
+        tid = threading.get_native_id()
+        event['pid'] = self._pid
+        event['tid'] = tid
+        if args:
+            event['args'] = args
+        with self._lock:
+            if tid not in self._threads:
+                self._threads[tid] = threading.current_thread().name
+            if len(self._events) >= self.max_events:
+                self.dropped += 1
+                return
+            self._events.append(event)
+
+    @contextmanager
+    def span(self, name, cat='job', **args):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.complete(name, cat, started, **args)
+
+    def complete(self, name, cat, started, **args):
+        """
+        A span on this thread from started (a time.perf_counter() reading)
+        until now.
+        """
+        now = time.perf_counter()
+        self._emit({'name': name, 'cat': cat, 'ph': 'X', 'ts': self._ts(started),
+                    'dur': round((now - started) * 1e6, 1)}, args)
+
+    def begin(self, name, cat, span_id, **args):
+        """
+        Starts an async span; end() with the same name, cat and span_id
+        closes it, from any thread.
+        """
+        self._emit({'name': name, 'cat': cat, 'ph': 'b', 'id': str(span_id),
+                    'ts': self._ts(time.perf_counter())}, args)
+
+    def end(self, name, cat, span_id, **args):
+        self._emit({'name': name, 'cat': cat, 'ph': 'e', 'id': str(span_id),
+                    'ts': self._ts(time.perf_counter())}, args)
+
+    def wrap(self, callback, name, cat='ui'):
+        """
+        callback, timed as a span on every call (None stays None).
+        """
+        if callback is None:
+            return None
+
+        def traced(*args, **kwargs):
+            with self.span(name, cat):
+                return callback(*args, **kwargs)
+        return traced
+
+    @contextmanager
+    def observing(self, ydl):
+        """
+        A 'fragment' span per request ydl makes inside the block, from
+        sending it until the last byte of the response is read.
+        """
+        had_own = 'urlopen' in vars(ydl)
+        urlopen = ydl.urlopen
+
+        def traced(req):
+            started = time.perf_counter()
+            headers = getattr(req, 'headers', None) or {}
+            args = {'range': headers['Range']} if 'Range' in headers else {}
+            try:
+                response = urlopen(req)
+            except Exception as e:
+                self.complete('fragment', 'fragment', started, status=getattr(e, 'status', None),
+                              error=type(e).__name__, **args)
+                raise
+            self._follow(response, started, args)
+            return response
+
+        ydl.urlopen = traced
+        try:
+            yield ydl
+        finally:
+            if had_own:
+                ydl.urlopen = urlopen
+            else:
+                del ydl.urlopen
+
+    def _follow(self, response, started, args):
+        # Ends the span at Content-Length bytes or EOF, whichever comes first
+        length = response.headers.get('Content-Length')
+        length = int(length) if length and length.isdigit() else None
+        status = getattr(response, 'status', None)
+        read = response.read
+        got = [0]
+
+        def traced_read(*a, **kw):
+            try:
+                data = read(*a, **kw)
+            except Exception as e:
+                if got[0] is not None:
+                    self.complete('fragment', 'fragment', started, status=status, bytes=got[0],
+                                  error=type(e).__name__, **args)
+                    got[0] = None
+                raise
+            if got[0] is not None:
+                got[0] += len(data)
+                if not data or (length is not None and got[0] >= length):
+                    self.complete('fragment', 'fragment', started, status=status, bytes=got[0], **args)
+                    got[0] = None
+            return data
+
+        response.read = traced_read
+
+    def events(self):
+        """
+        The trace events so far, thread names first.
+        """
+        with self._lock:
+            names = [{'name': 'thread_name', 'ph': 'M', 'pid': self._pid, 'tid': tid, 'args': {'name': name}}
+                     for tid, name in self._threads.items()]
+            return names + list(self._events)
+
+    def write(self, path):
+        """
+        Saves the trace as Chrome trace-event JSON, atomically.
+        """
+        trace = {'traceEvents': self.events(), 'displayTimeUnit': 'ms',
+                 'otherData': {'dropped_events': self.dropped}}
+        tmp = f"{path}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(trace, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+
+def add_arguments(parser):
+    parser.add_argument('--trace', metavar='FILE',
+                        help="record a timeline of every job and write it here (open in ui.perfetto.dev)")
+
+
+def from_args(args):
+    """
+    Tracer for add_arguments() options, or None when --trace is not given.
+    """
+    return Tracer() if getattr(args, 'trace', None) else None
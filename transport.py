@@ -0,0 +1,326 @@
+import http.client
+import os
+import threading
+import time
+from urllib.parse import urljoin, urlsplit
+
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_RETRIES = 3
+DEFAULT_BACKOFF = 0.5
+MAX_BACKOFF = 30.0
+USER_AGENT = "Mozilla/5.0 (YouTube-Scraper)"
+MAX_REDIRECTS = 5
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+# A reused keep-alive connection the server already closed fails like this
+_STALE = (http.client.RemoteDisconnected, http.client.BadStatusLine, ConnectionResetError, BrokenPipeError)
+
+
+class HTTPError(Exception):
+    def __init__(self, status, url):
+        super().__init__(f"HTTP Error {status}: {url}")
+        self.status = status
+        self.url = url
+
+
+class HostStats:
+    __slots__ = ('requests', 'opened', 'reused', 'retries', 'failures', 'bytes', 'seconds')
+
+    def __init__(self):
+        self.requests = self.opened = self.reused = self.retries = self.failures = self.bytes = 0
+        self.seconds = 0.0
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class HTTPClient:
+    """
+    The project's HTTP transport: a keep-alive client on http.client that
+    keeps idle connections per (scheme, host, port), up to max_idle each,
+    so repeated requests to one host skip the TCP and TLS handshakes.
+    Every request has a timeout; connection errors and 429/5xx answers are
+    retried up to retries times with exponential backoff (or Retry-After).
+    proxy is an "http://host:port" proxy (HTTPS is tunnelled through it);
+    rate_limit caps requests per second per host. Thread-safe. get()
+    returns the whole body, open() a response to read in chunks, stats()
+    per-host counters. ydl_options() carries the same settings to yt-dlp.
+    """
+
+    def __init__(self, timeout=DEFAULT_TIMEOUT, max_idle=4, headers=None, retries=None,
+                 backoff=DEFAULT_BACKOFF, proxy=None, rate_limit=None):
+        self.timeout = timeout
+        self.max_idle = max_idle
+        self.headers = {'User-Agent': USER_AGENT, **(headers or {})}
+        # None: DEFAULT_RETRIES here and yt-dlp's own retry defaults there
+        self.retries = DEFAULT_RETRIES if retries is None else retries
+        self._ydl_retries = retries
+        self.backoff = backoff
+        self.proxy = proxy
+        self.rate_limit = rate_limit
+        self._idle = {}
+        self._hosts = {}
+        self._next_request = {}
+        self._lock = threading.Lock()
+
+    @property
+    def connections_opened(self):
+        with self._lock:
+            return sum(h.opened for h in self._hosts.values())
+
+    def get(self, url, headers=None):
+        with self.open(url, headers) as response:
+            return response.read()
+
+    def open(self, url, headers=None):
+        """
+        Response for a GET of url after redirects; use it as a context
+        manager so its connection goes back to the pool. Raises HTTPError
+        for any status other than 200/206 once retries are used up, and for
+        the redirect after MAX_REDIRECTS.
+        """
+        for redirects in range(MAX_REDIRECTS + 1):
+            response = self._with_retries(url, headers)
+            location = response.getheader('Location')
+            if response.status not in (301, 302, 303, 307, 308) or not location:
+                break
+            # Drained and closed, so the connection goes back to the pool
+            response.read()
+            response.close()
+            if redirects == MAX_REDIRECTS:
+                raise HTTPError(response.status, url)
+            url = urljoin(url, location)
+        if response.status not in (200, 206):
+            response.close()
+            raise HTTPError(response.status, url)
+        return response
+
+    def download(self, url, path, progress=None, chunk_size=256 * 1024):
+        """
+        Streams url to path (via path.part); progress(done, total) is
+        called after each chunk. Returns the number of bytes written.
+        """
+        done = 0
+        with self.open(url) as response, open(f"{path}.part", 'wb') as f:
+            total = int(response.getheader('Content-Length') or 0) or None
+            while True:
+                chunk = response.read(chunk_size)
+                if not chunk:
+                    break
+                f.write(chunk)
+                done += len(chunk)
+                if progress:
+                    progress(done, total)
+        os.replace(f"{path}.part", path)
+        return done
+
+    def _with_retries(self, url, headers):
+        host = urlsplit(url).hostname
+        for attempt in range(self.retries + 1):
+            last = attempt == self.retries
+            try:
+                response = self._request(url, headers)
+            except (OSError, http.client.HTTPException):
+                with self._lock:
+                    self._host(host).failures += 1
+                if last:
+                    raise
+                delay = None
+            else:
+                if response.status not in RETRY_STATUSES or last:
+                    return response
+                delay = response.getheader('Retry-After')
+                response.read()
+                response.close()
+            with self._lock:
+                self._host(host).retries += 1
+            time.sleep(self._delay(attempt, delay))
+
+    def _delay(self, attempt, retry_after=None):
+        if retry_after and retry_after.strip().isdigit():
+            return min(float(retry_after), MAX_BACKOFF)
+        return min(self.backoff * 2 ** attempt, MAX_BACKOFF)
+
+    def _request(self, url, headers):
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        target = parts.path or '/'
+        if parts.query:
+            target += '?' + parts.query
+        if self.proxy and parts.scheme == 'http':
+            target = url  # plain HTTP proxies take the absolute URL
+        headers = {**self.headers, **(headers or {})}
+        self._wait_turn(parts.hostname)
+        while True:
+            conn, reused = self._checkout(key)
+            started = time.perf_counter()
+            try:
+                conn.request('GET', target, headers=headers)
+                response = conn.getresponse()
+            except _STALE:
+                conn.close()
+                if reused:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+            with self._lock:
+                stats = self._host(parts.hostname)
+                stats.requests += 1
+                stats.seconds += time.perf_counter() - started
+            return _PooledResponse(self, key, conn, response)
+
+    def _wait_turn(self, host):
+        if not self.rate_limit:
+            return
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_request.get(host, now))
+            self._next_request[host] = slot + 1.0 / self.rate_limit
+        if slot > now:
+            time.sleep(slot - now)
+
+    def _host(self, host):
+        # Caller holds the lock (counters are only read under it)
+        stats = self._hosts.get(host)
+        if stats is None:
+            stats = self._hosts[host] = HostStats()
+        return stats
+
+    def _checkout(self, key):
+        scheme, host, port = key
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                self._host(host).reused += 1
+                return idle.pop(), True
+            self._host(host).opened += 1
+        cls = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        if not self.proxy:
+            return cls(host, port, timeout=self.timeout), False
+        proxy = urlsplit(self.proxy)
+        conn = cls(proxy.hostname, proxy.port or 8080, timeout=self.timeout)
+        if scheme == 'https':
+            conn.set_tunnel(host, port)
+        return conn, False
+
+    def _checkin(self, key, conn, nbytes):
+        with self._lock:
+            self._host(key[1]).bytes += nbytes
+            idle = self._idle.setdefault(key, [])
+            if conn is not None and len(idle) < self.max_idle:
+                idle.append(conn)
+                return
+        if conn is not None:
+            conn.close()
+
+    def stats(self):
+        """
+        Per-host counters: requests, connections opened and reused, retries,
+        failures, body bytes read and seconds waiting for response headers.
+        """
+        with self._lock:
+            return {host: stats.to_dict() for host, stats in self._hosts.items()}
+
+    def ydl_options(self):
+        """
+        The same timeout, retry, proxy and rate-limit settings as yt-dlp
+        options, so its requests behave like this client's.
+        """
+        opts = {'socket_timeout': self.timeout}
+        if self._ydl_retries is not None:
+            opts.update(retries=self._ydl_retries, fragment_retries=self._ydl_retries,
+                        extractor_retries=self._ydl_retries)
+        if self.proxy:
+            opts['proxy'] = self.proxy
+        if self.rate_limit:
+            opts['sleep_interval_requests'] = 1.0 / self.rate_limit
+        return opts
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for conns in idle.values():
+            for conn in conns:
+                conn.close()
+
+
+class _PooledResponse:
+    """
+    http.client response that hands its connection back when closed after
+    the body was read to the end, counting the bytes read.
+    """
+
+    def __init__(self, client, key, conn, response):
+        self._client = client
+        self._key = key
+        self._conn = conn
+        self._response = response
+        self._read = 0
+
+    def __getattr__(self, attr):
+        return getattr(self._response, attr)
+
+    def read(self, amt=None):
+        data = self._response.read(amt)
+        self._read += len(data)
+        return data
+
+    def close(self):
+        if self._conn is None:
+            return
+        conn, self._conn = self._conn, None
+        if not (self._response.isclosed() and not self._response.will_close):
+            self._response.close()
+            conn.close()
+            conn = None
+        self._client._checkin(self._key, conn, self._read)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+_default = None
+_default_lock = threading.Lock()
+
+
+def default_client():
+    """
+    The process-wide HTTPClient, created on first use.
+    """
+    global _default
+    with _default_lock:
+        if _default is None:
+            _default = HTTPClient()
+        return _default
+
+
+def configure(**settings):
+    """
+    Replaces the process-wide client with HTTPClient(**settings) and
+    returns it; call before the first download.
+    """
+    global _default
+    with _default_lock:
+        old, _default = _default, HTTPClient(**settings)
+    if old is not None:
+        old.close()
+    return _default
+
+
+def add_arguments(parser):
+    parser.add_argument('--proxy', metavar='URL', help="HTTP proxy for every request, e.g. http://127.0.0.1:3128")
+    parser.add_argument('--timeout', type=float, default=DEFAULT_TIMEOUT, help="network timeout in seconds")
+    parser.add_argument('--retries', type=int, help=f"retries per request, with backoff (default: {DEFAULT_RETRIES})")
+    parser.add_argument('--rate-limit', type=float, metavar='N', help="max requests per second per host")
+
+
+def from_args(args):
+    """
+    Configures the process-wide client from add_arguments() options.
+    """
+    return configure(timeout=args.timeout, retries=args.retries, proxy=args.proxy, rate_limit=args.rate_limit)